@@ -0,0 +1,72 @@
+from core import clone_object
+
+_LEGAL = {}  # (number of options, multi_select) -> legal action ids
+
+
+def legal_actions(n_options, multi_select=False):
+    """The action ids that answer a decision with n_options options.
+
+    A single choice is the option's index; a multi-select choice is the
+    bitmask of the chosen indices, so every subset is legal and action i
+    chooses the options whose bits are set in i. Either way the actions are
+    range(number of actions), which stays small however many subsets there
+    are. Decisions of the same shape share one range, so asking again
+    allocates nothing.
+    """
+    key = (n_options, multi_select)
+    actions = _LEGAL.get(key)
+    if actions is None:
+        actions = _LEGAL[key] = range(2 ** n_options if multi_select else n_options)
+    return actions
+
+
+def decode_action(action, multi_select=False):
+    """The option indices an action id chooses, as HeadlessController.decide() returns them"""
+    if not multi_select:
+        return [action]
+    return [i for i in range(action.bit_length()) if action >> i & 1]
+
+
+def encode_choice(choice, multi_select=False):
+    """The action id of a list of chosen option indices"""
+    if not multi_select:
+        return choice[0]
+    action = 0
+    for index in choice:
+        action |= 1 << index
+    return action
+
+
+class Decision:
+    """A decision waiting on a controller: its name, the candidate options and
+    whether several may be picked. version is the GameState.version it was
+    asked at, so anything worked out for it holds until the next one."""
+    __slots__ = ('name', 'options', 'multi_select', 'version')
+
+    def __init__(self, name, options, multi_select=False, version=0):
+        self.name = name
+        self.options = options
+        self.multi_select = multi_select
+        self.version = version
+
+    @property
+    def actions(self):
+        return legal_actions(len(self.options), self.multi_select)
+
+    def choice(self, action):
+        """The option indices an action id chooses"""
+        return decode_action(action, self.multi_select)
+
+    def _clone(self, memo):
+        return Decision(self.name, clone_object(self.options, memo), self.multi_select, self.version)
+
+
+def pending_actions(game_state):
+    """Legal action ids of the decision game_state is waiting on, or () if none.
+
+    Only a game inside a decision has one; controllers.next_decision() looks
+    ahead from a game between decisions.
+    """
+    decision = game_state.pending_decision
+    return decision.actions if decision is not None else ()
+
@@ -2,7 +2,6 @@ from core import *
 from quests import *
 from gavs_deck import *
 from rich.console import Console
-import random
 console = Console()
 
 if __name__ == "__main__":
@@ -19,7 +18,6 @@ if __name__ == "__main__":
     StewardOfGondor(),StewardOfGondor(),StewardOfGondor(),
     UnexpectedCourage(),UnexpectedCourage(),UnexpectedCourage()
   ]
-  random.shuffle(gav.deck)
 
   p2 = Player("Player 2")
   p2.play_area['heroes'] = [
@@ -32,7 +30,6 @@ if __name__ == "__main__":
     StewardOfGondor(),StewardOfGondor(),StewardOfGondor(),
     UnexpectedCourage(),UnexpectedCourage(),UnexpectedCourage()
   ]
-  random.shuffle(p2.deck)
 
   # Create game with player
   game = Game([gav, p2], FleeingFromMirkwood())
@@ -1,15 +1,316 @@
+from core import *
+from core import _SHARED_TYPES
+from operator import attrgetter
+from rich.console import Group
+from rich.panel import Panel
+from rich.text import Text
+
+class CardDefinition:
+    """The printed, unchanging data of a card, shared by every copy of it"""
+    __slots__ = ('title', 'cost', 'sphere', 'description', 'keywords',
+                 'threat_cost', 'willpower', 'attack', 'defense', 'hit_points',
+                 'engagement', 'threat', 'quest_points', 'victory_points', 'required_progress')
+
+    def __init__(self, title, cost=0, sphere=None, description="", keywords=(), **stats):
+        set_field = object.__setattr__
+        set_field(self, 'title', title)
+        set_field(self, 'cost', cost)
+        set_field(self, 'sphere', sphere)
+        set_field(self, 'description', description)
+        set_field(self, 'keywords', frozenset(keywords))
+        for name in self.__slots__[5:]:
+            set_field(self, name, stats.pop(name, None))
+        if stats:
+            raise TypeError(f"Unknown card stats: {', '.join(stats)}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        stats = {name: getattr(self, name) for name in self.__slots__[5:] if getattr(self, name) is not None}
+        return _definition_from_pickle, ((self.title, self.cost, self.sphere, self.description, tuple(self.keywords)), stats)
+
+    def __repr__(self):
+        return f"CardDefinition({self.title!r})"
+
+
+def _definition_from_pickle(args, stats):
+    return CardDefinition(*args, **stats)
+
+
+_state_slots = {}
+
+
+def _slots_of(cls):
+    """Names of the per-instance state slots of a card class"""
+    names = _state_slots.get(cls)
+    if names is None:
+        names = _state_slots[cls] = tuple(
+            name for klass in reversed(cls.__mro__) for name in getattr(klass, '__slots__', ())
+            if name not in ('definition', '__weakref__', '__dict__')
+        )
+    return names
+
+
+def _definition_field(name):
+    return property(attrgetter(f"definition.{name}"))
+
+
+def _restore_slot(card, slot, value):
+    journal = card._journal
+    if journal.recording:
+        journal.record(_restore_slot, card, slot, getattr(card, slot, None))
+    setattr(card, slot, value)
+    card.changed()
+
+
+def _set_slot(card, slot, value):
+    journal = card._journal
+    if journal.recording:
+        journal.record(_set_slot, card, slot, getattr(card, slot, None))
+    setattr(card, slot, value)
+
+
+def _changing_slot(slot):
+    """A property over slot whose setter journals the old value and calls
+    Card.changed(), for state set directly by game code"""
+    def set_value(card, value):
+        _restore_slot(card, slot, value)
+    return property(attrgetter(slot), set_value)
+
+
+def _journaled_slot(slot):
+    """A property over slot whose setter journals the old value, for state outside Card._state()"""
+    def set_value(card, value):
+        _set_slot(card, slot, value)
+    return property(attrgetter(slot), set_value)
+
+
+class StatModifier:
+    """One layer on a card's stat: delta added to attribute by source.
+
+    expiry is the event after which the source takes the modifier off again,
+    or None if it lasts until removed. The card's stat slot always holds the
+    modified value, so reading a stat costs nothing extra; the base value is
+    Card.base_stat().
+    """
+    __slots__ = ('source', 'attribute', 'delta', 'expiry')
+
+    def __init__(self, source, attribute, delta, expiry=None):
+        self.source = source
+        self.attribute = attribute
+        self.delta = delta
+        self.expiry = expiry
+
+    def _clone(self, memo):
+        copy = StatModifier(None, self.attribute, self.delta, self.expiry)
+        memo[id(self)] = copy
+        copy.source = clone_object(self.source, memo)
+        return copy
+
+
+class AttachmentZone(Zone):
+    """The cards attached to a card (the owner); a change to them is a change to their host"""
+    __slots__ = ()
+
+    def _host_changed(self):
+        if self.owner is not None:  # Not yet set while unpickling
+            self.owner.changed()
+
+    def card_changed(self, card):
+        self._sum = None
+        self._host_changed()
+
+    def append(self, card):
+        Zone.append(self, card)
+        self._host_changed()
+
+    def insert(self, index, card):
+        Zone.insert(self, index, card)
+        self._host_changed()
+
+    def remove(self, card):
+        Zone.remove(self, card)
+        self._host_changed()
+
+    def pop(self, index=-1):
+        card = Zone.pop(self, index)
+        self._host_changed()
+        return card
+
+    def clear(self):
+        Zone.clear(self)
+        self._host_changed()
+
+
 class Card(ABC):
-    def __init__(self, title, cost, sphere):
-        self.title = title
-        self.description = ""
-        self.cost = cost
-        self.sphere = sphere
-        self.tokens = defaultdict(int)  # Track any type of token
-        self.attachments = []  # All cards can receive attachments
+    # Static data lives in the shared definition; instances only hold the
+    # state that changes during a game.
+    __slots__ = ('definition', '_parent', 'zone', '_committed', '_exhausted',
+                 '_tokens', '_attachments', '_keywords', '_modifiers', '_key', '_version', '_panel',
+                 '_journal', '__weakref__')
+    DEFINITION = None  # Set by classes that are a single card, e.g. Faramir
+    can_attack = True  # Default for most characters
+
+    def __init__(self, definition=None):
+        self.definition = definition if definition is not None else type(self).DEFINITION
+        self._journal = NO_JOURNAL  # The game's Journal, kept up to date by the zones
         self.parent = None  # For attached cards
-        self.keywords = set()  # To store card-specific keywords
-        self.committed = False  # Track quest commitment
-        self.can_attack = True  # Default for most characters
+        self.zone = None  # The Zone this card is in, kept up to date by the zone
+        self._committed = False  # Track quest commitment
+        self._exhausted = False
+        self._tokens = None  # Created with the first token
+        self._attachments = None  # Created with the first attachment
+        self._keywords = None  # Only set once this copy's keywords differ from its definition
+        self._modifiers = None  # StatModifiers on this card, created with the first one
+        self._key = 0  # Cached state_key(), 0 until needed again after a change
+        self._version = 0  # Counts changes, for caches of how the card looks
+        self._panel = None  # (key, panel) of the last render_panel()
+
+    parent = _journaled_slot('_parent')
+    title = _definition_field('title')
+    cost = _definition_field('cost')
+    sphere = _definition_field('sphere')
+    description = _definition_field('description')
+
+    @property
+    def keywords(self):
+        return self._keywords if self._keywords is not None else self.definition.keywords
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = defaultdict(int)  # Track any type of token
+        return self._tokens
+
+    @property
+    def exhausted(self):
+        return self._exhausted
+
+    @exhausted.setter
+    def exhausted(self, value):
+        journal = self._journal
+        if journal.recording:
+            journal.record(_restore_slot, self, '_exhausted', self._exhausted)
+        self._exhausted = value
+        self.changed()
+
+    @property
+    def committed(self):
+        return self._committed
+
+    @committed.setter
+    def committed(self, value):
+        journal = self._journal
+        if journal.recording:
+            journal.record(_restore_slot, self, '_committed', self._committed)
+        self._committed = value
+        self.changed()
+
+    def changed(self):
+        """Note that something _state() covers or the card's panel shows has changed, and tell its zone"""
+        self._key = 0
+        self._version += 1
+        if self.zone is not None:
+            self.zone.card_changed(self)
+
+    def _state(self):
+        """The state this card adds to GameState.state_hash(), besides where it is"""
+        return (type(self), self.definition.title, self._exhausted, self._committed)
+
+    def __getstate__(self):
+        dict_state, slots = object.__getstate__(self)
+        slots['_panel'] = None  # Drawn again when next shown
+        return dict_state, slots
+
+    @property
+    def version(self):
+        """Goes up with every change to the card (see changed()); equal versions look the same"""
+        return self._version
+
+    def state_key(self):
+        key = self._key
+        if not key:
+            key = ZOBRIST.key(self._state())
+            if self._attachments:
+                key = (key + self._attachments.state_key() * ZOBRIST.key('attachments')) & ZobristKeys.MASK
+            self._key = key
+        return key
+
+    @property
+    def owner(self):
+        """The player whose zone this card is in (through its host for attachments), else None"""
+        zone = self.zone
+        owner = zone.owner if zone is not None else None
+        return owner.owner if isinstance(owner, Card) else owner
+
+    @property
+    def attachments(self):
+        return self._attachments if self._attachments is not None else ()
+
+    def attachment_zone(self):
+        if self._attachments is None:
+            zone = self._attachments = AttachmentZone('attachments', self)  # All cards can receive attachments
+            zone._journal = self._journal
+            if self.zone is not None:
+                zone._index = self.zone._index
+        return self._attachments
+
+    def add_attachment(self, attachment):
+        self.attachment_zone().append(attachment)
+
+    @property
+    def modifiers(self):
+        return tuple(self._modifiers) if self._modifiers else ()
+
+    def add_modifier(self, modifier):
+        """Put a StatModifier on this card and update the stat it changes"""
+        if self._journal.recording:
+            self._journal_modifiers()
+        if self._modifiers is None:
+            self._modifiers = []
+        self._modifiers.append(modifier)
+        self._shift_stat(modifier.attribute, modifier.delta)
+
+    def remove_modifier(self, modifier):
+        """Take a StatModifier off this card; does nothing if it is not on it"""
+        modifiers = self._modifiers
+        if modifiers:
+            for i, m in enumerate(modifiers):
+                if m is modifier:
+                    if self._journal.recording:
+                        self._journal_modifiers()
+                    del modifiers[i]
+                    self._shift_stat(modifier.attribute, -modifier.delta)
+                    return
+
+    def _journal_modifiers(self):
+        modifiers = self._modifiers
+        self._journal.record(_restore_slot, self, '_modifiers', list(modifiers) if modifiers is not None else None)
+
+    def remove_modifiers(self, source):
+        """Take off every modifier that source put on this card"""
+        for modifier in self.modifiers:
+            if modifier.source is source:
+                self.remove_modifier(modifier)
+
+    def base_stat(self, attribute):
+        """The value of a stat without its modifiers"""
+        value = getattr(self, attribute)
+        for modifier in self.modifiers:
+            if modifier.attribute == attribute:
+                value -= modifier.delta
+        return value
+
+    def _shift_stat(self, attribute, delta):
+        # Applied as a change rather than recomputed from the base, so damage
+        # taken while a hit point modifier is up is kept when it comes off
+        value = getattr(self, attribute)
+        journal = self._journal
+        if journal.recording:
+            journal.record(_restore_slot, self, attribute, value)
+        setattr(self, attribute, value + delta)
+        self.changed()
 
     def getColour(self):
         if self.sphere == 'Leadership':
@@ -25,6 +326,14 @@ class Card(ABC):
         return 'yellow'
     
     def render_panel(self, in_hand=False, show_description=True):
+        """This card as a Rich Panel; built again only once the card has changed"""
+        key = (self._version, in_hand, show_description)
+        cached = self._panel
+        if cached is None or cached[0] != key:
+            cached = self._panel = (key, self._build_panel(in_hand, show_description))
+        return cached[1]
+
+    def _build_panel(self, in_hand, show_description):
         color = self.getColour()
         title = f"{self.title}"
         
@@ -77,102 +386,177 @@ class Card(ABC):
         console.print(f"Tokens: {dict(self.tokens)}")
         console.print(f"Attachments: {len(self.attachments)} items")
         
-    def add_token(self, token_type, amount=1):
-        game_state.event_system.trigger_event(f"BeforeAddToken:{token_type}",
-            {"card": self, "amount": amount})
+    def add_token(self, game_state, token_type, amount=1):
+        events = game_state.event_system
+        if BEFORE_ADD_TOKEN in events.hooks:
+            events.trigger_event(BEFORE_ADD_TOKEN, TokenEvent(self, token_type, amount))
         self.tokens[token_type] += amount
-        game_state.event_system.trigger_event(f"AfterAddToken:{token_type}",
-            {"card": self, "amount": amount})
+        if AFTER_ADD_TOKEN in events.hooks:
+            events.trigger_event(AFTER_ADD_TOKEN, TokenEvent(self, token_type, amount))
         
-    def remove_token(self, token_type, amount=1):
-        game_state.event_system.trigger_event(f"BeforeRemoveToken:{token_type}",
-            {"card": self, "amount": amount})
+    def remove_token(self, game_state, token_type, amount=1):
+        events = game_state.event_system
+        if BEFORE_REMOVE_TOKEN in events.hooks:
+            events.trigger_event(BEFORE_REMOVE_TOKEN, TokenEvent(self, token_type, amount))
         if self.tokens[token_type] >= amount:
             self.tokens[token_type] -= amount
         else:
             self.tokens[token_type] = 0
-        game_state.event_system.trigger_event(f"AfterRemoveToken:{token_type}",
-            {"card": self, "amount": amount})
+        if AFTER_REMOVE_TOKEN in events.hooks:
+            events.trigger_event(AFTER_REMOVE_TOKEN, TokenEvent(self, token_type, amount))
         
     def get_token_count(self, token_type):
-        return self.tokens.get(token_type, 0)
+        return self._tokens.get(token_type, 0) if self._tokens else 0
         
     @abstractmethod
     def play(self, game_state, controller):
         pass
 
+    def _clone(self, memo):
+        """Copy this card's state for GameState.clone(); the definition is shared"""
+        cls = type(self)
+        copy = cls.__new__(cls)
+        memo[id(self)] = copy
+        copy.definition = self.definition
+        for name in _slots_of(cls):
+            try:
+                value = getattr(self, name)
+            except AttributeError:  # Slot never set
+                continue
+            if type(value) not in _SHARED_TYPES:  # Most state is plain numbers and flags
+                value = clone_object(value, memo)
+            setattr(copy, name, value)
+        if hasattr(self, '__dict__'):
+            copy.__dict__.update({name: clone_object(value, memo) for name, value in self.__dict__.items()})
+        return copy
+
+    def leave_play(self, game_state):
+        """Drop the hooks this card, and anything attached to it, registered while in play"""
+        game_state.event_system.remove_hooks(self)
+        for attachment in self.attachments:
+            attachment.leave_play(game_state)
+
+    def _journal_keywords(self):
+        keywords = self._keywords
+        self._journal.record(_restore_slot, self, '_keywords', set(keywords) if keywords is not None else None)
+
     def add_keyword(self, keyword):
-        self.keywords.add(keyword)
+        if self._journal.recording:
+            self._journal_keywords()
+        if self._keywords is None:
+            self._keywords = set(self.definition.keywords)
+        self._keywords.add(keyword)
+        self.changed()
 
     def remove_keyword(self, keyword):
         if keyword in self.keywords:
-            self.keywords.remove(keyword)
+            if self._journal.recording:
+                self._journal_keywords()
+            if self._keywords is None:
+                self._keywords = set(self.definition.keywords)
+            self._keywords.remove(keyword)
+            self.changed()
 
 class QuestCard(Card):
-    def __init__(self, title, required_progress, threat=0):
-        super().__init__(title, 0, "Quest")
-        self.required_progress = required_progress
-        self.threat = threat
+    __slots__ = ('_progress', '_is_active')
+
+    progress = _changing_slot('_progress')
+    is_active = _journaled_slot('_is_active')
+
+    def __init__(self, title=None, required_progress=0, threat=0):
+        super().__init__(None if title is None else CardDefinition(
+            title, 0, "Quest", required_progress=required_progress, threat=threat))
         self.progress = 0
         self.is_active = False
 
+    required_progress = _definition_field('required_progress')
+    threat = _definition_field('threat')
+
+    def _state(self):
+        return (type(self), self.definition.title, self._progress)
+
+    def build_encounter_deck(self):
+        """Return fresh instances of the encounter cards used by this quest"""
+        return []
+
 # todo: Character Keywords:
 # Unique: As discussed, only one copy of a Unique card with the same title can be in play at a time.
 # Restricted: Limits the number of powerful attachments a character can have.
 
 class Ally(Card):
-    def __init__(self, title, cost, sphere, willpower, attack, defense, hit_points):
-        super().__init__(title, cost, sphere)
-        self.willpower = willpower
-        self.attack = attack
-        self.defense = defense
-        self.hit_points = hit_points
+    __slots__ = ('willpower', 'attack', 'defense', '_hit_points')
+
+    hit_points = _changing_slot('_hit_points')
+
+    def __init__(self, title=None, cost=0, sphere=None, willpower=0, attack=0, defense=0, hit_points=0):
+        super().__init__(None if title is None else CardDefinition(
+            title, cost, sphere, willpower=willpower, attack=attack, defense=defense, hit_points=hit_points))
+        definition = self.definition
+        self.willpower = definition.willpower
+        self.attack = definition.attack
+        self.defense = definition.defense
+        self.hit_points = definition.hit_points
 
     def can_quest(self):
         return self.willpower > 0
 
     def can_defend(self):
         return self.defense > 0
+
+    def _state(self):
+        return (type(self), self.definition.title, self._exhausted, self._committed,
+                self.willpower, self.attack, self.defense, self._hit_points)
         
     def play(self, game_state, controller):
-        game_state.event_system.trigger_event(
-            "AllyPlayed",
-            {"ally": self, "player": self.parent}
-        )
+        events = game_state.event_system
+        if ALLY_PLAYED in events.hooks:
+            events.trigger_event(ALLY_PLAYED, AllyPlayedEvent(self, self.parent))
 
 #todo: heroes are characters too, so the character keywords apply to heroes as well
 class Hero(Card):
-    def __init__(self, title, sphere, threat_cost, willpower, attack, defense, hit_points):
-        super().__init__(title, 0, sphere)
-        self.threat_cost = threat_cost
-        self.willpower = willpower
-        self.attack = attack
-        self.defense = defense
-        self.hit_points = hit_points
-        self.resources = defaultdict(int)
-        self.exhausted = False
+    __slots__ = ('willpower', 'attack', 'defense', '_hit_points', 'resources')
+
+    hit_points = _changing_slot('_hit_points')
+
+    def __init__(self, title=None, sphere=None, threat_cost=0, willpower=0, attack=0, defense=0, hit_points=0):
+        super().__init__(None if title is None else CardDefinition(
+            title, 0, sphere, threat_cost=threat_cost,
+            willpower=willpower, attack=attack, defense=defense, hit_points=hit_points))
+        definition = self.definition
+        self.willpower = definition.willpower
+        self.attack = definition.attack
+        self.defense = definition.defense
+        self.hit_points = definition.hit_points
+        self.resources = ResourcePool()
+
+    threat_cost = _definition_field('threat_cost')
 
     def can_quest(self):
         return self.willpower > 0
 
     def can_defend(self):
         return self.defense > 0
+
+    def _state(self):
+        resources = tuple(sorted(item for item in self.resources.items() if item[1]))
+        return (type(self), self.definition.title, self._exhausted, self._committed,
+                self.willpower, self.attack, self.defense, self._hit_points, resources)
     
     def play(self, game_state, controller):
         """Heroes are automatically put into play at game start"""
         pass  # No action needed as heroes start in play
         
-    def refresh_resources(self):
+    def refresh_resources(self, game_state):
         # Generate 1 resource per round
         #stop suggesting that getting resources from a hero exhausts the hero. it does not.
-        console.print(f"Adding 1 [{self.getColour()}]{self.sphere}[/{self.getColour()}] resource to {self.title}")
+        game_state.renderer.resource_added(self)
         self.resources[self.sphere] += 1
         
     def on_exhaust(self):
         pass
 
-    def render_panel(self, in_hand=False, show_description=True):
-        base_panel = super().render_panel(in_hand, show_description)
+    def _build_panel(self, in_hand, show_description):
+        base_panel = super()._build_panel(in_hand, show_description)
         # Add hero-specific status
         status = []
         if self.exhausted:
@@ -193,8 +577,10 @@ class Hero(Card):
         return base_panel
             
 class ResourceAttachment(Card):
+    __slots__ = ('resource_type',)
+
     def __init__(self, title, sphere, resource_type):
-        super().__init__(title, 2, sphere)
+        super().__init__(CardDefinition(title, 2, sphere))
         self.resource_type = resource_type
         
     def generate_resources(self):
@@ -204,74 +590,90 @@ class ResourceAttachment(Card):
         return {self.resource_type: 2}
 
 class Event(Card):
-    def __init__(self, title, cost, sphere, effect):
-        super().__init__(title, cost, sphere)
+    __slots__ = ('effect',)
+
+    def __init__(self, title=None, cost=0, sphere=None, effect=None):
+        super().__init__(None if title is None else CardDefinition(title, cost, sphere))
         self.effect = effect
         
     def play(self, game_state, controller):
         self.effect.apply(game_state)
 
 class Location(Card):
-    def __init__(self, title, threat, quest_points, victory_points=0):
-        super().__init__(title, cost=0, sphere="Location")
-        self.threat = threat          # Threat added to staging area
-        self.quest_points = quest_points  # Progress needed to explore
-        self.victory_points = victory_points
+    __slots__ = ('_explored', '_progress')
+
+    explored = _changing_slot('_explored')
+    progress = _changing_slot('_progress')
+
+    def __init__(self, title=None, threat=0, quest_points=0, victory_points=0):
+        super().__init__(None if title is None else CardDefinition(
+            title, 0, "Location", threat=threat, quest_points=quest_points, victory_points=victory_points))
         self.explored = False
         self.progress = 0
+
+    threat = _definition_field('threat')  # Threat added to staging area
+    quest_points = _definition_field('quest_points')  # Progress needed to explore
+    victory_points = _definition_field('victory_points')
         
     def on_reveal(self, game_state, controller):
         #todo: hook for "before a location is revealed"
         """When revealed from the encounter deck"""
-        game_state.staging_area.append(self)
-        game_state.event_system.trigger_event(
-            "LocationRevealed",
-            {"location": self, "game_state": game_state}
-        )
+        game_state.move_card(self, game_state.staging_area)
+        events = game_state.event_system
+        if LOCATION_REVEALED in events.hooks:
+            events.trigger_event(LOCATION_REVEALED, LocationEvent(self, game_state))
         
     def on_travel(self, game_state):
         """When players travel to this location"""
         #todo: hook for "before a location is travelled to"
         self.progress = 0
         game_state.active_location = self
-        game_state.event_system.trigger_event(
-            "LocationTraveled",
-            {"location": self, "game_state": game_state}
-        )
+        events = game_state.event_system
+        if LOCATION_TRAVELED in events.hooks:
+            events.trigger_event(LOCATION_TRAVELED, LocationEvent(self, game_state))
         
     def on_explored(self, game_state):
         """When enough progress is placed to explore"""
         #todo: hook for "before a location is explored"
         self.explored = True
         if self.victory_points > 0:
-            game_state.victory_display.append(self)
-        game_state.event_system.trigger_event(
-            "LocationExplored",
-            {"location": self, "game_state": game_state}
-        )
+            game_state.move_card(self, game_state.victory_display)
+        events = game_state.event_system
+        if LOCATION_EXPLORED in events.hooks:
+            events.trigger_event(LOCATION_EXPLORED, LocationEvent(self, game_state))
         
+    def _state(self):
+        return (type(self), self.definition.title, self._exhausted, self._committed, self._explored, self._progress)
+
     def add_progress(self, amount, game_state):
-        game_state.event_system.trigger_event("BeforeAddProgress",
-            {"location": self, "amount": amount})
+        events = game_state.event_system
+        if BEFORE_ADD_PROGRESS in events.hooks:
+            events.trigger_event(BEFORE_ADD_PROGRESS, LocationEvent(self, game_state, None, amount))
         self.progress += amount
-        game_state.event_system.trigger_event("AfterAddProgress",
-            {"location": self, "amount": amount})
+        if AFTER_ADD_PROGRESS in events.hooks:
+            events.trigger_event(AFTER_ADD_PROGRESS, LocationEvent(self, game_state, None, amount))
         if self.progress >= self.quest_points:
             self.on_explored(game_state)
             return True  # Location explored
         return False
 
-    def render_panel(self, in_hand=False, show_description=True):
-        panel = super().render_panel(in_hand, show_description)
+    def _build_panel(self, in_hand, show_description):
+        panel = super()._build_panel(in_hand, show_description)
         progress_bar = Text(
             f"Progress: {'■' * self.progress}{'□' * (self.quest_points - self.progress)}"
         )
         return Panel(Group(panel, progress_bar), border_style=self.getColour())
 
 class Attachment(Card):
-    def __init__(self, title, cost, sphere):
-        super().__init__(title, cost, sphere)
+    __slots__ = ('_attached_to', '_played_by')
+
+    attached_to = _journaled_slot('_attached_to')
+    played_by = _journaled_slot('_played_by')  # The player whose discard pile it goes to
+
+    def __init__(self, title=None, cost=0, sphere=None):
+        super().__init__(None if title is None else CardDefinition(title, cost, sphere))
         self.attached_to = None
+        self.played_by = None
         
     def play(self, game_state, controller):
         valid_targets = self.get_valid_targets(game_state)
@@ -297,29 +699,16 @@ class Attachment(Card):
         targets += game_state.staging_area
         return [t for t in targets if self.can_attach_to(t,game_state)]
 
-        
-    def get_player_cards(self, player):
-        return [
-            *player.play_area['heroes'],
-            *player.play_area['allies'],
-            #todo: cards have attachments, not players and not the play area.
-            # *player.play_area['attachments'],
-        ]
-        
     def can_attach_to(self, target, game_state):
-        # Check if target is in valid area
-        in_play_area = any(
-            target in self.get_player_cards(player)
-            for player in game_state.players
-        )
-        in_staging = target in game_state.staging_area
-        
-        return (in_play_area or in_staging) and not self.attached_to
+        # Characters in a play area and cards in the staging area can take attachments
+        zone = target.zone
+        return zone is not None and zone.name in ('heroes', 'allies', 'staging_area') and not self.attached_to
         
     def attach_to(self, target, game_state):
         #todo: hook for "before adding an attachment to a character"
         self.attached_to = target
-        target.attachments.append(self)
+        self.played_by = self.owner or target.owner
+        game_state.move_card(self, target.attachment_zone())
         self.parent = target
                 
         self.on_attach(game_state)
@@ -330,22 +719,34 @@ class Attachment(Card):
         pass
 
 class Enemy(Card):
-    def __init__(self, title, engagement, attack, defense, hit_points):
-        super().__init__(title, 0, "Enemy")
-        self.engagement = engagement
-        self.attack = attack
-        self.defense = defense
-        self.hit_points = hit_points
+    __slots__ = ('attack', 'defense', '_hit_points', '_engaged_player')
+
+    hit_points = _changing_slot('_hit_points')
+    engaged_player = _journaled_slot('_engaged_player')
+
+    def __init__(self, title=None, engagement=0, attack=0, defense=0, hit_points=0, threat=0):
+        super().__init__(None if title is None else CardDefinition(
+            title, 0, "Enemy", engagement=engagement, attack=attack, defense=defense,
+            hit_points=hit_points, threat=threat))
+        definition = self.definition
+        self.attack = definition.attack
+        self.defense = definition.defense
+        self.hit_points = definition.hit_points
         self.engaged_player = None
 
+    engagement = _definition_field('engagement')
+    threat = _definition_field('threat')  # Threat added to staging area
+
     #todo: Follow game rules for engagement (e.g., engage first eligible player in turn order).
     
+    def _state(self):
+        return (type(self), self.definition.title, self._exhausted, self._committed, self.attack, self.defense, self._hit_points)
+
     def play(self, game_state, controller):
         pass
 
     def engage(self, player, game_state):
         self.engaged_player = player
-        game_state.staging_area.remove(self)
-        player.engaged_enemies.append(self)
+        game_state.move_card(self, player.engaged_enemies)
 
 
@@ -0,0 +1,232 @@
+from core import *
+from actions import Decision
+
+USE_ABILITY = "use_ability"
+CHOOSE_OPTION = "choose_option"
+
+
+class HeadlessController(GameController, ABC):
+    """Base for controllers that make every decision without a human at the keyboard.
+
+    Every choose_* method funnels into decide(), which is given the name of the
+    decision, the candidate options and whether several may be picked, and
+    returns the indices of the chosen options. Optional decisions offer None as
+    their last option to mean "pass". Card abilities ask USE_ABILITY (Yes or
+    No) and CHOOSE_OPTION without formatting their prompts. While decide() runs
+    the decision is posted as game_state.pending_decision, for actions.py;
+    the controller fills in the same Decision every time, so copy anything
+    that has to outlive it. If record is set to a GameRecord, every choice
+    made is appended to it.
+    """
+    record = None
+    _pending = None  # The Decision posted while deciding, made at the first decision
+
+    @abstractmethod
+    def decide(self, decision, options, multi_select=False):
+        pass
+
+    def _decide(self, decision, options, multi_select=False):
+        game = self.game
+        if game is None:
+            choice = self.decide(decision, options, multi_select)
+        else:
+            game_state = game.game_state
+            pending = self._pending
+            if pending is None:
+                pending = self._pending = Decision(None, ())
+            pending.name, pending.options, pending.multi_select = decision, options, multi_select
+            pending.version = game_state.version = game_state.version + 1
+            game_state.pending_decision = pending
+            choice = self.decide(decision, options, multi_select)
+            game_state.pending_decision = None
+        if self.record is not None:
+            self.record.add(choice, multi_select)
+        return choice
+
+    def _pick_one(self, decision, options):
+        choice = self._decide(decision, options)
+        return options[choice[0]] if choice else None
+
+    def display_game_state(self):
+        pass
+
+    def inspect_card(self):
+        pass
+
+    def get_choice(self, prompt, options, multi_select=False):
+        return self._decide(prompt, options, multi_select)
+
+    def choose_player(self, players):
+        return self._pick_one("player", players)
+
+    def use_ability(self, card, prompt):
+        choice = self._decide(USE_ABILITY, YES_NO)
+        return bool(choice) and choice[0] == 0
+
+    def choose_option(self, card, prompt, options):
+        choice = self._decide(CHOOSE_OPTION, options)
+        return choice[0] if choice else None
+
+    def choose_card_to_play(self, player):
+        return self._pick_one("card_to_play", player.affordable_cards() + [None])
+
+    def choose_characters_to_commit(self, player, available):
+        return [available[i] for i in self._decide("commit", available, multi_select=True)]
+
+    def choose_defender(self, player, enemy, valid_defenders):
+        return self._pick_one("defender", valid_defenders + [None])
+
+    def choose_enemy_to_attack(self, player, enemies):
+        return self._pick_one("enemy_to_attack", enemies + [None])
+
+    def choose_attackers(self, valid_attackers):
+        return [valid_attackers[i] for i in self._decide("attackers", valid_attackers, multi_select=True)]
+
+    def choose_location_to_travel(self, locations):
+        if not locations:
+            return None
+        return self._pick_one("location_to_travel", locations)
+
+    def choose_attachment_target(self, valid_targets):
+        return self._pick_one("attachment_target", valid_targets)
+
+
+class SeatedController(HeadlessController, ABC):
+    """Base for headless controllers that pass each decision to the player it belongs to.
+
+    acting_player() is the player a decision is asked about, or whose card's
+    ability it is. The choices that follow (attackers after the enemy to
+    attack, a player to target) stay with that player; decisions about
+    encounter cards, or made before anyone has acted in a phase, belong to
+    the active player.
+    """
+    acting = None
+
+    def acting_player(self):
+        return self.acting if self.acting is not None else self.game.game_state.active_player
+
+    def _act_for_card(self, card):
+        self.acting = card.owner
+
+    def begin_phase(self, phase):
+        self.acting = None
+
+    def choose_card_to_play(self, player):
+        self.acting = player
+        return super().choose_card_to_play(player)
+
+    def choose_characters_to_commit(self, player, available):
+        self.acting = player
+        return super().choose_characters_to_commit(player, available)
+
+    def choose_defender(self, player, enemy, valid_defenders):
+        self.acting = player
+        return super().choose_defender(player, enemy, valid_defenders)
+
+    def choose_enemy_to_attack(self, player, enemies):
+        self.acting = player
+        return super().choose_enemy_to_attack(player, enemies)
+
+    def use_ability(self, card, prompt):
+        self._act_for_card(card)
+        return super().use_ability(card, prompt)
+
+    def choose_option(self, card, prompt, options):
+        self._act_for_card(card)
+        return super().choose_option(card, prompt, options)
+
+
+class _Reached(Exception):
+    """Stops a look-ahead game at its first decision"""
+
+    def __init__(self, decision):
+        self.decision = decision
+
+
+class _PeekController(HeadlessController):
+    def decide(self, decision, options, multi_select=False):
+        raise _Reached(Decision(decision, options, multi_select, self.game.game_state.version))
+
+
+def next_decision(game, max_rounds=None):
+    """The Decision game will ask next, or None if it ends first.
+
+    Inside a decision game_state.pending_decision has it; this is for a game
+    between decisions, before resume() or between phases. A copy of the game
+    is played on to its first decision, so the game itself is left as it is
+    and the options belong to the copy. Its actions are the state's legal
+    actions.
+    """
+    try:
+        game.clone(_PeekController(), NullRenderer()).resume(max_rounds)
+    except _Reached as reached:
+        return reached.decision
+    return None
+
+
+class RandomController(HeadlessController):
+    """Picks uniformly among the legal options; each multi-select option is taken with even odds"""
+
+    def __init__(self, seed=None, game=None):
+        super().__init__(game)
+        self.rng = random.Random(seed)
+
+    def decide(self, decision, options, multi_select=False):
+        if multi_select:
+            return [i for i in range(len(options)) if self.rng.random() < 0.5]
+        if not options:
+            return []
+        return [self.rng.randrange(len(options))]
+
+
+class ScriptedController(HeadlessController):
+    """Replays a fixed list of decisions, one entry (index or list of indices) per decision.
+
+    Once the script runs out the fallback controller decides, if one is given.
+    """
+
+    def __init__(self, decisions, fallback=None, game=None):
+        super().__init__(game)
+        self.decisions = list(decisions)
+        self.position = 0
+        self.fallback = fallback
+
+    def decide(self, decision, options, multi_select=False):
+        if self.position >= len(self.decisions):
+            if self.fallback is None:
+                raise IndexError(f"Script exhausted at decision '{decision}'")
+            return self.fallback.decide(decision, options, multi_select)
+        choice = self.decisions[self.position]
+        self.position += 1
+        return list(choice) if isinstance(choice, (list, tuple)) else [choice]
+
+
+class PolicyController(HeadlessController):
+    """Delegates every decision to policy(game_state, decision, options, multi_select)"""
+
+    def __init__(self, policy, game=None):
+        super().__init__(game)
+        self.policy = policy
+
+    def decide(self, decision, options, multi_select=False):
+        choice = self.policy(self.game.game_state, decision, options, multi_select)
+        return list(choice) if isinstance(choice, (list, tuple)) else [choice]
+
+
+def greedy_policy(game_state, decision, options, multi_select=False):
+    """Simple baseline: commit and attack with everyone, play the priciest card, block with the best defender"""
+    if multi_select:
+        return list(range(len(options)))
+    if not options:
+        return []
+    if decision == "card_to_play":
+        cards = [c for c in options if c is not None]
+        if not cards:
+            return len(options) - 1
+        return options.index(max(cards, key=lambda c: c.cost))
+    if decision == "defender":
+        defenders = [c for c in options if c is not None]
+        if not defenders:
+            return len(options) - 1
+        return options.index(max(defenders, key=lambda c: (c.defense, c.hit_points)))
+    return 0
@@ -1,73 +1,626 @@
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+import difflib
+from hashlib import blake2b
+import heapq
+from operator import attrgetter
 import random
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.console import Console, Group
-from rich.text import Text
-from rich.layout import Layout
-from rich.columns import Columns
+from render import Renderer, NullRenderer, PlainRenderer, RichRenderer, LiveRenderer
+from events import *
+from journal import Journal, NO_JOURNAL, journal_assignments, undo_append
 
 
 console = Console()
 
+_SHARED_TYPES = (int, str, bool, float, type(None))
+
+
+def clone_object(value, memo):
+    """Copy one piece of game state for GameState.clone().
+
+    memo maps id(original) -> copy, so each object is copied once and objects
+    that were shared stay shared. Cards, players and effects copy themselves
+    through _clone(); lists, dicts and sets are copied element by element;
+    anything else (CardDefinitions, renderers, phases) is shared as is.
+    """
+    if type(value) in _SHARED_TYPES:
+        return value
+    copy = memo.get(id(value))
+    if copy is not None:
+        return copy
+    if type(value) is list:
+        copy = [clone_object(v, memo) for v in value]
+    elif type(value) is dict or type(value) is defaultdict:
+        copy = value.copy()
+        for key, v in copy.items():
+            copy[key] = clone_object(v, memo)
+    elif type(value) is set:
+        copy = set(value)
+    elif hasattr(value, '_clone'):
+        return value._clone(memo)
+    else:
+        return value
+    memo[id(value)] = copy
+    return copy
+
+
+def _clone_attributes(obj, memo):
+    """_clone() for plain objects that keep their state in __dict__"""
+    copy = object.__new__(type(obj))
+    memo[id(obj)] = copy
+    copy.__dict__.update({name: clone_object(value, memo) for name, value in obj.__dict__.items()})
+    return copy
+
+
+class Zone(list):
+    """The cards in one place: a hand, a deck, a play area, the staging area, ...
+
+    Every card records the zone it is in (card.zone), so `card in zone` and
+    finding a card's owner take constant time. Adding a card takes it out of
+    the zone it was in, so a card is never in two zones. The game moves cards
+    with GameState.move_card(), which also fires CARD_MOVED. Item assignment
+    is left alone so shuffling stays fast; shuffle with shuffle(), which the
+    journal sees, and use it only to reorder a zone.
+    """
+    __slots__ = ('name', 'owner', '_sum', '_index', '_journal')
+
+    def __init__(self, name, owner=None, cards=()):
+        super().__init__()
+        self.name = name
+        self.owner = owner  # Player for player zones, the host card for attachments, else None
+        self._sum = None  # Sum of the cards' state keys, None until needed again after a change
+        self._index = None  # The game's CardIndex, once it has been built
+        self._journal = NO_JOURNAL  # The game's Journal, once the zone is in a game
+        self.extend(cards)
+
+    def _take(self, card):
+        old = getattr(card, 'zone', None)
+        if isinstance(old, Zone):
+            if old is not self:
+                old.remove(card)
+        elif self._index is not None:  # Entering the game, or coming back to a zone
+            self._index.add(card)
+        card.zone = self
+        card._journal = self._journal
+        self._sum = None
+
+    def append(self, card):
+        self._take(card)
+        list.append(self, card)
+        journal = self._journal
+        if journal.recording:
+            journal.record(self.pop)
+
+    def insert(self, index, card):
+        self._take(card)
+        journal = self._journal
+        if journal.recording:
+            size = len(self)
+            journal.record(self.pop, min(index if index >= 0 else max(0, size + index), size))
+        list.insert(self, index, card)
+
+    def extend(self, cards):
+        for card in cards:
+            self.append(card)
+
+    def __iadd__(self, cards):
+        self.extend(cards)
+        return self
+
+    def remove(self, card):
+        if self and self[-1] is card:  # Usually the top of a deck
+            index = len(self) - 1
+            list.pop(self)
+        else:
+            index = list.index(self, card)
+            del self[index]
+        card.zone = None
+        self._sum = None
+        journal = self._journal
+        if journal.recording:
+            journal.record(self.insert, index, card)
+
+    def pop(self, index=-1):
+        card = list.pop(self, index)
+        card.zone = None
+        self._sum = None
+        journal = self._journal
+        if journal.recording:
+            journal.record(self.insert, index if index >= 0 else len(self) + 1 + index, card)
+        return card
+
+    def clear(self):
+        journal = self._journal
+        if journal.recording and self:
+            journal.record(self.extend, list(self))
+        for card in self:
+            card.zone = None
+        list.clear(self)
+        self._sum = None
+
+    def shuffle(self, rng):
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._reorder, list(self))
+        rng.shuffle(self)
+
+    def _reorder(self, cards):
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._reorder, list(self))
+        list.__setitem__(self, slice(None), cards)
+
+    def refill(self, cards):
+        """Replace the contents of this zone with cards"""
+        cards = list(cards)
+        self.clear()
+        self.extend(cards)
+
+    def __contains__(self, card):
+        return getattr(card, 'zone', None) is self
+
+    def card_changed(self, card):
+        """Called by Card.changed() when the state of a card in this zone changes"""
+        self._sum = None
+
+    def state_key(self):
+        """Sum of the state keys of the cards here, whatever their order (see GameState.state_hash)"""
+        key = self._sum
+        if key is None:
+            key = 0
+            for card in self:
+                key += card.state_key()
+            key = self._sum = key & ZobristKeys.MASK
+        return key
+
+    def __repr__(self):
+        return f"Zone({self.name!r}, {list.__repr__(self)})"
+
+    def __reduce__(self):
+        return type(self), (self.name,), (self.owner, self._journal), iter(self)
+
+    def __setstate__(self, state):
+        self.owner, self._journal = state
+
+    def _clone(self, memo):
+        copy = type(self)(self.name)
+        memo[id(self)] = copy
+        copy.owner = clone_object(self.owner, memo)
+        copy._journal = clone_object(self._journal, memo)
+        list.extend(copy, [clone_object(card, memo) for card in self])
+        copy._sum = self._sum  # The cards' keys are copied with them
+        return copy
+
+
+class ResourcePool(dict):
+    """A hero's resources by sphere; missing spheres read as 0.
+
+    While the hero is in a player's HeroZone, totals is that player's
+    resources dict and every change to the pool is applied to it as well,
+    and card is the hero, whose state the pool is part of.
+    """
+    totals = None
+    card = None
+    _journal = NO_JOURNAL
+
+    def __missing__(self, sphere):
+        return 0
+
+    def __setitem__(self, sphere, amount):
+        journal = self._journal
+        if journal.recording:
+            if sphere in self:
+                journal.record(self.__setitem__, sphere, dict.__getitem__(self, sphere))
+            else:
+                journal.record(self.__delitem__, sphere)
+        totals = self.totals
+        if totals is not None:
+            totals[sphere] = totals.get(sphere, 0) + amount - self.get(sphere, 0)
+        dict.__setitem__(self, sphere, amount)
+        if self.card is not None:
+            self.card.changed()
+
+    def __delitem__(self, sphere):
+        self[sphere] = 0
+        dict.__delitem__(self, sphere)
+
+    def clear(self):
+        for sphere in list(self):
+            del self[sphere]
+
+    def _clone(self, memo):
+        copy = ResourcePool(self)
+        memo[id(self)] = copy
+        copy.totals = clone_object(self.totals, memo)
+        copy.card = clone_object(self.card, memo)
+        copy._journal = clone_object(self._journal, memo)
+        return copy
+
+
+class CharacterZone(Zone):
+    """A player's heroes or allies; any change to them resets the player's character views"""
+    __slots__ = ()
+
+    def _reset_views(self):
+        if self.owner is not None:
+            self.owner.characters.reset()
+
+    def card_changed(self, card):
+        self._sum = None
+        self._reset_views()
+
+    def append(self, card):
+        Zone.append(self, card)
+        self._reset_views()
+
+    def insert(self, index, card):
+        Zone.insert(self, index, card)
+        self._reset_views()
+
+    def remove(self, card):
+        Zone.remove(self, card)
+        self._reset_views()
+
+    def pop(self, index=-1):
+        card = Zone.pop(self, index)
+        self._reset_views()
+        return card
+
+    def clear(self):
+        Zone.clear(self)
+        self._reset_views()
+
+
+class CharacterViews:
+    """A player's characters, heroes then allies, grouped by state.
+
+    Each view is a list built on first use and kept until a character enters
+    or leaves play or is exhausted, readied, committed or uncommitted, so bots
+    can ask for them as often as they like. Views are shared: copy one before
+    changing it.
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self._views = {}
+
+    def reset(self):
+        if self._views:
+            self._views = {}
+
+    def _view(self, name, test):
+        views = self._views
+        view = views.get(name)
+        if view is None:
+            view = views[name] = [c for c in self.all if test(c)]
+        return view
+
+    @property
+    def all(self):
+        views = self._views
+        view = views.get('all')
+        if view is None:
+            play_area = self.player.play_area
+            view = views['all'] = play_area['heroes'] + play_area['allies']
+        return view
+
+    @property
+    def ready(self):
+        return self._view('ready', lambda c: not c.exhausted)
+
+    @property
+    def exhausted(self):
+        return self._view('exhausted', lambda c: c.exhausted)
+
+    @property
+    def committed(self):
+        return self._view('committed', lambda c: c.committed)
+
+    @property
+    def questers(self):
+        """Ready characters that can be committed to the quest"""
+        return self._view('questers', lambda c: not c.exhausted and c.can_quest())
+
+    @property
+    def defenders(self):
+        """Ready characters that can defend"""
+        return self._view('defenders', lambda c: not c.exhausted and c.can_defend())
+
+    @property
+    def attackers(self):
+        """Ready characters that can attack"""
+        return self._view('attackers', lambda c: not c.exhausted and c.can_attack)
+
+    def __getstate__(self):
+        return {'player': self.player}
+
+    def __setstate__(self, state):
+        self.player = state['player']
+        self._views = {}
+
+    def _clone(self, memo):
+        copy = CharacterViews(None)
+        memo[id(self)] = copy
+        copy.player = clone_object(self.player, memo)
+        return copy
+
+
+class HeroZone(CharacterZone):
+    """A player's heroes. Keeps the player's resources, per sphere, equal to
+    the sum of the heroes' resource pools as heroes come and go."""
+    __slots__ = ()
+
+    def _link(self, hero):
+        pool = getattr(hero, 'resources', None)
+        if isinstance(pool, ResourcePool) and self.owner is not None:
+            totals = pool.totals = self.owner.resources
+            for sphere, amount in pool.items():
+                totals[sphere] = totals.get(sphere, 0) + amount
+            pool.card = hero
+            pool._journal = self._journal
+
+    def _unlink(self, hero):
+        pool = getattr(hero, 'resources', None)
+        if isinstance(pool, ResourcePool) and pool.totals is not None:
+            totals = pool.totals
+            for sphere, amount in pool.items():
+                totals[sphere] -= amount
+            pool.totals = None
+            pool.card = None
+
+    def append(self, card):
+        CharacterZone.append(self, card)
+        self._link(card)
+
+    def insert(self, index, card):
+        CharacterZone.insert(self, index, card)
+        self._link(card)
+
+    def remove(self, card):
+        CharacterZone.remove(self, card)
+        self._unlink(card)
+
+    def pop(self, index=-1):
+        card = CharacterZone.pop(self, index)
+        self._unlink(card)
+        return card
+
+    def clear(self):
+        for card in self:
+            self._unlink(card)
+        CharacterZone.clear(self)
+
+
+class StagingArea(Zone):
+    """The staging area. Keeps the total threat of its cards, and its enemies
+    ordered by engagement cost, so quest resolution and engagement checks do
+    not walk every card in it."""
+    __slots__ = ('threat', '_keys', '_enemies', '_enemy_keys', '_arrivals')
+
+    def __init__(self, name='staging_area', owner=None, cards=()):
+        self.threat = 0
+        self._keys = []  # (engagement cost, arrival number) of each enemy, sorted
+        self._enemies = []  # The enemies, in the order of _keys
+        self._enemy_keys = {}  # id(enemy) -> its key
+        self._arrivals = 0
+        Zone.__init__(self, name, owner, cards)
+
+    def _added(self, card):
+        self.threat += getattr(card, 'threat', 0)
+        if isinstance(card, Enemy):
+            self._arrivals += 1
+            key = self._enemy_keys[id(card)] = (card.engagement, self._arrivals)
+            index = bisect_right(self._keys, key)
+            self._keys.insert(index, key)
+            self._enemies.insert(index, card)
+
+    def _removed(self, card):
+        self.threat -= getattr(card, 'threat', 0)
+        key = self._enemy_keys.pop(id(card), None)
+        if key is not None:
+            index = bisect_left(self._keys, key)
+            del self._keys[index]
+            del self._enemies[index]
+
+    def _journal_key(self, card):
+        # Undoing the removal of an enemy has to give it back its place in the arrival order
+        key = self._enemy_keys.get(id(card))
+        if key is not None:
+            self._journal.record(self._rekey, card, key)
+
+    def _rekey(self, card, key):
+        old = self._enemy_keys[id(card)]
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._rekey, card, old)
+        index = bisect_left(self._keys, old)
+        del self._keys[index]
+        del self._enemies[index]
+        self._enemy_keys[id(card)] = key
+        index = bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._enemies.insert(index, card)
+
+    def enemies_within(self, threat):
+        """The enemies with an engagement cost of at most threat, in the order they arrived"""
+        count = bisect_right(self._keys, (threat, float('inf')))
+        if count < 2:
+            return self._enemies[:count]
+        keys = self._enemy_keys
+        return sorted(self._enemies[:count], key=lambda enemy: keys[id(enemy)][1])
+
+    def append(self, card):
+        Zone.append(self, card)
+        self._added(card)
+
+    def insert(self, index, card):
+        Zone.insert(self, index, card)
+        self._added(card)
+
+    def remove(self, card):
+        if self._journal.recording:
+            self._journal_key(card)
+        Zone.remove(self, card)
+        self._removed(card)
+
+    def pop(self, index=-1):
+        if self._journal.recording:
+            self._journal_key(self[index])
+        card = Zone.pop(self, index)
+        self._removed(card)
+        return card
+
+    def clear(self):
+        recording = self._journal.recording
+        for card in self:
+            if recording:
+                self._journal_key(card)
+            self._removed(card)
+        Zone.clear(self)
+
+    def _clone(self, memo):
+        copy = StagingArea(self.name)
+        memo[id(self)] = copy
+        copy.owner = clone_object(self.owner, memo)
+        copy._journal = clone_object(self._journal, memo)
+        for card in self:
+            card = clone_object(card, memo)
+            list.append(copy, card)
+            copy._added(card)
+        copy._sum = self._sum
+        return copy
+
+
+_UNSET = object()
+
+IN_PLAY_ZONES = frozenset(('heroes', 'allies', 'engaged_enemies', 'staging_area', 'attachments'))
+
+
+# GameState attributes kept out of the journal: an undone game must not reuse a
+# decision's version, and the pending decision is posted and cleared by its controller
+_UNJOURNALED = frozenset(('version', 'pending_decision'))
+
+
+def _journaled_setattr(obj, name, value):
+    """__setattr__ of game objects keeping their state in __dict__ while any
+    game is journaled: journals the old value if obj's own game is. Properties
+    journal what they change themselves."""
+    journal = obj._journal
+    if journal.recording and name not in _UNJOURNALED and not isinstance(getattr(type(obj), name, None), property):
+        journal.record(_restore_attribute, obj, name, obj.__dict__.get(name, _UNSET))
+    object.__setattr__(obj, name, value)
+
+
+def _restore_attribute(obj, name, value):
+    journal = obj._journal
+    if journal.recording:
+        journal.record(_restore_attribute, obj, name, obj.__dict__.get(name, _UNSET))
+    if value is _UNSET:
+        object.__delattr__(obj, name)
+    else:
+        object.__setattr__(obj, name, value)
+
+
+def _restore_rng(game_state, state):
+    rng = game_state.rng
+    journal = game_state.journal
+    if journal.recording:
+        journal.record(_restore_rng, game_state, rng.getstate())
+    rng.setstate(state)
+
+
+def _zone_attribute(name):
+    """A property for a zone kept in _<name>: assigning cards refills the zone, assigning a Zone replaces it"""
+    attribute = '_' + name
+
+    def set_zone(obj, value):
+        if isinstance(value, Zone):
+            _journaled_setattr(obj, attribute, value)
+        else:
+            getattr(obj, attribute).refill(value)
+    return property(attrgetter(attribute), set_zone)
+
+
+class PlayArea(dict):
+    """A player's in-play zones by kind; assigning a list to a kind refills its zone"""
+
+    def __setitem__(self, key, value):
+        zone = self.get(key)
+        if isinstance(zone, Zone) and not isinstance(value, Zone):
+            zone.refill(value)
+        else:
+            dict.__setitem__(self, key, value)
+
+    def _clone(self, memo):
+        copy = PlayArea()
+        memo[id(self)] = copy
+        for key, zone in self.items():
+            dict.__setitem__(copy, key, clone_object(zone, memo))
+        return copy
+
+
 class Player:
     def __init__(self, name):
         self.name = name
         self.threat = 0  # Will be updated when heroes are added
-        self.deck = []
-        self.hand = []
-        self.discard_pile = []
-        self.play_area = {
-            'heroes': [],
-            'allies': [],
-        }
-        self.engaged_enemies = []
+        self.deck = Zone('deck', self)
+        self.hand = Zone('hand', self)
+        self.discard_pile = Zone('discard_pile', self)
+        self.resources = {}  # Sphere -> resources on this player's heroes, kept by HeroZone
+        self.characters = CharacterViews(self)
+        self.play_area = PlayArea(
+            heroes=HeroZone('heroes', self),
+            allies=CharacterZone('allies', self),
+        )
+        self.engaged_enemies = Zone('engaged_enemies', self)
         self.new_allies_this_round = []
+
+    _journal = NO_JOURNAL  # The game's Journal, once the player is in a game
+    deck = _zone_attribute('deck')
+    hand = _zone_attribute('hand')
+    discard_pile = _zone_attribute('discard_pile')
+    engaged_enemies = _zone_attribute('engaged_enemies')
         
     def render(self, game_state):
-        # Build list of renderables for the hand
-        hand_renderables = []
-        for i, card in enumerate(self.hand, 1):
-            hand_renderables.append(card.render_panel(in_hand=True, show_description=True))
-        
-        # Create Group with all renderables
-        hand_group = Group(*hand_renderables)
-        
-        panel = Panel(
-            hand_group,
-            title=f":bust_in_silhouette: {self.name}'s Hand",
-            subtitle=f"Threat: [red]{self.threat}",
-            expand=False
-        )
-        console.print(panel)
+        game_state.renderer.hand(self)
+
+    def _clone(self, memo):
+        return _clone_attributes(self, memo)
     
     def draw_card(self, game_state, num=1):
+        events = game_state.event_system
         for _ in range(num):
-            game_state.event_system.trigger_event("BeforeDrawCard", {"player": self})
-            console.print(f"[yellow]{self.name}[/yellow] is drawing a card...")
+            if BEFORE_DRAW_CARD in events.hooks:
+                events.trigger_event(BEFORE_DRAW_CARD, PlayerEvent(self))
+            renderer = game_state.renderer
+            renderer.drawing_card(self)
             if len(self.deck) == 0:
-                console.print("\tThe deck is empty. Reshuffling the discard into the deck.")
+                renderer.deck_reshuffled(self)
                 self.reshuffle_discard(game_state)
                 if len(self.deck) == 0:  # Still empty after reshuffle
-                    console.print("[red]Still no cards in the deck, this means you lose![/red]")
+                    renderer.deck_exhausted(self)
                     self.threat = 50  # Immediate loss condition
                     return
             if len(self.deck) > 0:
-                drawn_card = self.deck.pop()
-                colour = drawn_card.getColour()
-                console.print(f"\tDrawn card: [{colour}]{drawn_card.title}[/{colour}]")
-                self.hand.append(drawn_card)
-                game_state.event_system.trigger_event("AfterDrawCard", {"player": self, "card": drawn_card})
+                drawn_card = self.deck[-1]
+                renderer.card_drawn(self, drawn_card)
+                game_state.move_card(drawn_card, self.hand)
+                if AFTER_DRAW_CARD in events.hooks:
+                    events.trigger_event(AFTER_DRAW_CARD, CardEvent(drawn_card, self))
                 
                 
     def reshuffle_discard(self, game_state):
-        game_state.event_system.trigger_event("BeforeReshuffleDiscard", {"player": self})
-        self.deck.extend(self.discard_pile)
-        self.discard_pile = []
-        random.shuffle(self.deck)
-        game_state.event_system.trigger_event("AfterReshuffleDiscard", {"player": self})
+        """Shuffle the discard pile back into the deck; defeated heroes stay in the discard pile"""
+        events = game_state.event_system
+        if BEFORE_RESHUFFLE_DISCARD in events.hooks:
+            events.trigger_event(BEFORE_RESHUFFLE_DISCARD, PlayerEvent(self))
+        for card in [card for card in self.discard_pile if not isinstance(card, Hero)]:
+            game_state.move_card(card, self.deck)
+        self.deck.shuffle(game_state.rng)
+        if AFTER_RESHUFFLE_DISCARD in events.hooks:
+            events.trigger_event(AFTER_RESHUFFLE_DISCARD, PlayerEvent(self))
     
     def calculate_threat(self):
         """Update threat based on heroes' threat costs"""
@@ -75,45 +628,48 @@ class Player:
         
     def play_card(self, card, game_state, controller):
         if self.can_afford(card.cost, card.sphere):
-            game_state.event_system.trigger_event("BeforeAnyCardPlayed", {"card": card, "player": self})
+            events = game_state.event_system
+            if BEFORE_ANY_CARD_PLAYED in events.hooks:
+                events.trigger_event(BEFORE_ANY_CARD_PLAYED, CardEvent(card, self))
             self.deduct_resources(card.cost, card.sphere, game_state)
-            self.hand.remove(card)  # Remove from hand
             
             # Handle different card types
-            card_type = "card"
             if isinstance(card, Hero):
-                self.play_area['heroes'].append(card)
-                
+                game_state.move_card(card, self.play_area['heroes'])
             elif isinstance(card, Ally):
-                self.play_area['allies'].append(card)
+                game_state.move_card(card, self.play_area['allies'])
                 card.parent = self
+                journal = self._journal
+                if journal.recording:
+                    journal.record(undo_append, journal, self.new_allies_this_round)
                 self.new_allies_this_round.append(card)  # Track new allies
-            elif isinstance(card, Attachment):
-                pass  # Handled in Attachment.play()
             elif isinstance(card, Event):
-                self.discard_pile.append(card)  # Events go to discard after play
+                game_state.move_card(card, self.discard_pile)  # Events go to discard after play
+            # Attachments leave the hand when Attachment.play() attaches them
             
-            card.play(game_state, controller)
-            game_state.event_system.trigger_event(f"AfterCardPlayed", {"card": card, "player": self})
+            if card.play(game_state, controller) is False and card in self.hand:
+                game_state.move_card(card, self.discard_pile)  # Nothing to attach to
+            if AFTER_CARD_PLAYED in events.hooks:
+                events.trigger_event(AFTER_CARD_PLAYED, CardEvent(card, self))
 
             
     def can_afford(self, cost, sphere):
-        # Calculate total available resources from all eligible cards
-        return self.get_available_resources(sphere) >= cost
+        return self.resources.get(sphere, 0) >= cost
         
     def get_available_resources(self, sphere):
-        """Correctly iterate through all resource-providing cards"""
-        total = 0
-        # Heroes
-        for hero in self.play_area['heroes']:
-            total += hero.resources.get(sphere, 0)
-        return total
+        """Resources of a sphere across this player's heroes"""
+        return self.resources.get(sphere, 0)
+
+    def affordable_cards(self, cards=None):
+        """The cards, from the hand by default, that could be paid for right now"""
+        resources = self.resources
+        return [card for card in (self.hand if cards is None else cards)
+                if resources.get(card.sphere, 0) >= card.cost]
         
     def deduct_resources(self, amount, sphere, game_state):
-        game_state.event_system.trigger_event(
-            "BeforeDeductingResources",
-            {"player": self, "sphere": sphere, "amount": amount}
-        )
+        events = game_state.event_system
+        if BEFORE_DEDUCTING_RESOURCES in events.hooks:
+            events.trigger_event(BEFORE_DEDUCTING_RESOURCES, ResourceEvent(self, sphere, amount))
         remaining = amount
         
         for hero in self.play_area['heroes']:
@@ -125,46 +681,39 @@ class Player:
                 remaining -= use
                 hero.exhausted = True
                 hero.on_exhaust()
-                game_state.event_system.trigger_event(
-                    "AfterExhausted",
-                    {"card": hero, "player": self}
-                )
-        game_state.event_system.trigger_event(
-            "AfterDeductingResources",
-            {"player": self, "sphere": sphere, "amount": amount}
-        )
+                if AFTER_EXHAUSTED in events.hooks:
+                    events.trigger_event(AFTER_EXHAUSTED, CardEvent(hero, self))
+        if AFTER_DEDUCTING_RESOURCES in events.hooks:
+            events.trigger_event(AFTER_DEDUCTING_RESOURCES, ResourceEvent(self, sphere, amount))
 
-    def refresh_resources(self):
+    def refresh_resources(self, game_state):
         """Reset card resources and ready exhausted cards"""
         for hero in self.play_area['heroes']:
-            hero.refresh_resources()
+            hero.refresh_resources(game_state)
 
     def select_card_to_play(self, controller):
         return controller.choose_card_to_play(self)
         
     def select_defender(self, enemy, controller):
-        game_state = controller.game.game_state
-        game_state.event_system.trigger_event("BeforeSelectDefender", 
-            {"player": self, "enemy": enemy})
-        
-        valid_defenders = [c for c in self.play_area['heroes'] + self.play_area['allies']
-                        if not c.exhausted and c.can_defend()]
+        events = controller.game.game_state.event_system
+        if BEFORE_SELECT_DEFENDER in events.hooks:
+            events.trigger_event(BEFORE_SELECT_DEFENDER, DefenderEvent(self, enemy, None))
         
-        defender = controller.choose_defender(self, enemy, valid_defenders)
+        defender = controller.choose_defender(self, enemy, self.characters.defenders)
         
-        game_state.event_system.trigger_event("AfterSelectDefender",
-            {"player": self, "enemy": enemy, "defender": defender})
+        if AFTER_SELECT_DEFENDER in events.hooks:
+            events.trigger_event(AFTER_SELECT_DEFENDER, DefenderEvent(self, enemy, defender))
         return defender
     
     def select_location_to_travel(self, locations, controller):
-        game_state = controller.game.game_state
-        game_state.event_system.trigger_event("BeforeSelectTravelLocation",
-            {"player": self, "locations": locations})
+        events = controller.game.game_state.event_system
+        if BEFORE_SELECT_TRAVEL_LOCATION in events.hooks:
+            events.trigger_event(BEFORE_SELECT_TRAVEL_LOCATION, TravelEvent(self, locations))
         
         choice = controller.choose_location_to_travel(locations)
         
-        game_state.event_system.trigger_event("AfterSelectTravelLocation",
-            {"player": self, "location": choice})
+        if AFTER_SELECT_TRAVEL_LOCATION in events.hooks:
+            events.trigger_event(AFTER_SELECT_TRAVEL_LOCATION, TravelEvent(self, locations, choice))
         return choice
 
     def play(self, game_state, controller):
@@ -175,9 +724,15 @@ class Player:
         game_state.active_quest = self
 
 class Game:
-    def __init__(self, players, quest):
+    def __init__(self, players, quest=None, controller=None, renderer=None, seed=None):
+        """Set up a game; every shuffle and random choice it makes comes from
+        one RNG seeded with seed (a random seed if None, kept in self.seed), so
+        a seed and the same decisions replay the same game."""
         self.players = players
-        self.controller = GameController(self)
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.controller = controller if controller is not None else GameController(self)
+        self.controller.game = self
+        self.result = None  # "victory", "defeat" or "timeout" once the game ends
         self.phases = [
             ResourcePhase(),
             PlanningPhase(),
@@ -187,154 +742,518 @@ class Game:
             CombatPhase(),
             RefreshPhase()
         ]
-        self.game_state = GameState(players, EventSystem())
-        
+        self.game_state = GameState(players, EventSystem(),
+                                    renderer if renderer is not None else RichRenderer(console),
+                                    random.Random(self.seed))
+        rng = self.game_state.rng
+
+        for player in self.players:
+            player.deck.shuffle(rng)
         self.game_state.active_quest = quest
+        if quest:
+            quest._journal = self.game_state.journal
+            self.game_state.encounter_deck.extend(quest.build_encounter_deck())
+            self.game_state.encounter_deck.shuffle(rng)
 
         for player in self.players:
             for hero in player.play_area['heroes']:
                 hero.play(self.game_state, self.controller)
             player.calculate_threat()  # Set initial threat
         
-    def run(self):
-        console.rule("Starting game!")
-        console.print(f"Active Quest: [yellow]{self.game_state.active_quest.title}[/yellow]")
-        console.print(f"Required Progress: {self.game_state.active_quest.required_progress}")
+    def clone(self, controller=None, renderer=None):
+        """Copy this game, with its cloned GameState, for look-ahead search.
+
+        The copy is driven by controller (a fresh GameController if none is
+        given) and shows output through renderer, or the original's renderer.
+        """
+        copy = Game.__new__(Game)
+        copy.game_state = self.game_state.clone(renderer)
+        copy.players = copy.game_state.players
+        copy.phases = self.phases  # Phases hold no state of their own
+        copy.result = self.result
+        copy.seed = self.seed
+        copy.controller = controller if controller is not None else GameController()
+        copy.controller.game = copy
+        return copy
+
+    def run(self, max_rounds=None):
+        renderer = self.game_state.renderer
+        renderer.game_started(self.game_state)
         #first every player draw 5 cards
         
-        console.rule("Setup")
+        renderer.rule("Setup")
         for player in self.players:
             player.draw_card(self.game_state, 5)
 
+        return self.resume(max_rounds)
+
+    def resume(self, max_rounds=None):
+        """Play on from the current phase until the game ends and return the result.
+
+        A cloned game taken part-way through a round first finishes that round.
+        """
+        renderer = self.game_state.renderer
+        if self.game_state.phase_index:
+            self.play_round()
         while not self.check_game_over():
-            for phase in self.phases:
-                self.game_state.current_phase = type(phase).__name__
-                phase.execute(self.game_state, self.controller)
-                phase.render(self.game_state)
-            console.print(f"[green]Completed round {self.game_state.round_number}[/green]")
-                
+            if max_rounds is not None and self.game_state.round_number >= max_rounds:
+                renderer.game_abandoned(max_rounds)
+                self.result = "timeout"
+                break
+            self.play_round()
+        # Nothing may react to a finished game; dropping the hooks also breaks
+        # the card <-> event system reference cycles
+        self.game_state.event_system.clear()
+        return self.result
+
+    def play_round(self):
+        """Play the phases of the current round from game_state.phase_index on"""
+        game_state = self.game_state
+        while game_state.phase_index < len(self.phases):
+            phase = self.phases[game_state.phase_index]
+            game_state.current_phase = type(phase).__name__
+            self.controller.begin_phase(phase)
+            phase.execute(game_state, self.controller)
+            phase.render(game_state)
+            game_state.phase_index += 1
+        game_state.phase_index = 0
+        events = game_state.event_system
+        if END_OF_ROUND in events.hooks:
+            events.trigger_event(END_OF_ROUND, GameStateEvent(game_state))
+        game_state.renderer.round_completed(game_state)
+
     def check_game_over(self):
         # Check loss conditions first
         for player in self.game_state.players:
             if player.threat >= 50:
-                console.print(f"[red]Game Over![/red] [yellow]{player.name}[/yellow] reached 50 threat!")
+                self.game_state.renderer.game_lost(player, "threat")
+                self.result = "defeat"
                 return True
             if not any(isinstance(card, Hero) for card in player.play_area.get('heroes', [])):
-                console.print(f"[red]Game Over![/red] [yellow]{player.name}[/yellow] has no surviving heroes!")
+                self.game_state.renderer.game_lost(player, "heroes")
+                self.result = "defeat"
                 return True
 
         # Check victory condition
         if (self.game_state.active_quest and 
             self.game_state.active_quest.progress >= self.game_state.active_quest.required_progress):
-            console.print(f"[green]Victory![/green] Completed quest: [yellow]{self.game_state.active_quest.title}[/yellow]")
+            self.game_state.renderer.game_won(self.game_state)
+            self.result = "victory"
             return True
             
         return False
 
+class CardIndex:
+    """The cards of a game by case-folded title, with prefix and fuzzy lookup.
+
+    Cards stay indexed while they move between zones; only cards that enter
+    or leave the game have to be added or removed. GameState.card_index
+    binds its index to every zone of the game, and a zone adds each card
+    that arrives from outside every zone.
+    """
+
+    def __init__(self, cards=()):
+        self.by_title = {}  # Folded title -> cards with that title
+        self.titles = []  # Sorted folded titles, for prefix lookup
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        """Index card, unless it already is"""
+        key = card.title.casefold()
+        cards = self.by_title.get(key)
+        if cards is None:
+            self.by_title[key] = [card]
+            self.titles.insert(bisect_left(self.titles, key), key)
+        elif card not in cards:
+            cards.append(card)
+
+    def remove(self, card):
+        key = card.title.casefold()
+        cards = self.by_title[key]
+        cards.remove(card)
+        if not cards:
+            del self.by_title[key]
+            del self.titles[bisect_left(self.titles, key)]
+
+    def find_all(self, title):
+        return list(self.by_title.get(title.casefold(), ()))
+
+    def with_prefix(self, prefix):
+        """Titles starting with prefix, in alphabetical order"""
+        prefix = prefix.casefold()
+        start = bisect_left(self.titles, prefix)
+        end = start
+        while end < len(self.titles) and self.titles[end].startswith(prefix):
+            end += 1
+        return self.titles[start:end]
+
+    def closest(self, name, n=3, cutoff=0.6):
+        """Titles that look most like name, best first"""
+        return difflib.get_close_matches(name.casefold(), self.titles, n, cutoff)
+
+    def find(self, name):
+        """A card titled name; failing that, the first title name is a prefix of, then the closest title"""
+        key = name.casefold()
+        cards = self.by_title.get(key)
+        if cards is None:
+            titles = self.with_prefix(key) or self.closest(key, 1)
+            if not titles:
+                return None
+            cards = self.by_title[titles[0]]
+        return cards[0]
+
+    def _clone(self, memo):
+        return _clone_attributes(self, memo)
+
+
+class ExpiryScheduler:
+    """Effects waiting for the end of a phase or round, in a heap keyed by
+    (round, phase index).
+
+    Phase.end drains the effects that are due, so a waiting effect costs
+    nothing until it expires. An end-of-round effect is keyed past every
+    phase of its round; the refresh phase moves on to the next round before
+    it ends, so these expire as the round's last phase ends.
+    """
+    ROUND_END = 1 << 16  # Phase index after every real phase
+
+    _journal = NO_JOURNAL  # The game's Journal, set by GameState
+
+    def __init__(self):
+        self.heap = []  # [round, phase index, order scheduled, effect]
+        self.scheduled = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, effect, game_state, expiration_event=END_OF_PHASE):
+        """Expire effect at the end of the current phase, or of the current round for END_OF_ROUND"""
+        phase = self.ROUND_END if expiration_event == END_OF_ROUND else game_state.phase_index
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._restore, list(self.heap), self.scheduled)
+        self.scheduled += 1
+        heapq.heappush(self.heap, [game_state.round_number, phase, self.scheduled, effect])
+
+    def pending(self):
+        """The waiting effects, soonest first"""
+        return [entry[-1] for entry in sorted(self.heap)]
+
+    def drain(self, game_state):
+        """Expire every effect due by the end of the current phase"""
+        heap = self.heap
+        now = [game_state.round_number, game_state.phase_index]
+        context = None
+        while heap and heap[0][:2] <= now:
+            if context is None:
+                journal = self._journal
+                if journal.recording:
+                    journal.record(self._restore, list(heap), self.scheduled)
+                context = GameStateEvent(game_state)
+            effect = heapq.heappop(heap)[-1]
+            effect.expire(context)
+
+    def _restore(self, heap, scheduled):
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._restore, list(self.heap), self.scheduled)
+        self.heap[:] = heap
+        self.scheduled = scheduled
+
+    def _clone(self, memo):
+        return _clone_attributes(self, memo)
+
+
+class ZobristKeys:
+    """Random-looking 64-bit keys for the features of a position.
+
+    A feature's key is a keyed BLAKE2b digest of its repr(), so it depends
+    only on the feature and the seed, not on what was hashed before: every
+    process gives a position the same hash. Keys are cached on first use.
+    A card's key stands for its whole state, so identical copies in the same
+    state share one; keys are added rather than XORed so that two of them in
+    one zone do not cancel out. Keys are odd, so a zone's sum can be spread
+    by multiplying it with the key of the zone.
+    """
+    MASK = (1 << 64) - 1
+
+    def __init__(self, seed=0):
+        self.secret = str(seed).encode()
+        self.keys = {}
+
+    def key(self, feature):
+        key = self.keys.get(feature)
+        if key is None:
+            digest = blake2b(repr(feature).encode(), digest_size=8, key=self.secret).digest()
+            key = self.keys[feature] = int.from_bytes(digest, 'little') | 1
+        return key
+
+
+ZOBRIST = ZobristKeys()
+
+
 class GameState:
-    def __init__(self, players, event_system):
+    journal = NO_JOURNAL  # Until __init__ gives the game a Journal of its own
+
+    def __init__(self, players, event_system, renderer=None, rng=None):
+        self.journal = Journal()  # Undo entries since the first mark()
         self.players = players
         self.active_player = players[0]
-        self.victory_display = []
-        self.encounter_deck = []
-        self.encounter_discard = []
-        self.staging_area = []
+        self.victory_display = Zone('victory_display')
+        self.encounter_deck = Zone('encounter_deck')
+        self.encounter_discard = Zone('encounter_discard')
+        self.staging_area = StagingArea()
         self.active_location = None
         self.round_number = 0
         self.current_phase = None
+        self.phase_index = 0  # Position in Game.phases of the phase being played
         self.new_allies_this_round = [] # Track allies played this round
         self.event_system = event_system
+        self.renderer = renderer if renderer is not None else NullRenderer()
+        self.rng = rng if rng is not None else random.Random()  # Source of every shuffle in this game
         self.active_quest = None
+        self._card_index = None  # Built on first lookup
+        self.expiries = ExpiryScheduler()  # Effects lasting until the end of a phase or round
+        self.version = 0  # Bumped at every decision; controllers only see the state between decisions
+        self.pending_decision = None  # actions.Decision a headless controller is answering
+        self._bind_journal()
+
+    _journal = property(attrgetter('journal'))
+
+    def _bind_journal(self):
+        # Link everything in the game to its journal; cards entering a zone later are linked by the zone
+        journal = self.journal
+        self.event_system._journal = journal
+        self.expiries._journal = journal
+        for player in self.players:
+            player._journal = journal
+        for zone in self.zones():
+            zone._journal = journal
+        for card in self.all_cards():
+            card._journal = journal
+            if card._attachments is not None:
+                card._attachments._journal = journal
+            pool = getattr(card, 'resources', None)
+            if isinstance(pool, ResourcePool):
+                pool._journal = journal
+
+    def state_hash(self):
+        """64-bit hash of the position, for transposition tables.
+
+        Covers the cards in every zone with their state (see Card._state()),
+        each player's threat, quest and location progress, the round and the
+        phase. Cards' keys and zones' sums are kept until something in them
+        changes, so hashing again after a few changes costs little more than
+        a walk over the zones. The order of cards within a zone, the deck's
+        included, and the RNG are left out.
+        """
+        key = ZOBRIST.key
+        h = 0
+        for seat, player in enumerate(self.players):
+            play_area = player.play_area
+            for zone in (player.hand, player.deck, player.discard_pile, play_area['heroes'],
+                         play_area['allies'], player.engaged_enemies):
+                h += zone.state_key() * key((seat, zone.name))
+            h += key((seat, 'threat', player.threat))
+        for zone in (self.encounter_deck, self.encounter_discard, self.staging_area, self.victory_display):
+            h += zone.state_key() * key(zone.name)
+        if self.active_quest is not None:
+            h += self.active_quest.state_key() * key('active_quest')
+        if self.active_location is not None:
+            h += self.active_location.state_key() * key('active_location')
+        h += key(('round', self.round_number)) + key(('phase', self.phase_index))
+        return h & ZobristKeys.MASK
         
+    def clone(self, renderer=None):
+        """Return an independent, playable copy of this state.
+
+        Every card, player and zone is copied, as is the RNG state, and each
+        hook is registered again on the copied card that owns it, so playing
+        on in the copy leaves this state untouched. Card definitions are shared, as is the
+        renderer unless another one is given.
+        """
+        memo = {}
+        copy = GameState.__new__(GameState)
+        memo[id(self)] = copy
+        event_system = memo[id(self.event_system)] = EventSystem(self.event_system.weak)
+        copy.__dict__.update({name: clone_object(value, memo) for name, value in self.__dict__.items()
+                              if name != '_card_index'})
+        copy._card_index = None  # Rebuilt if the copy is ever searched by title
+        event_system._journal = copy.journal
+        copy.rng = random.Random()
+        copy.rng.setstate(self.rng.getstate())
+        self.event_system.copy_hooks(event_system, lambda obj: clone_object(obj, memo))
+        if renderer is not None:
+            copy.renderer = renderer
+        return copy
+
+    victory_display = _zone_attribute('victory_display')
+    encounter_deck = _zone_attribute('encounter_deck')
+    encounter_discard = _zone_attribute('encounter_discard')
+    staging_area = _zone_attribute('staging_area')
+
+    def mark(self):
+        """Start journaling this game, if it is not already, and return a mark for undo_to().
+
+        While journaled, every change to the game is recorded with how to undo
+        it: cards moving and shuffling, their flags, stats, damage, progress and
+        resources, players' threat, hooks and waiting effects. The RNG state is
+        kept at each mark. Journaling stops once undo_to() or forget() empties
+        the journal again. Each game has its own journal, so games journaled
+        at the same time, clones included, do not see each other's changes.
+        """
+        journal = self.journal
+        journal.start()
+        mark = len(journal.entries)
+        journal.record(_restore_rng, self, self.rng.getstate())
+        return mark
+
+    def undo_to(self, mark):
+        """Undo every change made since mark() returned mark, newest first; redo() makes them again"""
+        journal = self.journal
+        entries = journal.entries
+        redo = journal.entries = []  # Undoing journals how to redo
+        try:
+            while len(entries) > mark:
+                undo, args = entries.pop()
+                undo(*args)
+        finally:
+            journal.entries = entries
+        journal.redo = (mark, redo, self.state_hash())
+        if not entries:
+            journal.stop()
+
+    def redo(self):
+        """Make again the changes the last undo_to() undid, if nothing has changed since"""
+        journal = self.journal
+        if journal.redo is None:
+            raise RuntimeError("Nothing to redo")
+        mark, redo, position = journal.redo
+        if len(journal.entries) != mark or self.state_hash() != position:
+            raise RuntimeError("The game has changed since it was undone")
+        journal.redo = None
+        journal.start()
+        while redo:
+            change, args = redo.pop()
+            change(*args)
+
+    def forget(self, mark):
+        """Keep the changes made since mark: drop their undo entries"""
+        journal = self.journal
+        del journal.entries[mark:]
+        journal.redo = None
+        if not journal.entries:
+            journal.stop()
+
+    def move_card(self, card, to_zone):
+        """Move card from the zone it is in to the end of to_zone and fire CARD_MOVED.
+
+        to_zone may be None for cards leaving every zone, such as the active
+        location or a card being revealed. A card moved out of play, to a zone
+        not in IN_PLAY_ZONES, has its attachments discarded.
+        """
+        from_zone = card.zone
+        if from_zone is not None:
+            from_zone.remove(card)
+        if to_zone is not None:
+            to_zone.append(card)
+        events = self.event_system
+        if CARD_MOVED in events.hooks:
+            events.trigger_event(CARD_MOVED, CardMovedEvent(card, from_zone, to_zone))
+        if card._attachments and to_zone is not None and to_zone.name not in IN_PLAY_ZONES:
+            self.discard_attachments(card)
+
+    def discard_attachments(self, card):
+        """Move the cards attached to card, which has left play, to the discard piles they belong in"""
+        for attachment in list(card.attachments):
+            player = getattr(attachment, 'played_by', None) or card.owner
+            if isinstance(attachment, Attachment):
+                attachment.attached_to = None
+            attachment.parent = None
+            self.move_card(attachment, player.discard_pile if player is not None else self.encounter_discard)
+            attachment.leave_play(self)
+
+    @property
+    def card_index(self):
+        """CardIndex of every card in the game, built on first use and kept up to date by the zones"""
+        if self._card_index is None:
+            index = self._card_index = CardIndex(self.all_cards())
+            for zone in self.zones():
+                zone._index = index
+            for card in self.all_cards():
+                if card._attachments is not None:
+                    card._attachments._index = index
+        return self._card_index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_card_index'] = None  # The zones' links to it are not pickled
+        return state
+
+    def zones(self):
+        """Every zone of the game and its players, attachments aside"""
+        zones = [self.encounter_deck, self.encounter_discard, self.staging_area, self.victory_display]
+        for player in self.players:
+            zones += [player.hand, player.deck, player.discard_pile, player.play_area['heroes'],
+                      player.play_area['allies'], player.engaged_enemies]
+        return zones
+
+    def all_cards(self):
+        """Every card in the game, whatever zone it is in, attachments included"""
+        zones = self.zones()
+        zones.append([card for card in (self.active_quest, self.active_location) if card is not None])
+        stack = [card for zone in zones for card in zone]
+        seen = set()
+        while stack:
+            card = stack.pop()
+            if id(card) not in seen:
+                seen.add(id(card))
+                stack.extend(card.attachments)
+                yield card
+
     def render(self):
-        console.print(f"Game State (Round {self.round_number})")
-        console.print(f"Phase: {self.current_phase}")
-        console.print(f"Quest Progress: {self.active_quest.progress}")
-        console.print(f"Active Location: {self.active_location.title if self.active_location else 'None'}")
-        console.print(f"Staging Are🗡️ {[c.title for c in self.staging_area]}")
-        console.print(f"Encounter Deck: {len(self.encounter_deck)} cards")
-        # console.print(f"Victory Display: {[c.title for c in self.victory_display]}")
+        self.renderer.summary(self)
         
     def select_character(self, player):
         # Simple implementation - could be expanded with UI
-        return next((c for c in player.play_area['allies'] + player.play_area['heroes']), None)
+        characters = player.characters.all
+        return next(iter(player.play_area['allies']), characters[0] if characters else None)
     
     def draw_encounter_card(game_state):
+        events = game_state.event_system
         if not game_state.encounter_deck:
-            game_state.event_system.trigger_event("BeforeEncounterReshuffle",
-                {"game_state": game_state})
-            game_state.encounter_deck = game_state.encounter_discard
-            game_state.encounter_discard = []
-            random.shuffle(game_state.encounter_deck)
-            game_state.event_system.trigger_event("AfterEncounterReshuffle",
-                {"game_state": game_state})
+            if BEFORE_ENCOUNTER_RESHUFFLE in events.hooks:
+                events.trigger_event(BEFORE_ENCOUNTER_RESHUFFLE, EncounterEvent(game_state))
+            for card in list(game_state.encounter_discard):
+                game_state.move_card(card, game_state.encounter_deck)
+            game_state.encounter_deck.shuffle(game_state.rng)
+            if AFTER_ENCOUNTER_RESHUFFLE in events.hooks:
+                events.trigger_event(AFTER_ENCOUNTER_RESHUFFLE, EncounterEvent(game_state))
         
-        game_state.event_system.trigger_event("BeforeEncounterDraw",
-            {"game_state": game_state})
-        card = game_state.encounter_deck.pop() if game_state.encounter_deck else None
-        game_state.event_system.trigger_event("AfterEncounterDraw",
-            {"game_state": game_state, "card": card})
+        if BEFORE_ENCOUNTER_DRAW in events.hooks:
+            events.trigger_event(BEFORE_ENCOUNTER_DRAW, EncounterEvent(game_state))
+        card = game_state.encounter_deck[-1] if game_state.encounter_deck else None
+        if card is not None:
+            game_state.move_card(card, None)
+        if AFTER_ENCOUNTER_DRAW in events.hooks:
+            events.trigger_event(AFTER_ENCOUNTER_DRAW, EncounterEvent(game_state, card))
         return card
 
+YES_NO = ("Yes", "No")
+
+
 class GameController:
-    def __init__(self, game):
+    def __init__(self, game=None):
         self.game = game
         self.current_choices = []
-        
-    def display_game_state(self):
-        # Render active quest and location
-        active_quest_panel = Panel(
-            f"[yellow]{self.game.game_state.active_quest.title}[/yellow]",
-            title=":scroll: Active Quest",
-            subtitle=f"[white]{self.game.game_state.active_quest.progress}[white]/[white]{self.game.game_state.active_quest.required_progress}",
-            expand=False
-        )
-        console.print(active_quest_panel)
-
-        # Render staging area
-        staging_area_panel = Panel(
-            "\n".join([f"{card.title} (Threat: {card.threat})" for card in self.game.game_state.staging_area]),
-            title=":crossed_swords: Staging Area",
-            expand=False
-        )
-        console.print(staging_area_panel, style="on #220000")
-        
-        # Render each player's play area and engaged enemies
-        for p in self.game.game_state.players:
-
-            play_area_panels = []
-
-            engaged_enemies_panel = Panel(
-                "\n".join([f"{enemy.title} (💪{enemy.attack}, ✋{enemy.defense}, ❤️{enemy.hit_points})" for enemy in p.engaged_enemies]),
-                title=f":japanese_ogre: {p.name}'s Engaged Enemies",
-                expand=False,
-                style="on #220000"
-            )
-            play_area_panels.append(engaged_enemies_panel)
-            for card in p.play_area['heroes'] + p.play_area['allies']:
-                card_panel = card.render_panel()
-                play_area_panels.append(card_panel)
-
-            if play_area_panels:
-                columns = Columns(play_area_panels, equal=True) # equal=True ensures they have equal width
-                play_area_panel = Panel(
-                    columns,
-                    title=f":bust_in_silhouette: {p.name}'s Play Area",
-                    expand=False
-                )
-                console.print(play_area_panel, style="on #222222")
-            else:
-                empty_panel = Panel("[italic]No cards in play area[/italic]", title=f":bust_in_silhouette: {p.name}'s Play Area", expand=False)
-                console.print(empty_panel)
 
+    def begin_phase(self, phase):
+        """Called before each phase is played; search controllers snapshot the game here"""
+        pass
         
-        if self.game.game_state.active_location:
-            active_location_panel = Panel(
-                f"{self.game.game_state.active_location.title}\nProgress: {self.game.game_state.active_location.progress}/{self.game.game_state.active_location.quest_points}",
-                title=":round_pushpin: Active Location",
-                expand=False
-            )
-            console.print(active_location_panel)
+    def display_game_state(self):
+        self.game.game_state.renderer.board(self.game.game_state)
         
     def inspect_card(self):
         card_name = input("Enter card name to inspect: ")
@@ -345,32 +1264,17 @@ class GameController:
             console.print(f"[red]Card '{card_name}' not found!")
 
     def find_card(self, name):
-        # Search all game zones
-        zones = [
-            *self.game.game_state.encounter_deck,
-            *self.game.game_state.encounter_discard,
-            *self.game.game_state.staging_area,
-            *self.game.game_state.victory_display
-        ]
-        
-        for player in self.game.game_state.players:
-            zones.extend([
-                *player.hand,
-                *player.deck,
-                *player.discard_pile,
-                *player.play_area['heroes'],
-                *player.play_area['allies']
-            ])
-            
-        return next((c for c in zones if c.title.lower() == name.lower()), None)
+        """Look a card up by title, case-insensitively, falling back to prefix and fuzzy matches"""
+        return self.game.game_state.card_index.find(name)
 
     def choose_player(self, players):
         """Let player choose from available players"""
         options = [p.name for p in players]
         choice = self.get_choice("Choose a player:", options)
-        return players[options.index(choice)]
+        return players[choice[0]]
 
     def get_choice(self, prompt, options, multi_select=False):
+        """Prompt for a choice and return the selected option indices as a list"""
         console.log("\n" + prompt)
         for i, option in enumerate(options, 1):
             console.log(f"{i}. {option}")
@@ -383,9 +1287,23 @@ class GameController:
                     return indices
             else:
                 if choice.isdigit() and 1 <= int(choice) <= len(options):
-                    return int(choice)-1
+                    return [int(choice)-1]
             console.log("Invalid choice, try again")
 
+    def use_ability(self, card, prompt):
+        """Ask whether to use an optional ability of card.
+
+        prompt is a str.format() template given the card's title; only a
+        controller that shows it has to build the text.
+        """
+        choice = self.get_choice(prompt.format(title=card.title), YES_NO)
+        return bool(choice) and choice[0] == 0
+
+    def choose_option(self, card, prompt, options):
+        """Pick one of options, labels or cards, for an ability of card and return its index, or None"""
+        choice = self.get_choice(prompt, [getattr(option, 'title', option) for option in options])
+        return choice[0] if choice else None
+
     def choose_card_to_play(self, player):
         while True:
             # Show all cards in hand with basic info
@@ -396,7 +1314,7 @@ class GameController:
             options.append("Pass")
             
             # Get initial card selection
-            choice = self.get_choice("Choose a card to view or Pass:", options)
+            choice = self.get_choice("Choose a card to view or Pass:", options)[0]
             if choice == len(options)-1:
                 return None  # Player chose Pass
             
@@ -412,27 +1330,35 @@ class GameController:
                     f"Play {selected_card.title}? (Cost: {selected_card.cost} {selected_card.sphere})", 
                     ["Play", "Back to hand"]
                 )
-                if play_choice == 0:
+                if play_choice[0] == 0:
                     return selected_card
             else:
                 console.print(f"[red]Can't afford {selected_card.title}![/red]")
                 input("Press Enter to continue...")
 
+    def choose_characters_to_commit(self, player, available):
+        choices = self.get_choice(
+            f"{player.name}: select characters to commit to quest:",
+            [f"{c.title} (Willpower {c.willpower})" for c in available],
+            multi_select=True
+        )
+        return [available[i] for i in choices]
+
     def choose_defender(self, player, enemy, valid_defenders):
         """Let player choose defender for an attack"""
         
         player.render(self.game.game_state)
         options = [f"{c.title} (✋{c.defense})" for c in valid_defenders] + ["No defender"]
-        choice = self.get_choice(f"Choose defender against {enemy.title}:", options)
+        choice = self.get_choice(f"Choose defender against {enemy.title}:", options)[0]
         
-        if choice == "No defender":
+        if choice == len(valid_defenders):
             return None
-        return valid_defenders[options.index(choice)]
+        return valid_defenders[choice]
 
     def choose_enemy_to_attack(self, player, enemies):
         options = [f"{e.title} (💖 {e.hit_points})" for e in enemies] + ["Pass"]
-        choice = self.get_choice("Choose enemy to attack:", options)
-        return enemies[choice] if choice != "Pass" else None
+        choice = self.get_choice("Choose enemy to attack:", options)[0]
+        return enemies[choice] if choice != len(enemies) else None
 
     def choose_attackers(self, valid_attackers):
         choices = self.get_choice(
@@ -447,31 +1373,46 @@ class GameController:
             return None
         options = [f"{loc.title} (Threat: {loc.threat})" for loc in locations]
         choice = self.get_choice("Choose location to travel to:", options)
-        return locations[options.index(choice)]
+        return locations[choice[0]]
 
     def choose_attachment_target(self, valid_targets):
         options = [f"{t.title} ({type(t).__name__})" for t in valid_targets]
         choice = self.get_choice("Choose attachment target:", options)
         return valid_targets[choice[0]] if choice else None
 
-class EventSystem:
-    def __init__(self):
-        self.hooks = defaultdict(list)
-        
-    def register_hook(self, event_type, callback):
-        self.hooks[(event_type)].append(callback)
-        
-    def trigger_event(self, event_type, context):
-        for callback in self.hooks.get((event_type), []):
-            callback(context)
-
 class Effect:
+    """Something that lasts until expiration_event.
+
+    END_OF_PHASE and END_OF_ROUND effects wait in GameState.expiries; any
+    other event is waited for with a hook.
+    """
     def __init__(self, expiration_event=None):
         self.expiration_event = expiration_event
+        self.event_system = None  # Set while the effect waits on a hook to expire
+        self.scheduled = False  # True while the effect waits in GameState.expiries
+
+    _journal = NO_JOURNAL  # The game's Journal, once the effect is applied
 
     def apply(self, game_state, target=None):
-        if self.expiration_event:
-            game_state.event_system.register_hook(self.expiration_event, self.remove)
+        self._journal = game_state.journal
+        if not self.expiration_event or self.scheduled or self.event_system is not None:
+            return
+        if self.expiration_event == END_OF_PHASE or self.expiration_event == END_OF_ROUND:
+            game_state.expiries.schedule(self, game_state, self.expiration_event)
+            self.scheduled = True
+        else:
+            self.event_system = game_state.event_system
+            self.event_system.register_hook(self.expiration_event, self.expire, owner=self)
+
+    def expire(self, context):
+        if self.event_system is not None:
+            self.event_system.remove_hooks(self)
+            self.event_system = None
+        self.scheduled = False
+        self.remove(context)
+
+    def _clone(self, memo):
+        return _clone_attributes(self, memo)
 
     def remove(self, context):
         pass
@@ -482,16 +1423,31 @@ class ContinuousEffect(Effect):
         self.modifier = modifier
 
 class StatModifierEffect(ContinuousEffect):
+    """Changes one stat of every card it is applied to, until expiration_event fires"""
     def __init__(self, attribute, modifier, expiration_event=None):
-        super().__init__(expiration_event)
+        super().__init__(expiration_event, modifier)
         self.attribute = attribute
-        self.modifier = modifier
+        self.stat_modifier = StatModifier(self, attribute, modifier, expiration_event)
+        self.targets = []
 
     def apply(self, game_state, target):
-        setattr(target, self.attribute, getattr(target, self.attribute) + self.modifier)
+        journal = self._journal = game_state.journal
+        target.add_modifier(self.stat_modifier)
+        if journal.recording:
+            journal.record(undo_append, journal, self.targets)
+        self.targets.append(target)
         super().apply(game_state, target)  # Register for event-based expiration
 
-    def remove(self, context):
-        target = context.get('target')
-        if target:
-            setattr(target, self.attribute, getattr(target, self.attribute) - self.modifier)
+    def remove(self, context=None):
+        for target in self.targets:
+            target.remove_modifier(self.stat_modifier)
+        self.targets = []
+
+
+journal_assignments(Player, _journaled_setattr)
+journal_assignments(GameState, _journaled_setattr)
+journal_assignments(Effect, _journaled_setattr)
+
+# Card and phase classes live in their own modules but are part of the core API.
+from cards import *
+from phases import *
@@ -0,0 +1,240 @@
+import numpy as np
+from greenlet import greenlet, getcurrent
+from core import *
+from controllers import HeadlessController, USE_ABILITY, CHOOSE_OPTION
+from actions import legal_actions, decode_action
+
+MAX_ACTIONS = 256  # Default width of the action mask, every subset of 8 options; a decision with more actions fails the game
+
+# Decisions by name, as HeadlessController passes them to decide(); any other is OTHER_DECISION
+DECISIONS = ("card_to_play", "commit", "player", "defender", "enemy_to_attack", "attackers",
+             "location_to_travel", "attachment_target", USE_ABILITY, CHOOSE_OPTION)
+OTHER_DECISION = len(DECISIONS)
+
+CHARACTER_FEATURES = ("present", "willpower", "attack", "defense", "hit_points", "exhausted", "committed",
+                      "resources")
+ENCOUNTER_FEATURES = ("present", "engagement", "threat", "attack", "defense", "hit_points")
+
+
+class _EnvController(HeadlessController):
+    """Hands every decision with more than one answer to the environment: the
+    game's greenlet switches back to reset() or step() and carries on with
+    the action the next step() brings"""
+
+    def __init__(self, env):
+        super().__init__()
+        self.env = env
+
+    def decide(self, decision, options, multi_select=False):
+        actions = legal_actions(len(options), multi_select)
+        if len(actions) < 2:
+            return decode_action(actions[0], multi_select) if actions else []
+        env = self.env
+        if len(actions) > env.max_actions:
+            raise ValueError(f"Decision '{decision}' has {len(actions)} actions, "
+                             f"more than max_actions={env.max_actions}")
+        env.decision, env.actions = decision, actions
+        action = getcurrent().parent.switch()
+        return decode_action(actions[action], multi_select)
+
+
+class GameEnv:
+    """A Game played one decision at a time, reinforcement-learning style.
+
+    reset(seed) starts a game and step(action) answers the pending decision
+    with the position of one of its actions.legal_actions(), playing on to
+    the next decision that has a choice. Both return the observation: a
+    dict of fixed-shape NumPy arrays that are allocated once and overwritten
+    in place on every call, so copy anything that has to outlive the next step.
+    The reward is 1 for a victory and -1 for a defeat, given on the last step.
+
+    The action mask is max_actions wide. Rather than hide the actions past
+    it, a decision with more of them fails the game: step() raises.
+
+    The game runs as a greenlet in the caller's thread: step() switches into
+    it and it switches back at its next decision, so a step costs two
+    switches and no thread is involved. close() unwinds an unfinished game.
+    """
+
+    def __init__(self, decks, quest, max_rounds=100, max_allies=12, max_enemies=8, observation=None,
+                 max_actions=MAX_ACTIONS):
+        self.decks = decks
+        self.quest = quest
+        self.max_rounds = max_rounds
+        self.n_players = len(decks)
+        self.max_heroes = max(len(deck.heroes) for deck in decks)
+        self.max_allies = max_allies
+        self.max_enemies = max_enemies
+        self.max_actions = max_actions
+        self.titles = {}  # Card title -> column of the hand counts
+        for deck in decks:
+            for card in deck.heroes + deck.cards:
+                self.titles.setdefault(card.DEFINITION.title, len(self.titles))
+        if observation is None:
+            observation = {name: np.zeros(shape, dtype) for name, (shape, dtype) in self.observation_space().items()}
+        self.observation = observation
+        self.game = None
+        self.decision = None
+        self.actions = ()
+        self.info = {}
+        self._coroutine = None  # greenlet playing the game, suspended at its decision
+
+    def observation_space(self):
+        """Name -> (shape, dtype) of each array of the observation"""
+        P, characters, encounter = self.n_players, len(CHARACTER_FEATURES), len(ENCOUNTER_FEATURES)
+        return {
+            "threat": ((P,), np.int32),
+            "heroes": ((P, self.max_heroes, characters), np.int32),
+            "allies": ((P, self.max_allies, characters), np.int32),
+            "hand": ((P, len(self.titles)), np.int32),  # Cards of each title in hand
+            "engaged": ((P, self.max_enemies, encounter), np.int32),
+            "staging": ((self.max_enemies, encounter), np.int32),
+            "quest": ((3,), np.int32),  # Progress, required progress, round number
+            "decision": ((1,), np.int32),  # Index into DECISIONS, or OTHER_DECISION
+            "action_mask": ((self.max_actions,), bool),
+        }
+
+    def reset(self, seed=None):
+        """Start a new game, abandoning any unfinished one, and return (observation, info)"""
+        self.close()
+        players = [deck.build_player() for deck in self.decks]
+        self.game = Game(players, self.quest(), _EnvController(self), NullRenderer(), seed)
+        self.game.controller.game = self.game
+        self.decision, self.actions = None, ()
+        self._coroutine = greenlet(self._play)
+        self._resume()
+        return self.encode(), self.info
+
+    def step(self, action):
+        """Answer the pending decision and return (observation, reward, terminated, truncated, info)"""
+        if self.decision is None:
+            raise RuntimeError("No decision is pending; call reset() first")
+        if not 0 <= action < len(self.actions):
+            raise ValueError(f"Action {action} is not legal for decision '{self.decision}'")
+        self.decision, self.actions = None, ()
+        self._resume(action)
+        result = self.game.result if self.decision is None else None
+        reward = 1.0 if result == "victory" else -1.0 if result == "defeat" else 0.0
+        return self.encode(), reward, result in ("victory", "defeat"), result == "timeout", self.info
+
+    def legal_actions(self):
+        return self.observation["action_mask"]
+
+    def close(self):
+        """Unwind an unfinished game from the decision it waits at"""
+        coroutine = self._coroutine
+        if coroutine is not None and not coroutine.dead:
+            coroutine.throw()  # GreenletExit
+        self._coroutine = None
+        self.decision, self.actions = None, ()
+
+    def _play(self):
+        try:
+            self.game.run(self.max_rounds)
+        except Exception as e:
+            raise RuntimeError("The game failed") from e
+
+    def _resume(self, *action):
+        """Play the game on to its next decision with a choice, or to its end"""
+        self._coroutine.switch(*action)
+        info = self.info
+        info["decision"] = self.decision
+        info["result"] = self.game.result
+
+    def encode(self):
+        """Write the current game into the observation arrays and return them"""
+        obs = self.observation
+        for array in obs.values():
+            array.fill(0)
+        game_state = self.game.game_state
+        titles = self.titles
+        for p, player in enumerate(game_state.players):
+            obs["threat"][p] = player.threat
+            self._encode_characters(obs["heroes"][p], player.play_area['heroes'])
+            self._encode_characters(obs["allies"][p], player.play_area['allies'])
+            hand = obs["hand"][p]
+            for card in player.hand:
+                column = titles.get(card.title)
+                if column is not None:
+                    hand[column] += 1
+            self._encode_encounter_cards(obs["engaged"][p], player.engaged_enemies)
+        self._encode_encounter_cards(obs["staging"], game_state.staging_area)
+        quest = obs["quest"]
+        if game_state.active_quest is not None:
+            quest[0] = game_state.active_quest.progress
+            quest[1] = game_state.active_quest.required_progress
+        quest[2] = game_state.round_number
+        if self.decision is not None:
+            obs["decision"][0] = DECISIONS.index(self.decision) if self.decision in DECISIONS else OTHER_DECISION
+            obs["action_mask"][:len(self.actions)] = True
+        return obs
+
+    @staticmethod
+    def _encode_characters(rows, cards):
+        for i, card in zip(range(len(rows)), cards):
+            row = rows[i]
+            row[0] = 1
+            row[1] = card.willpower
+            row[2] = card.attack
+            row[3] = card.defense
+            row[4] = card.hit_points
+            row[5] = card.exhausted
+            row[6] = card.committed
+            if isinstance(card, Hero):
+                row[7] = sum(card.resources.values())
+
+    @staticmethod
+    def _encode_encounter_cards(rows, cards):
+        for i, card in zip(range(len(rows)), cards):
+            row = rows[i]
+            row[0] = 1
+            row[1] = getattr(card, 'engagement', 0)
+            row[2] = card.threat
+            row[3] = getattr(card, 'attack', 0)
+            row[4] = getattr(card, 'defense', 0)
+            row[5] = getattr(card, 'hit_points', 0)
+
+
+class VectorGameEnv:
+    """Several GameEnvs stepped together, their observations stacked along a
+    first axis of one set of preallocated arrays.
+
+    A game that ends is started again at once with the next seed, so the
+    observation returned for it is the first one of the new game.
+    """
+
+    def __init__(self, decks, quest, n_envs, max_rounds=100, max_allies=12, max_enemies=8, max_actions=MAX_ACTIONS):
+        template = GameEnv(decks, quest, max_rounds, max_allies, max_enemies, observation={}, max_actions=max_actions)
+        self.observation = {name: np.zeros((n_envs,) + shape, dtype)
+                            for name, (shape, dtype) in template.observation_space().items()}
+        self.envs = [GameEnv(decks, quest, max_rounds, max_allies, max_enemies,
+                             {name: array[i] for name, array in self.observation.items()}, max_actions)
+                     for i in range(n_envs)]
+        self.rewards = np.zeros(n_envs)
+        self.terminated = np.zeros(n_envs, bool)
+        self.truncated = np.zeros(n_envs, bool)
+        self.next_seed = None
+
+    def reset(self, seed=None):
+        """Start every game, game i with seed + i, and return (observations, infos)"""
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.next_seed = seed + len(self.envs)
+        infos = [env.reset(seed + i)[1] for i, env in enumerate(self.envs)]
+        return self.observation, infos
+
+    def step(self, actions):
+        """Answer every pending decision and return (observations, rewards, terminated, truncated, infos)"""
+        infos = []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            _, self.rewards[i], self.terminated[i], self.truncated[i], info = env.step(int(action))
+            if self.terminated[i] or self.truncated[i]:
+                info = dict(info)
+                env.reset(self.next_seed)
+                self.next_seed += 1
+            infos.append(info)
+        return self.observation, self.rewards, self.terminated, self.truncated, infos
+
+    def close(self):
+        for env in self.envs:
+            env.close()
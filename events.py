@@ -0,0 +1,394 @@
+import inspect
+import types
+import weakref
+from journal import NO_JOURNAL
+
+_event_ids = {}
+_event_names = []
+
+
+def event_id(event_type):
+    """Intern an event name to a small integer id; ids are returned unchanged"""
+    if type(event_type) is int:
+        return event_type
+    eid = _event_ids.get(event_type)
+    if eid is None:
+        eid = _event_ids[event_type] = len(_event_names)
+        _event_names.append(event_type)
+    return eid
+
+
+def event_name(eid):
+    return _event_names[eid]
+
+
+class HookHandle:
+    """Returned by register_hook; unregister() removes the hook again"""
+    __slots__ = ('event_system', 'event_id', 'callback')
+
+    def __init__(self, event_system, event_id, callback):
+        self.event_system = event_system
+        self.event_id = event_id
+        self.callback = callback  # The callable actually stored in the hook list
+
+    @property
+    def active(self):
+        return self.callback in self.event_system.hooks.get(self.event_id, ())
+
+    def unregister(self):
+        self.event_system.unregister_hook(self)
+
+    # Ids are only stable within a process, so handles and event systems
+    # travel between processes by event name.
+    def __getstate__(self):
+        return self.event_system, event_name(self.event_id), self.callback
+
+    def __setstate__(self, state):
+        self.event_system, name, self.callback = state
+        self.event_id = event_id(name)
+
+
+class _WeakCallback:
+    """Calls a weakly referenced callback, unregistering itself once the target is gone"""
+    __slots__ = ('ref', 'handle')
+
+    def __init__(self, callback):
+        self.ref = weakref.WeakMethod(callback) if inspect.ismethod(callback) else weakref.ref(callback)
+        self.handle = None
+
+    def __reduce__(self):
+        return _WeakCallback, (self.ref(),), self.handle
+
+    def __setstate__(self, handle):
+        self.handle = handle
+
+    def __call__(self, context):
+        callback = self.ref()
+        if callback is None:
+            self.handle.unregister()
+        else:
+            callback(context)
+
+
+def _rebind(callback, remap):
+    if inspect.ismethod(callback):
+        return types.MethodType(callback.__func__, remap(callback.__self__))
+    return callback
+
+
+class EventSystem:
+    def __init__(self, weak=False):
+        # Event id -> callbacks. Only events with at least one listener have a
+        # key, so `EVENT in event_system.hooks` is the no-listener fast path.
+        # Lists are replaced rather than mutated, so hooks may be added or
+        # removed while an event is being dispatched.
+        self.hooks = {}
+        self.owned = weakref.WeakKeyDictionary()  # Owner -> handles it registered
+        self.weak = weak
+        self._journal = NO_JOURNAL  # The game's Journal, set by GameState
+
+    def register_hook(self, event_type, callback, owner=None, weak=None):
+        """Register callback for an event and return its HookHandle.
+
+        Hooks with an owner are removed together by remove_hooks(owner), which
+        cards call when they leave play. Weak hooks do not keep the callback
+        (or the card it is bound to) alive; weak defaults to the system setting.
+        """
+        eid = event_id(event_type)
+        if weak if weak is not None else self.weak:
+            stored = _WeakCallback(callback)
+            handle = stored.handle = HookHandle(self, eid, stored)
+        else:
+            handle = HookHandle(self, eid, callback)
+        callbacks = self.hooks.get(eid)
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._unregister_last, eid, callbacks, owner)
+        self.hooks[eid] = (callbacks or []) + [handle.callback]
+        if owner is not None:
+            self.owned.setdefault(owner, []).append(handle)
+        return handle
+
+    def _unregister_last(self, eid, callbacks, owner):
+        # Undoes register_hook() for GameState.undo_to()
+        self._set_callbacks(eid, callbacks)
+        if owner is not None:
+            self._disown_last(owner)
+
+    def _disown_last(self, owner):
+        handles = self.owned[owner]
+        handle = handles.pop()
+        if not handles:
+            del self.owned[owner]
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._own, owner, handle)
+
+    def _own(self, owner, handle):
+        self.owned.setdefault(owner, []).append(handle)
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._disown_last, owner)
+
+    def _set_callbacks(self, eid, callbacks):
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._set_callbacks, eid, self.hooks.get(eid))
+        if callbacks:
+            self.hooks[eid] = callbacks
+        else:
+            self.hooks.pop(eid, None)
+
+    def unregister_hook(self, handle):
+        callbacks = self.hooks.get(handle.event_id)
+        if not callbacks or handle.callback not in callbacks:
+            return False
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._set_callbacks, handle.event_id, callbacks)
+        remaining = list(callbacks)
+        remaining.remove(handle.callback)
+        if remaining:
+            self.hooks[handle.event_id] = remaining
+        else:
+            del self.hooks[handle.event_id]
+        return True
+
+    def remove_hooks(self, owner):
+        """Unregister every hook registered on behalf of owner"""
+        handles = self.owned.pop(owner, ())
+        if handles and self._journal.recording:
+            self._journal.record(self._set_owned, owner, handles)
+        for handle in handles:
+            self.unregister_hook(handle)
+
+    def _set_owned(self, owner, handles):
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._set_owned, owner, self.owned.get(owner))
+        if handles:
+            self.owned[owner] = handles
+        else:
+            self.owned.pop(owner, None)
+
+    def copy_hooks(self, target, remap):
+        """Register every hook of this system on target, rebinding it through remap.
+
+        remap(obj) returns the copy of a card, player or effect, so a callback
+        bound to a card here is registered as the same method of that card's
+        copy, under the copied owner. Used by GameState.clone().
+        """
+        rebound = {}  # id(stored callback) -> its copy
+        for eid, callbacks in self.hooks.items():
+            copied = []
+            for callback in callbacks:
+                new = rebound.get(id(callback))
+                if new is None:
+                    if type(callback) is _WeakCallback:
+                        live = callback.ref()
+                        if live is None:
+                            continue
+                        new = _WeakCallback(_rebind(live, remap))
+                        new.handle = HookHandle(target, eid, new)
+                    else:
+                        new = _rebind(callback, remap)
+                    rebound[id(callback)] = new
+                copied.append(new)
+            if copied:
+                target.hooks[eid] = copied
+        for owner, handles in list(self.owned.items()):
+            copied = [HookHandle(target, h.event_id, rebound[id(h.callback)])
+                      for h in handles if id(h.callback) in rebound]
+            if copied:
+                target.owned[remap(owner)] = copied
+        return target
+
+    def __getstate__(self):
+        return {
+            'journal': self._journal,
+            'weak': self.weak,
+            'hooks': [(event_name(eid), callbacks) for eid, callbacks in self.hooks.items()],
+            'owned': list(self.owned.items()),
+        }
+
+    def __setstate__(self, state):
+        self._journal = state['journal']
+        self.weak = state['weak']
+        self.hooks = {event_id(name): callbacks for name, callbacks in state['hooks']}
+        self.owned = weakref.WeakKeyDictionary(state['owned'])
+
+    def clear(self):
+        self._restore({}, ())
+
+    def _restore(self, hooks, owned):
+        journal = self._journal
+        if journal.recording:
+            journal.record(self._restore, dict(self.hooks), list(self.owned.items()))
+        self.hooks.clear()
+        self.hooks.update(hooks)
+        self.owned.clear()
+        self.owned.update(owned)
+
+    def hook_count(self):
+        return sum(len(callbacks) for callbacks in self.hooks.values())
+
+    def has_listeners(self, event_type):
+        return event_id(event_type) in self.hooks
+
+    def trigger_event(self, event_type, context):
+        callbacks = self.hooks.get(event_id(event_type))
+        if callbacks:
+            for callback in callbacks:
+                callback(context)
+        return context
+
+
+# Events fired by the engine. Call sites check `EVENT in event_system.hooks`
+# before building a payload so that an event nobody listens to costs nothing.
+BEFORE_DRAW_CARD = event_id("BeforeDrawCard")
+AFTER_DRAW_CARD = event_id("AfterDrawCard")
+BEFORE_RESHUFFLE_DISCARD = event_id("BeforeReshuffleDiscard")
+AFTER_RESHUFFLE_DISCARD = event_id("AfterReshuffleDiscard")
+BEFORE_ANY_CARD_PLAYED = event_id("BeforeAnyCardPlayed")
+AFTER_CARD_PLAYED = event_id("AfterCardPlayed")
+BEFORE_DEDUCTING_RESOURCES = event_id("BeforeDeductingResources")
+AFTER_DEDUCTING_RESOURCES = event_id("AfterDeductingResources")
+AFTER_EXHAUSTED = event_id("AfterExhausted")
+BEFORE_SELECT_DEFENDER = event_id("BeforeSelectDefender")
+AFTER_SELECT_DEFENDER = event_id("AfterSelectDefender")
+BEFORE_SELECT_TRAVEL_LOCATION = event_id("BeforeSelectTravelLocation")
+AFTER_SELECT_TRAVEL_LOCATION = event_id("AfterSelectTravelLocation")
+BEFORE_ENCOUNTER_RESHUFFLE = event_id("BeforeEncounterReshuffle")
+AFTER_ENCOUNTER_RESHUFFLE = event_id("AfterEncounterReshuffle")
+BEFORE_ENCOUNTER_DRAW = event_id("BeforeEncounterDraw")
+AFTER_ENCOUNTER_DRAW = event_id("AfterEncounterDraw")
+END_OF_PHASE = event_id("EndOfPhase")
+END_OF_ROUND = event_id("EndOfRound")
+RESOURCE_PHASE_START = event_id("ResourcePhaseStart")
+RESOURCE_PHASE_END = event_id("ResourcePhaseEnd")
+PLANNING_PHASE_START = event_id("PlanningPhaseStart")
+PLANNING_PHASE_END = event_id("PlanningPhaseEnd")
+QUEST_PHASE_START = event_id("QuestPhaseStart")
+QUEST_PHASE_END = event_id("QuestPhaseEnd")
+TRAVEL_PHASE_START = event_id("TravelPhaseStart")
+TRAVEL_PHASE_END = event_id("TravelPhaseEnd")
+ENCOUNTER_PHASE_START = event_id("EncounterPhaseStart")
+ENCOUNTER_PHASE_END = event_id("EncounterPhaseEnd")
+COMBAT_PHASE_START = event_id("CombatPhaseStart")
+COMBAT_PHASE_END = event_id("CombatPhaseEnd")
+REFRESH_PHASE_START = event_id("RefreshPhaseStart")
+REFRESH_PHASE_END = event_id("RefreshPhaseEnd")
+BEFORE_QUEST_RESOLUTION = event_id("BeforeQuestResolution")
+BEFORE_QUEST_EXHAUSTION = event_id("BeforeQuestExhaustion")
+ALLY_PLAYED = event_id("AllyPlayed")
+AFTER_ALLY_PLAYED = event_id("AfterAllyPlayed")
+PLAYER_ACTIONS = event_id("PlayerActions")
+BEFORE_TRAVEL_ACTIONS = event_id("BeforeTravelActions")
+LOCATION_REVEALED = event_id("LocationRevealed")
+LOCATION_TRAVELED = event_id("LocationTraveled")
+LOCATION_EXPLORED = event_id("LocationExplored")
+BEFORE_ADD_PROGRESS = event_id("BeforeAddProgress")
+AFTER_ADD_PROGRESS = event_id("AfterAddProgress")
+BEFORE_ENEMY_ENGAGEMENT = event_id("BeforeEnemyEngagement")
+AFTER_ENEMY_ENGAGEMENT = event_id("AfterEnemyEngagement")
+BEFORE_ENEMY_ATTACK = event_id("BeforeEnemyAttack")
+AFTER_ENEMY_ATTACK = event_id("AfterEnemyAttack")
+BEFORE_DRAWING_SHADOW_CARD = event_id("BeforeDrawingShadowCard")
+SHADOW_CARD_REVEALED = event_id("ShadowCardRevealed")
+AFTER_DEFENDER_DECLARED = event_id("AfterDefenderDeclared")
+CHARACTER_DEFEATED = event_id("CharacterDefeated")
+ENEMY_DEFEATED = event_id("EnemyDefeated")
+CALCULATE_ATTACK = event_id("CalculateAttack")
+CARD_MOVED = event_id("CardMoved")
+BEFORE_ADD_TOKEN = event_id("BeforeAddToken")  # Token events carry the token type in their payload
+AFTER_ADD_TOKEN = event_id("AfterAddToken")
+BEFORE_REMOVE_TOKEN = event_id("BeforeRemoveToken")
+AFTER_REMOVE_TOKEN = event_id("AfterRemoveToken")
+
+
+class EventContext:
+    """Base for event payloads.
+
+    Fields are __slots__ set positionally by the constructor; fields that are
+    not passed stay unset. Item access (context['player']) is supported so
+    hooks can treat a payload like the dicts they were originally given.
+    """
+    __slots__ = ()
+
+    def __init__(self, *args):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__ if hasattr(self, name))
+        return f"{type(self).__name__}({fields})"
+
+
+class GameStateEvent(EventContext):
+    __slots__ = ('game_state',)
+
+class PlayerEvent(EventContext):
+    __slots__ = ('player',)
+
+class CardEvent(EventContext):
+    __slots__ = ('card', 'player')
+
+class ResourceEvent(EventContext):
+    __slots__ = ('player', 'sphere', 'amount')
+
+class DefenderEvent(EventContext):
+    __slots__ = ('player', 'enemy', 'defender')
+
+class TravelEvent(EventContext):
+    __slots__ = ('player', 'locations', 'location')
+
+class EncounterEvent(EventContext):
+    __slots__ = ('game_state', 'card')
+
+class PlayerTurnEvent(EventContext):
+    __slots__ = ('player', 'game_state', 'controller')
+
+class QuestExhaustionEvent(EventContext):
+    __slots__ = ('character', 'player', 'game_state', 'prevent_exhaustion')
+
+class AllyPlayedEvent(EventContext):
+    __slots__ = ('ally', 'player', 'game_state', 'controller')
+
+class LocationEvent(EventContext):
+    __slots__ = ('location', 'game_state', 'player', 'amount')
+
+class EnemyEvent(EventContext):
+    __slots__ = ('enemy', 'player', 'defender')
+
+class ShadowEvent(EventContext):
+    __slots__ = ('enemy', 'shadow_card')
+
+class CharacterDefeatedEvent(EventContext):
+    __slots__ = ('character', 'player')
+
+class AttackEvent(EventContext):
+    __slots__ = ('attacker', 'base_attack', 'modified_attack', 'game_state', 'player', 'enemy')
+
+class CardMovedEvent(EventContext):
+    __slots__ = ('card', 'from_zone', 'to_zone')
+
+class TokenEvent(EventContext):
+    __slots__ = ('card', 'token_type', 'amount')
@@ -1,16 +1,16 @@
 from core import *
+from cards import _changing_slot
 
 class Boromir(Hero):
-    def __init__(self):
-        super().__init__("Boromir", "Leadership", 11, 1, 3, 2, 5)
-        self.description = "While Boromir has at least 1 resource in his resource pool, Gondor allies get +1 attack."
-        self.add_keyword("Gondor")
-        self.add_keyword("Warrior")
-        self.add_keyword("Noble")
+    __slots__ = ()
+    DEFINITION = CardDefinition(
+        "Boromir", 0, "Leadership", threat_cost=11, willpower=1, attack=3, defense=2, hit_points=5,
+        description="While Boromir has at least 1 resource in his resource pool, Gondor allies get +1 attack.",
+        keywords=("Gondor", "Warrior", "Noble"))
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("CalculateAttack", self.modify_gondor_attack)
+        game_state.event_system.register_hook("CalculateAttack", self.modify_gondor_attack, owner=self)
 
     def modify_gondor_attack(self, context):
         attacker = context.get('attacker')
@@ -20,13 +20,20 @@ class Boromir(Hero):
 
 
 class Galadriel(Hero):
+    __slots__ = ('_used_this_round',)
+    can_attack = False  # Prevent attacking
+    used_this_round = _changing_slot('_used_this_round')
+    DEFINITION = CardDefinition(
+        "Galadriel", 0, "Spirit", threat_cost=9, willpower=4, attack=0, defense=0, hit_points=4,
+        description="Galadriel cannot quest, attack or defend. Allies you control do not exhaust to commit to the quest during the round they enter play. Action: Exhaust Galadriel to choose a player. That player reduces their threat by 1 and draws 1 card (limit once per round).",
+        keywords=("Noldor", "Noble"))
+
     def __init__(self):
-        super().__init__("Galadriel", "Spirit", 9, 4, 0, 0, 4)
-        self.description = "Galadriel cannot quest, attack or defend. Allies you control do not exhaust to commit to the quest during the round they enter play. Action: Exhaust Galadriel to choose a player. That player reduces their threat by 1 and draws 1 card (limit once per round)."
-        self.add_keyword("Noldor")
-        self.add_keyword("Noble")
+        super().__init__()
         self.used_this_round = False
-        self.can_attack = False  # Prevent attacking
+
+    def _state(self):
+        return super()._state() + (self.used_this_round,)
 
     def can_quest(self):
         return False  # Cannot quest
@@ -36,9 +43,9 @@ class Galadriel(Hero):
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("BeforeQuestExhaustion", self.prevent_ally_exhaustion)
-        game_state.event_system.register_hook("PlayerActions", self.offer_action)
-        game_state.event_system.register_hook("RefreshPhaseEnd", self.reset_used)
+        game_state.event_system.register_hook("BeforeQuestExhaustion", self.prevent_ally_exhaustion, owner=self)
+        game_state.event_system.register_hook("PlayerActions", self.offer_action, owner=self)
+        game_state.event_system.register_hook("RefreshPhaseEnd", self.reset_used, owner=self)
 
     def prevent_ally_exhaustion(self, context):
         character = context['character']
@@ -55,11 +62,7 @@ class Galadriel(Hero):
         if (self in player.play_area['heroes'] and 
             not self.exhausted and 
             not self.used_this_round):
-            choice_indices = controller.get_choice(
-                f"Use {self.title}'s action? (Exhaust to reduce threat by 1 and draw a card)",
-                ["Yes", "No"]
-            )
-            if choice_indices and choice_indices[0] == 0:  # First option ("Yes")
+            if controller.use_ability(self, "Use {title}'s action? (Exhaust to reduce threat by 1 and draw a card)"):
                 self.exhausted = True
                 self.used_this_round = True
                 target_player = controller.choose_player(game_state.players)
@@ -70,126 +73,120 @@ class Galadriel(Hero):
         self.used_this_round = False
         
 class Aragorn(Hero):
-    def __init__(self):
-        super().__init__("Aragorn", "Leadership", 12, 2, 3, 2, 5)
-        self.description = "Aragorn does not exhaust to quest during the first quest phase each round."
-        self.add_keyword("Dúnedain")
-        self.add_keyword("Noble")
-        self.add_keyword("Ranger")
+    __slots__ = ()
+    DEFINITION = CardDefinition(
+        "Aragorn", 0, "Leadership", threat_cost=12, willpower=2, attack=3, defense=2, hit_points=5,
+        description="Aragorn does not exhaust to quest during the first quest phase each round.",
+        keywords=("Dúnedain", "Noble", "Ranger"))
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("BeforeQuestExhaustion", self.prevent_exhaustion)
+        game_state.event_system.register_hook("BeforeQuestExhaustion", self.prevent_exhaustion, owner=self)
 
     def prevent_exhaustion(self, context):
         character = context['character']
-        if character == self and game_state.round_number == 1:
+        if character == self and context['game_state'].round_number == 1:
             context['prevent_exhaustion'] = True
             
 class Faramir(Ally):
-    def __init__(self):
-        super().__init__("Faramir", 4, "Leadership", 2, 1, 2, 3)
-        self.description = "Exhaust Faramir to choose a player. Each character controlled by that player gets +1 Willpower until the end of the phase."
-        self.add_keyword("Gondor")
-        self.add_keyword("Ranger")
+    __slots__ = ()
+    DEFINITION = CardDefinition(
+        "Faramir", 4, "Leadership", willpower=2, attack=1, defense=2, hit_points=3,
+        description="Exhaust Faramir to choose a player. Each character controlled by that player gets +1 Willpower until the end of the phase.",
+        keywords=("Gondor", "Ranger"))
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("BeforeQuestResolution", self.boost_willpower)
+        game_state.event_system.register_hook("BeforeQuestResolution", self.boost_willpower, owner=self)
 
     def boost_willpower(self, context):
         player = context['player']
+        game_state = context['game_state']
         controller = context['controller']
-        if not self.exhausted:
-            choice_indices = controller.get_choice(
-                f"Use {self.title}'s ability? (Exhaust to give +1 Willpower to each character controlled by a player)",
-                ["Yes", "No"]
-            )
-            if choice_indices and choice_indices[0] == 0:  # First option ("Yes")
+        if self in player.play_area['allies'] and not self.exhausted:
+            if controller.use_ability(
+                    self, "Use {title}'s ability? (Exhaust to give +1 Willpower to each character controlled by a player)"):
                 self.exhausted = True
                 target_player = controller.choose_player(game_state.players)
-                for character in target_player.play_area['heroes'] + target_player.play_area['allies']:
-                    character.willpower += 1
+                boost = StatModifierEffect('willpower', 1, END_OF_PHASE)
+                for character in target_player.characters.all:
+                    boost.apply(game_state, character)
                     
                     
+GANDALF_RESPONSES = ("Draw 3 cards", "Deal 4 damage to an enemy", "Reduce threat by 5")
+
+
 class Gandalf(Ally):
-    def __init__(self):
-        super().__init__("Gandalf", 5, "Neutral", 4, 4, 4, 4)
-        self.description = "At the end of the round, discard Gandalf. Response: After Gandalf enters play, choose one: draw 3 cards, deal 4 damage to an enemy in play, or reduce your threat by 5."
-        self.add_keyword("Istari")
+    __slots__ = ()
+    DEFINITION = CardDefinition(
+        "Gandalf", 5, "Neutral", willpower=4, attack=4, defense=4, hit_points=4,
+        description="At the end of the round, discard Gandalf. Response: After Gandalf enters play, choose one: draw 3 cards, deal 4 damage to an enemy in play, or reduce your threat by 5.",
+        keywords=("Istari",))
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("AfterAllyPlayed", self.trigger_response)
-        game_state.event_system.register_hook("RefreshPhaseEnd", self.discard_gandalf)
+        game_state.event_system.register_hook("AfterAllyPlayed", self.trigger_response, owner=self)
+        game_state.event_system.register_hook("RefreshPhaseEnd", self.discard_gandalf, owner=self)
 
     def trigger_response(self, context):
         if context['ally'] == self:
             controller = context['controller']
-            choice_indices = controller.get_choice(
-                f"Choose Gandalf's response:",
-                ["Draw 3 cards", "Deal 4 damage to an enemy", "Reduce threat by 5"]
-            )
-            if choice_indices:
-                choice = choice_indices[0]
+            choice = controller.choose_option(self, "Choose Gandalf's response:", GANDALF_RESPONSES)
+            if choice is not None:
                 if choice == 0:  # Draw 3 cards
                     context['player'].draw_card(context['game_state'], 3)
                 elif choice == 1:  # Deal 4 damage to an enemy
                     enemies = [e for p in context['game_state'].players for e in p.engaged_enemies]
-                    target_enemy = controller.choose_enemy_to_attack(enemies)
+                    target_enemy = controller.choose_enemy_to_attack(context['player'], enemies)
                     if target_enemy:
                         target_enemy.hit_points -= 4
                 elif choice == 2:  # Reduce threat by 5
                     context['player'].threat = max(0, context['player'].threat - 5)
 
-    def discard_gandalf(self, context):
-        context['player'].discard_pile.append(self)
-        context['player'].play_area['allies'].remove(self)
+    def discard_gandalf(self, game_state):
+        player = self.parent
+        if player and self in player.play_area['allies']:
+            game_state.move_card(self, player.discard_pile)
+            self.leave_play(game_state)
         
 class StewardOfGondor(Attachment):
-    def __init__(self):
-        super().__init__("Steward of Gondor", 2, "Leadership")
-        self.description = "Attach to a hero. Attached hero gains the Gondor trait. Action: Exhaust Steward of Gondor to add 2 resources to attached hero's resource pool."
-        self.add_keyword("Title")
+    __slots__ = ()
+    DEFINITION = CardDefinition(
+        "Steward of Gondor", 2, "Leadership",
+        description="Attach to a hero. Attached hero gains the Gondor trait. Action: Exhaust Steward of Gondor to add 2 resources to attached hero's resource pool.",
+        keywords=("Title",))
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("PlayerActions", self.offer_action)
+        game_state.event_system.register_hook("PlayerActions", self.offer_action, owner=self)
 
     def offer_action(self, context):
         player = context['player']
         game_state = context['game_state']
         controller = context['controller']
-        if self in player.play_area['attachments']:
-            choice_indices = controller.get_choice(
-                f"Use {self.title}'s action? (Exhaust to add 2 resources to attached hero's resource pool)",
-                ["Yes", "No"]
-            )
-            if choice_indices and choice_indices[0] == 0:  # First option ("Yes")
+        if self.attached_to in player.play_area['heroes'] and not self.exhausted:
+            if controller.use_ability(self, "Use {title}'s action? (Exhaust to add 2 resources to attached hero's resource pool)"):
                 self.exhausted = True
                 attached_hero = self.attached_to
                 attached_hero.resources[self.sphere] += 2
                 
 class UnexpectedCourage(Attachment):
-    def __init__(self):
-        super().__init__("Unexpected Courage", 2, "Spirit")
-        self.description = "Attach to a hero. Action: Exhaust Unexpected Courage to ready attached hero."
-        self.add_keyword("Condition")
+    __slots__ = ()
+    DEFINITION = CardDefinition(
+        "Unexpected Courage", 2, "Spirit",
+        description="Attach to a hero. Action: Exhaust Unexpected Courage to ready attached hero.",
+        keywords=("Condition",))
 
     def play(self, game_state, controller):
         super().play(game_state, controller)
-        game_state.event_system.register_hook("PlayerActions", self.offer_action)
+        game_state.event_system.register_hook("PlayerActions", self.offer_action, owner=self)
 
     def offer_action(self, context):
         player = context['player']
         game_state = context['game_state']
         controller = context['controller']
-        if self in player.play_area['attachments']:
-            choice_indices = controller.get_choice(
-                f"Use {self.title}'s action? (Exhaust to ready attached hero)",
-                ["Yes", "No"]
-            )
-            if choice_indices and choice_indices[0] == 0:  # First option ("Yes")
+        if self.attached_to in player.play_area['heroes'] and not self.exhausted:
+            if controller.use_ability(self, "Use {title}'s action? (Exhaust to ready attached hero)"):
                 self.exhausted = True
                 attached_hero = self.attached_to
                 attached_hero.exhausted = False
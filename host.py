@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import time
+from greenlet import greenlet, getcurrent
+from core import *
+from quests import *
+from controllers import SeatedController, RandomController, USE_ABILITY
+
+
+def auto_pass(decision, options, multi_select=False):
+    """The answer given for a player who does not answer in time: pass, decline or take the first option"""
+    if multi_select or not options:
+        return []
+    if options[-1] is None:
+        return [len(options) - 1]
+    if decision == USE_ABILITY:
+        return [1]  # No
+    return [0]
+
+
+def agent_from(controller):
+    """An agent answering as a HeadlessController's decide() does; the controller must not need the game"""
+    async def agent(decision, options, multi_select=False):
+        return controller.decide(decision, options, multi_select)
+    return agent
+
+
+class RemoteSeat:
+    """An agent answered from outside, e.g. by a connection handler.
+
+    While the table waits on this seat, pending is (decision, options,
+    multi_select); answer() gives the chosen option indices.
+    """
+
+    def __init__(self):
+        self.pending = None
+        self._answer = None
+
+    async def __call__(self, decision, options, multi_select=False):
+        self.pending = (decision, options, multi_select)
+        self._answer = asyncio.get_running_loop().create_future()
+        try:
+            return await self._answer
+        finally:
+            self.pending = None
+            self._answer = None
+
+    def answer(self, choice):
+        if self._answer is None or self._answer.done():
+            raise RuntimeError("No decision is waiting on this seat")
+        self._answer.set_result(list(choice))
+
+
+class _TableController(SeatedController):
+    """Switches out of the game's greenlet to GameTable.play() with each
+    decision, and carries on with the answer it is switched back in with"""
+
+    def decide(self, decision, options, multi_select=False):
+        return getcurrent().parent.switch((self.acting_player(), decision, options, multi_select))
+
+
+class GameTable:
+    """One game hosted on an asyncio event loop.
+
+    agents[seat] is an async callable (decision, options, multi_select)
+    returning the chosen option indices, like HeadlessController.decide().
+    The phases themselves stay synchronous and run as a greenlet: at each
+    decision the game switches back to play(), which awaits the agent and
+    switches the answer back in, so the game carries on from where it
+    stopped. While the agent decides, the board stands at the decision for
+    anyone to look at (game_state.pending_decision is the decision). A
+    waiting table holds no thread, only its game, its greenlet and its
+    coroutine.
+
+    An agent that takes longer than timeout seconds is given auto_pass()'s
+    answer instead.
+    """
+
+    def __init__(self, decks, quest, agents, seed=None, timeout=None, max_rounds=100):
+        if len(agents) != len(decks):
+            raise ValueError(f"{len(decks)} decks need {len(decks)} agents, got {len(agents)}")
+        self.agents = agents
+        self.timeout = timeout
+        self.max_rounds = max_rounds
+        self.controller = _TableController()
+        players = [deck.build_player() for deck in decks]
+        self.game = Game(players, quest(), self.controller, NullRenderer(), seed)
+        self.waiting = None  # Seat whose agent is deciding
+        self.decisions = 0
+        self.timeouts = 0
+
+    @property
+    def result(self):
+        return self.game.result
+
+    async def play(self):
+        """Play the game to the end and return its result"""
+        coroutine = greenlet(self.game.run)
+        try:
+            pending = coroutine.switch(self.max_rounds)
+            while not coroutine.dead:
+                pending = coroutine.switch(await self._ask(*pending))
+            return pending  # What Game.run() returned
+        finally:
+            if not coroutine.dead:
+                coroutine.throw()  # Unwind a game given up on, e.g. a cancelled play()
+
+    async def _ask(self, player, decision, options, multi_select):
+        seat = self.game.game_state.players.index(player)
+        decide = self.agents[seat](decision, options, multi_select)
+        self.waiting = seat
+        try:
+            if self.timeout is None:
+                choice = await decide
+            else:
+                choice = await asyncio.wait_for(decide, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            choice = auto_pass(decision, options, multi_select)
+        finally:
+            self.waiting = None
+        self.decisions += 1
+        return list(choice)
+
+
+class GameHost:
+    """Many GameTables played concurrently on one event loop"""
+
+    def __init__(self):
+        self.tables = []
+
+    def open_table(self, decks, quest, agents, seed=None, timeout=None, max_rounds=100):
+        table = GameTable(decks, quest, agents, seed, timeout, max_rounds)
+        self.tables.append(table)
+        return table
+
+    async def play(self):
+        """Play every open table to the end and return their results, in the order they were opened"""
+        return await asyncio.gather(*(table.play() for table in self.tables))
+
+    def run(self):
+        return asyncio.run(self.play())
+
+
+def main(argv=None):
+    from simulate import GAVS_DECK
+    parser = argparse.ArgumentParser(description="Host many games of Fleeing from Mirkwood on one event loop")
+    parser.add_argument("-n", "--tables", type=int, default=100)
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    host = GameHost()
+    for i in range(args.tables):
+        seed = args.seed + i
+        host.open_table([GAVS_DECK] * args.players, FleeingFromMirkwood,
+                        [agent_from(RandomController(seed * 31 + seat)) for seat in range(args.players)], seed)
+    start = time.perf_counter()
+    results = host.run()
+    elapsed = time.perf_counter() - start
+    decisions = sum(table.decisions for table in host.tables)
+    console.print(f"Tables: {len(results)}  Win rate: [green]{results.count('victory') / len(results):.1%}"
+                  f"[/green]  {decisions} decisions in {elapsed:.2f}s")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import threading
+
+
+class Journal:
+    """The changes made to one game since GameState.mark(), each kept as
+    (undo, args) so that undo(*args) reverts it.
+
+    Every object of a game reaches the game's journal through its own
+    _journal link and checks recording before working out how to undo a
+    change, so a game nobody is journaling pays two attribute lookups per
+    change, and journaling one game leaves every other game alone. Objects
+    that are in no game link to NO_JOURNAL, which never records.
+
+    Undo functions are journaled changes like any other, so undoing
+    records how to make the undone changes again (see GameState.redo()).
+    """
+    recording = False
+    redo = None  # (mark, entries, state hash) to make again what the last undo_to() undid
+    _recorders = 0  # Journals recording in this process
+    _assignments = []  # (class, __setattr__) installed while any journal records
+    _lock = threading.Lock()  # Games journaled on different threads share _recorders and the setters
+
+    def __init__(self):
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, undo, *args):
+        """Journal undo(*args) as the way to revert a change"""
+        self.entries.append((undo, args))
+
+    def start(self):
+        if not self.recording:
+            with Journal._lock:
+                # Install the setters before recording, so no change made
+                # while this journal records goes around them
+                Journal._recorders += 1
+                if Journal._recorders == 1:
+                    for cls, setattr_ in Journal._assignments:
+                        cls.__setattr__ = setattr_
+            self.recording = True
+
+    def stop(self):
+        if self.recording:
+            self.recording = False
+            with Journal._lock:
+                Journal._recorders -= 1
+                if not Journal._recorders:
+                    for cls, _ in Journal._assignments:
+                        del cls.__setattr__
+
+    def _clone(self, memo):
+        # Entries point into the original game; a copy starts with none
+        if self is NO_JOURNAL:
+            return self
+        copy = memo[id(self)] = Journal()
+        return copy
+
+    def __reduce__(self):
+        return 'NO_JOURNAL' if self is NO_JOURNAL else (Journal, ())
+
+
+NO_JOURNAL = Journal()
+
+
+def journal_assignments(cls, setattr_):
+    """Make setattr_ cls.__setattr__ while any journal is recording.
+
+    Plain attribute assignment costs nothing extra while no game is
+    journaled; setattr_ itself has to check the object's own journal.
+    """
+    with Journal._lock:
+        Journal._assignments.append((cls, setattr_))
+        if Journal._recorders:
+            cls.__setattr__ = setattr_
+
+
+def undo_append(journal, items):
+    """Undoes items.append() for a list kept by the game"""
+    item = items.pop()
+    if journal.recording:
+        journal.record(redo_append, journal, items, item)
+
+
+def redo_append(journal, items, item):
+    items.append(item)
+    if journal.recording:
+        journal.record(undo_append, journal, items)
@@ -0,0 +1,490 @@
+import argparse
+import socket
+from core import *
+from quests import *
+from controllers import SeatedController, RandomController
+from records import write_varint, read_varint
+
+PROTOCOL_VERSION = 1
+
+# Frame types: the first byte of every frame
+HELLO, DELTA, DECISION, CHOICE, END = range(5)
+RESULTS = ("victory", "defeat", "timeout")
+
+# The board as clients see it: zones of cards, then counters, in this order
+PLAYER_ZONES = ("hand", "discard_pile", "heroes", "allies", "engaged_enemies")
+GAME_ZONES = ("staging_area", "encounter_discard", "victory_display")
+PLAYER_COUNTERS = ("threat", "deck")
+GAME_COUNTERS = ("encounter_deck", "round", "phase", "quest_progress", "location", "location_progress")
+CARD_FIELDS = ("willpower", "attack", "defense", "hit_points", "resources", "progress")
+
+
+def write_signed(out, value):
+    """Append an int that may be negative, zigzag encoded so small values of either sign take one byte"""
+    write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+def read_signed(data, pos):
+    value, pos = read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def write_string(out, text):
+    encoded = text.encode()
+    write_varint(out, len(encoded))
+    out += encoded
+
+
+def read_string(data, pos):
+    length, pos = read_varint(data, pos)
+    return bytes(data[pos:pos + length]).decode(), pos + length
+
+
+def option_label(option):
+    """How an option of a decision is shown to a remote player"""
+    if option is None:
+        return "Pass"
+    if isinstance(option, str):
+        return option
+    return getattr(option, 'title', None) or getattr(option, 'name', None) or str(option)
+
+
+class Connection:
+    """Frames over a socket, each sent as its length (a varint) then its bytes.
+
+    Frames are whole messages, so the same ones could travel as WebSocket
+    binary messages; only the framing here is TCP's.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.rfile = sock.makefile('rb')
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def send(self, frame):
+        out = bytearray()
+        write_varint(out, len(frame))
+        out += frame
+        self.sock.sendall(out)
+        self.bytes_sent += len(out)
+
+    def receive(self):
+        length = shift = 0
+        while True:
+            byte = self.rfile.read(1)
+            if not byte:
+                raise ConnectionError("Connection closed")
+            self.bytes_received += 1
+            length |= (byte[0] & 0x7f) << shift
+            if byte[0] < 0x80:
+                break
+            shift += 7
+        frame = self.rfile.read(length)
+        if len(frame) < length:
+            raise ConnectionError("Connection closed")
+        self.bytes_received += length
+        return frame
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+class BoardEncoder:
+    """Encodes what changed on the board since the last delta() as a DELTA frame.
+
+    A zone is sent, all of its cards, only when its GameState.state_hash()
+    key has changed, and that key is kept by the zone until a card in it
+    changes, so working out a delta costs one lookup per zone however full
+    the board is. Decks are sent as counts. Card titles are sent once, the
+    first time they are needed, and cards refer to them by number.
+    """
+
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.titles = {}  # Title -> number, as the clients have been told
+        self.zone_keys = None  # state_key() of each zone when last sent
+        self.counter_values = None
+
+    def zones(self):
+        game_state = self.game_state
+        zones = []
+        for player in game_state.players:
+            zones += [player.hand, player.discard_pile, player.play_area['heroes'], player.play_area['allies'],
+                      player.engaged_enemies]
+        zones += [game_state.staging_area, game_state.encounter_discard, game_state.victory_display]
+        return zones
+
+    def counters(self, new_titles):
+        game_state = self.game_state
+        values = []
+        for player in game_state.players:
+            values += [player.threat, len(player.deck)]
+        quest, location = game_state.active_quest, game_state.active_location
+        values += [len(game_state.encounter_deck), game_state.round_number, game_state.phase_index,
+                   quest.progress if quest is not None else 0,
+                   self._title(location, new_titles) + 1 if location is not None else 0,
+                   location.progress if location is not None else 0]
+        return values
+
+    def delta(self):
+        """The DELTA frame bringing a client's board up to date, or None if nothing changed"""
+        new_titles = []
+        body = bytearray()
+        counters = self.counters(new_titles)
+        previous = self.counter_values
+        changed_counters = [i for i, value in enumerate(counters) if previous is None or previous[i] != value]
+        write_varint(body, len(changed_counters))
+        for i in changed_counters:
+            write_varint(body, i)
+            write_signed(body, counters[i])
+        self.counter_values = counters
+
+        zones = self.zones()
+        keys = [zone.state_key() for zone in zones]
+        previous = self.zone_keys
+        changed_zones = [i for i, key in enumerate(keys) if previous is None or previous[i] != key]
+        write_varint(body, len(changed_zones))
+        for i in changed_zones:
+            write_varint(body, i)
+            self._write_cards(body, zones[i], new_titles)
+        self.zone_keys = keys
+
+        if not changed_counters and not changed_zones:
+            return None
+        frame = bytearray([DELTA])
+        write_varint(frame, len(new_titles))
+        for title in new_titles:
+            write_string(frame, title)
+        return bytes(frame + body)
+
+    def _title(self, card, new_titles):
+        number = self.titles.get(card.title)
+        if number is None:
+            number = self.titles[card.title] = len(self.titles)
+            new_titles.append(card.title)
+        return number
+
+    def _write_cards(self, out, cards, new_titles):
+        write_varint(out, len(cards))
+        for card in cards:
+            write_varint(out, self._title(card, new_titles))
+            out.append(card.exhausted | card.committed << 1)
+            for field in CARD_FIELDS:
+                value = getattr(card, field, 0)
+                if field == "resources":
+                    value = sum(value.values()) if value else 0
+                write_signed(out, value)
+            self._write_cards(out, card.attachments, new_titles)
+
+
+class RemoteCard:
+    """A card as a client sees it"""
+    __slots__ = ('title', 'exhausted', 'committed') + CARD_FIELDS + ('attachments',)
+
+    def __init__(self, title, exhausted, committed, fields, attachments):
+        self.title = title
+        self.exhausted = exhausted
+        self.committed = committed
+        for name, value in zip(CARD_FIELDS, fields):
+            setattr(self, name, value)
+        self.attachments = attachments  # RemoteCards
+
+    def _fields(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, RemoteCard) and self._fields() == other._fields()
+
+    def __repr__(self):
+        return f"RemoteCard({self.title!r})"
+
+
+class RemoteBoard:
+    """A client's copy of the board, brought up to date by each DELTA frame"""
+
+    def __init__(self, player_names):
+        self.player_names = list(player_names)
+        n_players = len(player_names)
+        self.titles = []
+        self.zones = [[] for _ in range(n_players * len(PLAYER_ZONES) + len(GAME_ZONES))]
+        self.counters = [0] * (n_players * len(PLAYER_COUNTERS) + len(GAME_COUNTERS))
+
+    def zone(self, name, seat=None):
+        if seat is None:
+            return self.zones[len(self.player_names) * len(PLAYER_ZONES) + GAME_ZONES.index(name)]
+        return self.zones[seat * len(PLAYER_ZONES) + PLAYER_ZONES.index(name)]
+
+    def counter(self, name, seat=None):
+        if seat is None:
+            return self.counters[len(self.player_names) * len(PLAYER_COUNTERS) + GAME_COUNTERS.index(name)]
+        return self.counters[seat * len(PLAYER_COUNTERS) + PLAYER_COUNTERS.index(name)]
+
+    @property
+    def active_location(self):
+        number = self.counter("location")
+        return self.titles[number - 1] if number else None
+
+    def apply(self, frame):
+        """Apply a DELTA frame"""
+        count, pos = read_varint(frame, 1)
+        for _ in range(count):
+            title, pos = read_string(frame, pos)
+            self.titles.append(title)
+        count, pos = read_varint(frame, pos)
+        for _ in range(count):
+            index, pos = read_varint(frame, pos)
+            self.counters[index], pos = read_signed(frame, pos)
+        count, pos = read_varint(frame, pos)
+        for _ in range(count):
+            index, pos = read_varint(frame, pos)
+            self.zones[index], pos = self._read_cards(frame, pos)
+
+    def _read_cards(self, data, pos):
+        count, pos = read_varint(data, pos)
+        cards = []
+        for _ in range(count):
+            title, pos = read_varint(data, pos)
+            flags = data[pos]
+            pos += 1
+            fields = []
+            for _ in CARD_FIELDS:
+                value, pos = read_signed(data, pos)
+                fields.append(value)
+            attachments, pos = self._read_cards(data, pos)
+            cards.append(RemoteCard(self.titles[title], bool(flags & 1), bool(flags & 2), fields, attachments))
+        return cards, pos
+
+    def describe(self, seat):
+        """A few lines of text showing the board to the player in seat"""
+        lines = [f"Round {self.counter('round')}  Quest progress {self.counter('quest_progress')}  "
+                 f"Location {self.active_location or 'None'}"]
+        lines.append("Staging area: " + ", ".join(c.title for c in self.zone("staging_area")))
+        for other, name in enumerate(self.player_names):
+            play_area = self.zone("heroes", other) + self.zone("allies", other)
+            lines.append(f"{name} (threat {self.counter('threat', other)}): " + ", ".join(
+                c.title + (" (exhausted)" if c.exhausted else "") for c in play_area))
+            engaged = self.zone("engaged_enemies", other)
+            if engaged:
+                lines.append("  Engaged: " + ", ".join(c.title for c in engaged))
+        lines.append("Hand: " + ", ".join(c.title for c in self.zone("hand", seat)))
+        return lines
+
+
+def encode_decision(decision, options, multi_select):
+    frame = bytearray([DECISION])
+    write_string(frame, decision)
+    frame.append(multi_select)
+    write_varint(frame, len(options))
+    for option in options:
+        write_string(frame, option_label(option))
+    return bytes(frame)
+
+
+def decode_decision(frame):
+    """Return (decision, option labels, multi_select) from a DECISION frame"""
+    decision, pos = read_string(frame, 1)
+    multi_select = bool(frame[pos])
+    count, pos = read_varint(frame, pos + 1)
+    labels = []
+    for _ in range(count):
+        label, pos = read_string(frame, pos)
+        labels.append(label)
+    return decision, labels, multi_select
+
+
+def encode_choice(choice):
+    frame = bytearray([CHOICE])
+    write_varint(frame, len(choice))
+    for index in choice:
+        write_varint(frame, index)
+    return bytes(frame)
+
+
+def decode_choice(frame):
+    count, pos = read_varint(frame, 1)
+    choice = []
+    for _ in range(count):
+        index, pos = read_varint(frame, pos)
+        choice.append(index)
+    return choice
+
+
+class NetworkController(SeatedController):
+    """Sends each decision to the client of the player it belongs to and plays their answer"""
+
+    def __init__(self, server, game=None):
+        super().__init__(game)
+        self.server = server
+
+    def decide(self, decision, options, multi_select=False):
+        return self.server.ask(self.acting_player(), decision, options, multi_select)
+
+
+class GameServer:
+    """Hosts one game for remote players, one TCP client per deck.
+
+    Players take their seats in the order they connect. Every client is
+    sent each state delta as it happens, and the decisions of its own
+    player; the whole board is only sent once, at the start. The game is
+    co-operative, so every player sees every hand.
+    """
+
+    def __init__(self, decks, quest, seed=None, host="127.0.0.1", port=0, max_rounds=100, timeout=None):
+        self.decks = decks
+        self.quest = quest
+        self.seed = seed
+        self.max_rounds = max_rounds
+        self.timeout = timeout
+        self.listener = socket.create_server((host, port))
+        self.listener.settimeout(timeout)
+        self.address = self.listener.getsockname()
+        self.connections = []
+        self.game = None
+        self.encoder = None
+
+    @property
+    def bytes_sent(self):
+        return sum(connection.bytes_sent for connection in self.connections)
+
+    def serve(self):
+        """Wait for every player, play the game and return its result"""
+        try:
+            while len(self.connections) < len(self.decks):
+                sock, _ = self.listener.accept()
+                sock.settimeout(self.timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.connections.append(Connection(sock))
+            players = [deck.build_player() for deck in self.decks]
+            self.game = Game(players, self.quest(), NetworkController(self), NullRenderer(), self.seed)
+            self.encoder = BoardEncoder(self.game.game_state)
+            for seat, connection in enumerate(self.connections):
+                hello = bytearray([HELLO, PROTOCOL_VERSION])
+                write_varint(hello, seat)
+                write_varint(hello, len(players))
+                for player in players:
+                    write_string(hello, player.name)
+                connection.send(bytes(hello))
+            result = self.game.run(self.max_rounds)
+            self.flush()
+            for connection in self.connections:
+                connection.send(bytes([END, RESULTS.index(result)]))
+            return result
+        finally:
+            self.close()
+
+    def flush(self):
+        """Send every client what changed since the last delta"""
+        frame = self.encoder.delta()
+        if frame is not None:
+            for connection in self.connections:
+                connection.send(frame)
+
+    def ask(self, player, decision, options, multi_select):
+        """Bring every board up to date, then have player's client answer a decision"""
+        self.flush()
+        seat = self.game.game_state.players.index(player)
+        connection = self.connections[seat]
+        connection.send(encode_decision(decision, options, multi_select))
+        frame = connection.receive()
+        if frame[0] != CHOICE:
+            raise ValueError(f"Expected a choice from seat {seat}, got frame type {frame[0]}")
+        choice = decode_choice(frame)
+        if (any(not 0 <= i < len(options) for i in choice)
+                or not multi_select and len(choice) != (1 if options else 0)):
+            raise ValueError(f"Seat {seat} chose {choice} for '{decision}' with {len(options)} options")
+        return choice
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.listener.close()
+
+
+class GameClient:
+    """One remote player: keeps a RemoteBoard of the game and answers its player's decisions"""
+
+    def __init__(self, address, timeout=None):
+        sock = socket.create_connection(address, timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connection = Connection(sock)
+        self.seat = None
+        self.board = None
+        self.result = None
+
+    def play(self, decide):
+        """Play until the game ends and return its result.
+
+        decide(decision, options, multi_select) answers each decision with a
+        list of option indices, as HeadlessController.decide() does; options
+        are the options' labels.
+        """
+        connection = self.connection
+        try:
+            while True:
+                frame = connection.receive()
+                kind = frame[0]
+                if kind == DELTA:
+                    self.board.apply(frame)
+                elif kind == DECISION:
+                    choice = decide(*decode_decision(frame))
+                    connection.send(encode_choice(choice))
+                elif kind == HELLO:
+                    if frame[1] != PROTOCOL_VERSION:
+                        raise ValueError(f"Unsupported protocol version {frame[1]}")
+                    self.seat, pos = read_varint(frame, 2)
+                    count, pos = read_varint(frame, pos)
+                    names = []
+                    for _ in range(count):
+                        name, pos = read_string(frame, pos)
+                        names.append(name)
+                    self.board = RemoteBoard(names)
+                elif kind == END:
+                    self.result = RESULTS[frame[1]]
+                    return self.result
+                else:
+                    raise ValueError(f"Unknown frame type {kind}")
+        finally:
+            connection.close()
+
+
+def main(argv=None):
+    from simulate import GAVS_DECK
+    parser = argparse.ArgumentParser(description="Play Fleeing from Mirkwood over the network")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Host a game and wait for the players")
+    serve.add_argument("--players", type=int, default=1)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=5741)
+    serve.add_argument("--seed", type=int, default=None)
+    join = commands.add_parser("join", help="Take a seat in a hosted game")
+    join.add_argument("--host", default="127.0.0.1")
+    join.add_argument("--port", type=int, default=5741)
+    join.add_argument("--random", type=int, metavar="SEED", help="Let a random controller play this seat")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = GameServer([GAVS_DECK] * args.players, FleeingFromMirkwood, args.seed, args.host, args.port)
+        console.print(f"Waiting for {args.players} player(s) on {args.host}:{server.address[1]}")
+        result = server.serve()
+        console.print(f"Game over: {result}, {server.bytes_sent} bytes sent")
+        return result
+
+    client = GameClient((args.host, args.port))
+    if args.random is not None:
+        decide = RandomController(args.random).decide
+    else:
+        keyboard = GameController()
+
+        def decide(decision, options, multi_select):
+            for line in client.board.describe(client.seat):
+                console.print(line)
+            return keyboard.get_choice(decision, options, multi_select)
+    result = client.play(decide)
+    console.print(f"Game over: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,24 @@
+from core import *
+
 class Phase(ABC):
     def end(self, game_state):
-        game_state.event_system.trigger_event("EndOfPhase", {"game_state": game_state})
+        if game_state.expiries:
+            game_state.expiries.drain(game_state)
+        events = game_state.event_system
+        if END_OF_PHASE in events.hooks:
+            events.trigger_event(END_OF_PHASE, GameStateEvent(game_state))
 
 class ResourcePhase(Phase):
     def execute(self, game_state, controller):
         
-        game_state.event_system.trigger_event("ResourcePhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Resource Phase")
+        game_state.event_system.trigger_event(RESOURCE_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Resource Phase")
         
         for player in game_state.players:
-            console.print(f"Refreshing [yellow]{player.name}...")
-            player.refresh_resources()
+            game_state.renderer.refreshing(player)
+            player.refresh_resources(game_state)
                 
-        game_state.event_system.trigger_event("ResourcePhaseEnd", game_state)
+        game_state.event_system.trigger_event(RESOURCE_PHASE_END, game_state)
         self.end(game_state)
 
     def render(self, game_state):
@@ -23,23 +28,27 @@ class QuestPhase(Phase):
     def execute(self, game_state, controller):
         
         
-        game_state.event_system.trigger_event("QuestPhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Quest Phase")
+        game_state.event_system.trigger_event(QUEST_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Quest Phase")
         if not game_state.active_quest:
-            console.log("No active quest!")
+            game_state.renderer.no_active_quest()
             return
         
         # Commit characters and handle exhaustion
         contributors = []
-        for p in game_state.players:
-            self.commit_characters(player, controller)
+        for player in game_state.players:
+            contributors += self.commit_characters(player, controller)
+        
+        events = game_state.event_system
+        if BEFORE_QUEST_RESOLUTION in events.hooks:
+            for player in game_state.players:
+                events.trigger_event(BEFORE_QUEST_RESOLUTION, PlayerTurnEvent(player, game_state, controller))
         
         # Calculate willpower
         total_willpower = sum(c.willpower for c in contributors)
         
         # Calculate staging threat
-        staging_threat = sum(c.threat for c in game_state.staging_area)
+        staging_threat = game_state.staging_area.threat
         if game_state.active_location:
             staging_threat += game_state.active_location.threat
             
@@ -50,9 +59,8 @@ class QuestPhase(Phase):
                 if game_state.active_location.add_progress(net_progress, game_state):
                     game_state.active_location = None
             else:
-                game_state.quest_progress += net_progress
-                console.log(f"Added {net_progress} progress to {game_state.active_quest.title} "
-                      f"({game_state.active_quest.progress}/{game_state.active_quest.required_progress})")
+                game_state.active_quest.progress += net_progress
+                game_state.renderer.quest_progress(game_state, net_progress)
         else:
             threat_increase = -net_progress
             for player in game_state.players:
@@ -60,39 +68,28 @@ class QuestPhase(Phase):
 
                 
         for player in game_state.players:
-            for c in player.play_area['heroes'] + player.play_area['allies']:
-                if c.committed:
-                    # Fire event for possible exhaustion prevention
-                    exhaustion_context = {
-                        'character': c,
-                        'player': player,
-                        'game_state': game_state,
-                        'prevent_exhaustion': False
-                    }
-                    game_state.event_system.trigger_event(
-                        "BeforeQuestExhaustion",
-                        exhaustion_context
+            for c in player.characters.committed:
+                # Fire event for possible exhaustion prevention
+                prevent_exhaustion = False
+                if BEFORE_QUEST_EXHAUSTION in events.hooks:
+                    exhaustion_context = events.trigger_event(
+                        BEFORE_QUEST_EXHAUSTION,
+                        QuestExhaustionEvent(c, player, game_state, False)
                     )
-                    
-                    if not exhaustion_context['prevent_exhaustion']:
-                        c.exhausted = True
+                    prevent_exhaustion = exhaustion_context.prevent_exhaustion
+                
+                if not prevent_exhaustion:
+                    c.exhausted = True
+                c.committed = False
         
-        game_state.event_system.trigger_event("QuestPhaseEnd", game_state)
+        game_state.event_system.trigger_event(QUEST_PHASE_END, game_state)
         self.end(game_state)
 
-    def commit_characters(controller, player):
-        # Controller method
-        available = [c for c in player.play_area['heroes'] + player.play_area['allies']
-                    if not c.exhausted and c.can_quest()]
-        
-        choices = controller.get_choice(
-            "Select characters to commit to quest:",
-            [f"{c.title} (Willpower {c.willpower})" for c in available],
-            multi_select=True
-        )
-        
-        for idx in choices:
-            available[idx].committed = True
+    def commit_characters(self, player, controller):
+        committed = controller.choose_characters_to_commit(player, player.characters.questers)
+        for c in committed:
+            c.committed = True
+        return committed
     
     def render(self, game_state):
         pass
@@ -100,9 +97,9 @@ class QuestPhase(Phase):
 class PlanningPhase(Phase):
     def execute(self, game_state, controller):
         
-        game_state.event_system.trigger_event("PlanningPhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Planning Phase")
+        game_state.event_system.trigger_event(PLANNING_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Planning Phase")
+        events = game_state.event_system
         for player in game_state.players:
             while True:
                 player.render(game_state)
@@ -113,23 +110,16 @@ class PlanningPhase(Phase):
                     
                 if player.can_afford(card.cost, card.sphere):
                     player.play_card(card, game_state, controller)
-                    if isinstance(card, Ally):
-                        game_state.event_system.trigger_event(
-                            "AfterAllyPlayed",
-                            {
-                                'ally': card,
-                                'player': player,
-                                'game_state': game_state
-                            }
+                    if isinstance(card, Ally) and AFTER_ALLY_PLAYED in events.hooks:
+                        events.trigger_event(
+                            AFTER_ALLY_PLAYED,
+                            AllyPlayedEvent(card, player, game_state, controller)
                         )
                 else:
-                    console.log("Can't afford this card!")
-            game_state.event_system.trigger_event("PlayerActions", {
-                "player": player,
-                "game_state": game_state,
-                "controller": controller
-            })
-        game_state.event_system.trigger_event("PlanningPhaseEnd", game_state)
+                    game_state.renderer.cannot_afford(card)
+            if PLAYER_ACTIONS in events.hooks:
+                events.trigger_event(PLAYER_ACTIONS, PlayerTurnEvent(player, game_state, controller))
+        game_state.event_system.trigger_event(PLANNING_PHASE_END, game_state)
         self.end(game_state)
     
     def render(self, game_state):
@@ -139,30 +129,31 @@ class TravelPhase(Phase):
     def execute(self, game_state, controller):
         
 
-        game_state.event_system.trigger_event("TravelPhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Travel Phase")
+        game_state.event_system.trigger_event(TRAVEL_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Travel Phase")
         
         # Players may travel to a location
         if game_state.active_location is None:
-            game_state.event_system.trigger_event("BeforeTravelActions", game_state)
+            game_state.event_system.trigger_event(BEFORE_TRAVEL_ACTIONS, game_state)
             
             # Player chooses a location from staging area
             travel_options = [card for card in game_state.staging_area if isinstance(card, Location)]
             if travel_options:
-                chosen_location = game_state.active_player.select_location_to_travel(travel_options)
+                chosen_location = game_state.active_player.select_location_to_travel(travel_options, controller)
                 if chosen_location:
                     # Move location from staging to active
-                    game_state.staging_area.remove(chosen_location)
+                    game_state.move_card(chosen_location, None)
                     game_state.active_location = chosen_location
                     chosen_location.on_travel(game_state)
                     
-                    game_state.event_system.trigger_event(
-                        "LocationTraveled", 
-                        {"location": chosen_location, "player": game_state.active_player}
-                    )
+                    events = game_state.event_system
+                    if LOCATION_TRAVELED in events.hooks:
+                        events.trigger_event(
+                            LOCATION_TRAVELED,
+                            LocationEvent(chosen_location, game_state, game_state.active_player)
+                        )
         
-        game_state.event_system.trigger_event("TravelPhaseEnd", game_state)
+        game_state.event_system.trigger_event(TRAVEL_PHASE_END, game_state)
         self.end(game_state)
     
     def render(self, game_state):
@@ -172,44 +163,40 @@ class EncounterPhase(Phase):
     def execute(self, game_state, controller):
         
 
-        game_state.event_system.trigger_event("EncounterPhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Encounter Phase")
+        game_state.event_system.trigger_event(ENCOUNTER_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Encounter Phase")
         
         # Reveal encounter cards
-        revealed_cards = self.reveal_encounter_cards(game_state)
-        game_state.staging_area.extend(revealed_cards)
+        for card in self.reveal_encounter_cards(game_state):
+            game_state.move_card(card, game_state.staging_area)
         
         # Handle enemy engagements
-        for player in game_state.players:
-            self.handle_engagement(player, game_state)
+        self.handle_engagement(game_state)
         
-        game_state.event_system.trigger_event("EncounterPhaseEnd", game_state)
+        game_state.event_system.trigger_event(ENCOUNTER_PHASE_END, game_state)
         self.end(game_state)
         
     def reveal_encounter_cards(self, game_state):
         # Implementation depends on your encounter deck setup
         # This could reveal 1 card per player or other logic
-        return [game_state.encounter_deck.draw()]  # Simplified
+        card = game_state.draw_encounter_card()  # Simplified
+        return [card] if card else []
         
     def handle_engagement(self, game_state):
-        players_in_order = game_state.players[game_state.active_player_idx:] + \
-                      game_state.players[:game_state.active_player_idx]
-        game_state.event_system.trigger_event(
-            "BeforeEnemyEngagement",
-            {"enemy": enemy, "player": player}
-        )
-        for enemy in list(game_state.staging_area):
-            if isinstance(enemy, Enemy):
-                for player in players_in_order:
-                    if player.threat >= enemy.engagement:
-                        enemy.engage(player,game_state)
-                        break
-                    
-                game_state.event_system.trigger_event(
-                    "AfterEnemyEngagement",
-                    {"enemy": enemy, "player": player}
-                )
+        active_idx = game_state.players.index(game_state.active_player)
+        players_in_order = game_state.players[active_idx:] + \
+                      game_state.players[:active_idx]
+        events = game_state.event_system
+        highest_threat = max(player.threat for player in players_in_order)
+        for enemy in game_state.staging_area.enemies_within(highest_threat):
+            for player in players_in_order:
+                if player.threat >= enemy.engagement:
+                    if BEFORE_ENEMY_ENGAGEMENT in events.hooks:
+                        events.trigger_event(BEFORE_ENEMY_ENGAGEMENT, EnemyEvent(enemy, player))
+                    enemy.engage(player,game_state)
+                    if AFTER_ENEMY_ENGAGEMENT in events.hooks:
+                        events.trigger_event(AFTER_ENEMY_ENGAGEMENT, EnemyEvent(enemy, player))
+                    break
     def render(self, game_state):
         pass
 
@@ -227,9 +214,8 @@ class CombatPhase(Phase):
     def execute(self, game_state, controller):
         
 
-        game_state.event_system.trigger_event("CombatPhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Combat Phase")
+        game_state.event_system.trigger_event(COMBAT_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Combat Phase")
         
         # First resolve enemy attacks
         for player in game_state.players:
@@ -241,32 +227,30 @@ class CombatPhase(Phase):
             if player.engaged_enemies:
                 self.resolve_player_attacks(player, game_state, controller)
         
-        game_state.event_system.trigger_event("CombatPhaseEnd", game_state)
+        game_state.event_system.trigger_event(COMBAT_PHASE_END, game_state)
         self.end(game_state)
         
     def resolve_enemy_attack(self, enemy, player, game_state, controller):
-        game_state.event_system.trigger_event(
-            "BeforeEnemyAttack",
-            {"enemy": enemy, "player": player}
-        )
+        events = game_state.event_system
+        if BEFORE_ENEMY_ATTACK in events.hooks:
+            events.trigger_event(BEFORE_ENEMY_ATTACK, EnemyEvent(enemy, player))
 
-        game_state.event_system.trigger_event("BeforeDrawingShadowCard", {"enemy": enemy})
+        if BEFORE_DRAWING_SHADOW_CARD in events.hooks:
+            events.trigger_event(BEFORE_DRAWING_SHADOW_CARD, ShadowEvent(enemy))
         shadow_card = game_state.draw_encounter_card()
-        if shadow_card and hasattr(shadow_card, "shadow_effect"):
-            shadow_card.shadow_effect.apply(game_state, enemy)
-        
-        game_state.encounter_discard.append(shadow_card)
-        #todo: does that ^ remove it from the enemy card?
-
-        game_state.event_system.trigger_event("ShadowCardRevealed", {"enemy": enemy, "shadow_card": shadow_card})
+        if SHADOW_CARD_REVEALED in events.hooks:
+            events.trigger_event(SHADOW_CARD_REVEALED, ShadowEvent(enemy, shadow_card))
         
         # Determine defender
         defender = player.select_defender(enemy, controller)
+        if shadow_card:
+            if hasattr(shadow_card, "shadow_effect"):
+                shadow_card.shadow_effect({"enemy": enemy, "defender": defender, "game_state": game_state})
+            game_state.move_card(shadow_card, game_state.encounter_discard)
+
         if defender:
-            game_state.event_system.trigger_event(
-                "AfterDefenderDeclared",
-                {"enemy": enemy, "defender": defender, "player": player}
-            )
+            if AFTER_DEFENDER_DECLARED in events.hooks:
+                events.trigger_event(AFTER_DEFENDER_DECLARED, EnemyEvent(enemy, player, defender))
             
             # Calculate attack and defense
             attack_strength = enemy.attack
@@ -281,71 +265,60 @@ class CombatPhase(Phase):
             # Apply damage
             defender.hit_points -= damage
             if defender.hit_points <= 0:
-                if isinstance(defender, Ally):
-                    player.play_area['allies'].remove(defender)
-                elif isinstance(defender, Hero):
+                if isinstance(defender, Hero):
                     # Handle hero defeat (game over check happens later)
                     defender.hit_points = 0
-                player.discard_pile.append(defender)
-                game_state.event_system.trigger_event(
-                    "CharacterDefeated",
-                    {"character": defender, "player": player}
-                )
+                game_state.move_card(defender, player.discard_pile)
+                defender.leave_play(game_state)
+                if CHARACTER_DEFEATED in events.hooks:
+                    events.trigger_event(CHARACTER_DEFEATED, CharacterDefeatedEvent(defender, player))
 
-            if shadow_card:
-                game_state.encounter_discard.append(shadow_card)
-            
             # Handle enemy defeat
             if enemy.hit_points <= 0:
-                player.engaged_enemies.remove(enemy)
-                game_state.encounter_discard.append(enemy)
-                game_state.event_system.trigger_event(
-                    "EnemyDefeated",
-                    {"enemy": enemy, "player": player}
-                )
+                game_state.move_card(enemy, game_state.encounter_discard)
+                enemy.leave_play(game_state)
+                if ENEMY_DEFEATED in events.hooks:
+                    events.trigger_event(ENEMY_DEFEATED, EnemyEvent(enemy, player))
+
+        if AFTER_ENEMY_ATTACK in events.hooks:
+            events.trigger_event(AFTER_ENEMY_ATTACK, EnemyEvent(enemy, player, defender))
         
     def resolve_player_attacks(self, player, game_state, controller):
+        events = game_state.event_system
         while player.engaged_enemies:
-            enemy = controller.choose_enemy_to_attack(player.engaged_enemies)
+            enemy = controller.choose_enemy_to_attack(player, player.engaged_enemies)
             if not enemy:
                 break
                 
-            valid_attackers = [
-                c for c in player.play_area['heroes'] + player.play_area['allies']
-                if not c.exhausted and c.can_attack
-            ]
+            valid_attackers = player.characters.attackers
             if not valid_attackers:
                 break
                 
             total_attack = 0
             attackers = controller.choose_attackers(valid_attackers)
+            if not attackers:
+                break
             for attacker in attackers:
                 attacker.exhausted = True
 
                 # Calculate attack with modifiers
-                attack_context = {
-                    'attacker': attacker,
-                    'base_attack': attacker.attack,
-                    'modified_attack': attacker.attack,
-                    'game_state': game_state,
-                    'player': player,
-                    'enemy': enemy
-                }
-                game_state.event_system.trigger_event("CalculateAttack", attack_context)
-                total_attack += attack_context['modified_attack']
+                if CALCULATE_ATTACK in events.hooks:
+                    attack_context = events.trigger_event(
+                        CALCULATE_ATTACK,
+                        AttackEvent(attacker, attacker.attack, attacker.attack, game_state, player, enemy)
+                    )
+                    total_attack += attack_context.modified_attack
+                else:
+                    total_attack += attacker.attack
                 
             damage = max(0, total_attack - enemy.defense)
             enemy.hit_points -= damage
             
             if enemy.hit_points <= 0:
-                player.engaged_enemies.remove(enemy)
-                game_state.encounter_discard.append(enemy)
-                game_state.event_system.trigger_event("EnemyDefeated", {"enemy": enemy})
-    
-        game_state.event_system.trigger_event(
-            "AfterEnemyAttack",
-            {"enemy": enemy, "player": player, "defender": defender}
-        )
+                game_state.move_card(enemy, game_state.encounter_discard)
+                enemy.leave_play(game_state)
+                if ENEMY_DEFEATED in events.hooks:
+                    events.trigger_event(ENEMY_DEFEATED, EnemyEvent(enemy, player))
     
     def render(self, game_state):
         pass
@@ -354,14 +327,13 @@ class RefreshPhase(Phase):
     def execute(self, game_state, controller):
         
 
-        game_state.event_system.trigger_event("RefreshPhaseStart", game_state)
-        controller.display_game_state()
-        console.rule("Refresh Phase")
+        game_state.event_system.trigger_event(REFRESH_PHASE_START, game_state)
+        game_state.renderer.phase_started(game_state, "Refresh Phase")
         
         # Ready all cards
         for player in game_state.players:
             self.ready_characters(player)
-            player.new_allies_this_round.clear()  # Reset new allies
+            player.new_allies_this_round = []  # Reset new allies
 
             player.threat += 1  # Increase threat each round
             
@@ -376,13 +348,15 @@ class RefreshPhase(Phase):
         new_idx = (current_idx + 1) % len(game_state.players)
         game_state.active_player = game_state.players[new_idx]
         
-        game_state.event_system.trigger_event("RefreshPhaseEnd", game_state)
+        game_state.event_system.trigger_event(REFRESH_PHASE_END, game_state)
         self.end(game_state)
         
         
     def ready_characters(self, player):
-        for char in player.play_area['heroes'] + player.play_area['allies']:
+        for char in player.characters.all:
             char.exhausted = False
+            for attachment in char.attachments:
+                attachment.exhausted = False
 
     def render(self, game_state):
         pass
\ No newline at end of file
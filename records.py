@@ -0,0 +1,141 @@
+import argparse
+from core import *
+from quests import *
+from controllers import HeadlessController
+
+RECORD_VERSION = 1
+
+
+def write_varint(out, value):
+    """Append a non-negative int to a bytearray, 7 bits per byte"""
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """Read a varint from data at pos and return (value, position after it)"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class GameRecord:
+    """The seed and every decision of one headless game, packed as varints.
+
+    A single choice is stored as its index + 1 (0 for no choice) and a
+    multi-select choice as a bitmask of the chosen indices, so most decisions
+    take one byte. The decks and quest are not stored; replay() is given them.
+    """
+
+    def __init__(self, seed, max_rounds=None, decisions=b""):
+        self.seed = seed
+        self.max_rounds = max_rounds
+        self.decisions = bytearray(decisions)
+
+    def add(self, choice, multi_select=False):
+        if multi_select:
+            mask = 0
+            for index in choice:
+                mask |= 1 << index
+            write_varint(self.decisions, mask)
+        else:
+            write_varint(self.decisions, choice[0] + 1 if choice else 0)
+
+    def to_bytes(self):
+        out = bytearray([RECORD_VERSION])
+        write_varint(out, self.seed)
+        write_varint(out, self.max_rounds + 1 if self.max_rounds is not None else 0)
+        write_varint(out, len(self.decisions))
+        return bytes(out + self.decisions)
+
+    @classmethod
+    def from_bytes(cls, data, pos=0):
+        """Decode the record at pos in data and return (record, position after it)"""
+        if data[pos] != RECORD_VERSION:
+            raise ValueError(f"Unsupported game record version {data[pos]}")
+        seed, pos = read_varint(data, pos + 1)
+        max_rounds, pos = read_varint(data, pos)
+        length, pos = read_varint(data, pos)
+        record = cls(seed, max_rounds - 1 if max_rounds else None, data[pos:pos + length])
+        return record, pos + length
+
+
+def write_records(path, records):
+    """Write records one after another to a file"""
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(record.to_bytes())
+
+
+def read_records(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    pos = 0
+    while pos < len(data):
+        record, pos = GameRecord.from_bytes(data, pos)
+        records.append(record)
+    return records
+
+
+class ReplayController(HeadlessController):
+    """Answers each decision with the next one stored in a GameRecord"""
+
+    def __init__(self, record, game=None):
+        super().__init__(game)
+        self.data = record.decisions
+        self.position = 0
+
+    def decide(self, decision, options, multi_select=False):
+        if self.position >= len(self.data):
+            raise IndexError(f"Game record exhausted at decision '{decision}'")
+        value, self.position = read_varint(self.data, self.position)
+        if multi_select:
+            return [i for i in range(value.bit_length()) if value >> i & 1]
+        return [value - 1] if value else []
+
+
+def replay(record, decks, quest, renderer=None):
+    """Play a recorded game again and return its finished Game.
+
+    decks and quest must be the ones the game was recorded with. Nothing is
+    shown unless a renderer is given.
+    """
+    players = [deck.build_player() for deck in decks]
+    game = Game(players, quest(), ReplayController(record),
+                renderer if renderer is not None else NullRenderer(), record.seed)
+    game.run(record.max_rounds)
+    return game
+
+
+def main(argv=None):
+    from simulate import GAVS_DECK
+    parser = argparse.ArgumentParser(description="Replay games recorded by simulate.py --record")
+    parser.add_argument("path")
+    parser.add_argument("games", type=int, nargs="*", help="Positions of the games to replay (default: all)")
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--show", action="store_true", help="Render the replayed games")
+    parser.add_argument("--live", action="store_true",
+                        help="With --show, keep the board in place and redraw only what changed")
+    args = parser.parse_args(argv)
+
+    records = read_records(args.path)
+    for index in args.games or range(len(records)):
+        record = records[index]
+        renderer = None
+        if args.show:
+            renderer = LiveRenderer(console) if args.live else RichRenderer(console)
+        game = replay(record, [GAVS_DECK] * args.players, FleeingFromMirkwood, renderer)
+        console.print(f"Game {index} (seed {record.seed}): {game.result} after "
+                      f"{game.game_state.round_number} rounds, {len(record.decisions)} bytes of decisions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+import io
+from collections import deque
+from rich.console import Console, Group
+from rich.control import Control, ControlType
+from rich.panel import Panel
+from rich.columns import Columns
+from rich.live import Live
+from rich.live_render import LiveRender
+from rich.segment import Segment
+from rich.styled import Styled
+from rich.text import Text
+
+
+class Renderer:
+    """Receives everything the game wants to show.
+
+    The game calls these hooks with the objects involved rather than with
+    formatted text, so a renderer that shows nothing costs one method call per
+    message. The base class discards everything.
+    """
+
+    def rule(self, title):
+        pass
+
+    def game_started(self, game_state):
+        pass
+
+    def phase_started(self, game_state, title):
+        pass
+
+    def round_completed(self, game_state):
+        pass
+
+    def game_won(self, game_state):
+        pass
+
+    def game_lost(self, player, reason):
+        """reason is "threat" or "heroes" """
+        pass
+
+    def game_abandoned(self, max_rounds):
+        pass
+
+    def drawing_card(self, player):
+        pass
+
+    def deck_reshuffled(self, player):
+        pass
+
+    def deck_exhausted(self, player):
+        pass
+
+    def card_drawn(self, player, card):
+        pass
+
+    def refreshing(self, player):
+        pass
+
+    def resource_added(self, hero):
+        pass
+
+    def no_active_quest(self):
+        pass
+
+    def quest_progress(self, game_state, amount):
+        pass
+
+    def cannot_afford(self, card):
+        pass
+
+    def hand(self, player):
+        pass
+
+    def board(self, game_state):
+        pass
+
+    def summary(self, game_state):
+        """A few lines on the round, phase, quest and encounter deck"""
+        pass
+
+
+class NullRenderer(Renderer):
+    """Shows nothing; used for headless games"""
+
+
+class PlainRenderer(Renderer):
+    """Unstyled text output, for logs and terminals without Rich"""
+
+    def __init__(self, write=print):
+        self.write = write
+
+    def rule(self, title):
+        self.write(f"--- {title} ---")
+
+    def game_started(self, game_state):
+        self.rule("Starting game!")
+        if game_state.active_quest:
+            self.write(f"Active Quest: {game_state.active_quest.title}")
+            self.write(f"Required Progress: {game_state.active_quest.required_progress}")
+
+    def phase_started(self, game_state, title):
+        self.board(game_state)
+        self.rule(title)
+
+    def round_completed(self, game_state):
+        self.write(f"Completed round {game_state.round_number}")
+
+    def game_won(self, game_state):
+        self.write(f"Victory! Completed quest: {game_state.active_quest.title}")
+
+    def game_lost(self, player, reason):
+        if reason == "threat":
+            self.write(f"Game Over! {player.name} reached 50 threat!")
+        else:
+            self.write(f"Game Over! {player.name} has no surviving heroes!")
+
+    def game_abandoned(self, max_rounds):
+        self.write(f"Game abandoned after {max_rounds} rounds")
+
+    def drawing_card(self, player):
+        self.write(f"{player.name} is drawing a card...")
+
+    def deck_reshuffled(self, player):
+        self.write("\tThe deck is empty. Reshuffling the discard into the deck.")
+
+    def deck_exhausted(self, player):
+        self.write("Still no cards in the deck, this means you lose!")
+
+    def card_drawn(self, player, card):
+        self.write(f"\tDrawn card: {card.title}")
+
+    def refreshing(self, player):
+        self.write(f"Refreshing {player.name}...")
+
+    def resource_added(self, hero):
+        self.write(f"Adding 1 {hero.sphere} resource to {hero.title}")
+
+    def no_active_quest(self):
+        self.write("No active quest!")
+
+    def quest_progress(self, game_state, amount):
+        quest = game_state.active_quest
+        self.write(f"Added {amount} progress to {quest.title} ({quest.progress}/{quest.required_progress})")
+
+    def cannot_afford(self, card):
+        self.write(f"Can't afford {card.title}!")
+
+    def hand(self, player):
+        self.write(f"{player.name}'s Hand (Threat: {player.threat})")
+        for card in player.hand:
+            self.write(f"  {card.title} ({card.cost} {card.sphere})")
+
+    def board(self, game_state):
+        quest = game_state.active_quest
+        if quest:
+            self.write(f"Active Quest: {quest.title} {quest.progress}/{quest.required_progress}")
+        self.write("Staging Area: " + ", ".join(f"{c.title} (Threat: {c.threat})" for c in game_state.staging_area))
+        for p in game_state.players:
+            self.write(f"{p.name}'s Engaged Enemies: " + ", ".join(e.title for e in p.engaged_enemies))
+            self.write(f"{p.name}'s Play Area: " + ", ".join(
+                c.title for c in p.play_area['heroes'] + p.play_area['allies']))
+        location = game_state.active_location
+        if location:
+            self.write(f"Active Location: {location.title} {location.progress}/{location.quest_points}")
+
+    def summary(self, game_state):
+        location = game_state.active_location
+        self.write(f"Game State (Round {game_state.round_number})")
+        self.write(f"Phase: {game_state.current_phase}")
+        self.write(f"Quest Progress: {game_state.active_quest.progress}")
+        self.write(f"Active Location: {location.title if location else 'None'}")
+        self.write(f"Staging Area: {[c.title for c in game_state.staging_area]}")
+        self.write(f"Encounter Deck: {len(game_state.encounter_deck)} cards")
+
+
+class RichRenderer(Renderer):
+    """The styled terminal view"""
+
+    def __init__(self, console=None):
+        self.console = console if console is not None else Console()
+
+    def rule(self, title):
+        self.console.rule(title)
+
+    def game_started(self, game_state):
+        self.console.rule("Starting game!")
+        if game_state.active_quest:
+            self.console.print(f"Active Quest: [yellow]{game_state.active_quest.title}[/yellow]")
+            self.console.print(f"Required Progress: {game_state.active_quest.required_progress}")
+
+    def phase_started(self, game_state, title):
+        self.board(game_state)
+        self.console.rule(title)
+
+    def round_completed(self, game_state):
+        self.console.print(f"[green]Completed round {game_state.round_number}[/green]")
+
+    def game_won(self, game_state):
+        self.console.print(f"[green]Victory![/green] Completed quest: [yellow]{game_state.active_quest.title}[/yellow]")
+
+    def game_lost(self, player, reason):
+        if reason == "threat":
+            self.console.print(f"[red]Game Over![/red] [yellow]{player.name}[/yellow] reached 50 threat!")
+        else:
+            self.console.print(f"[red]Game Over![/red] [yellow]{player.name}[/yellow] has no surviving heroes!")
+
+    def game_abandoned(self, max_rounds):
+        self.console.print(f"[red]Game abandoned after {max_rounds} rounds[/red]")
+
+    def drawing_card(self, player):
+        self.console.print(f"[yellow]{player.name}[/yellow] is drawing a card...")
+
+    def deck_reshuffled(self, player):
+        self.console.print("\tThe deck is empty. Reshuffling the discard into the deck.")
+
+    def deck_exhausted(self, player):
+        self.console.print("[red]Still no cards in the deck, this means you lose![/red]")
+
+    def card_drawn(self, player, card):
+        colour = card.getColour()
+        self.console.print(f"\tDrawn card: [{colour}]{card.title}[/{colour}]")
+
+    def refreshing(self, player):
+        self.console.print(f"Refreshing [yellow]{player.name}...")
+
+    def resource_added(self, hero):
+        colour = hero.getColour()
+        self.console.print(f"Adding 1 [{colour}]{hero.sphere}[/{colour}] resource to {hero.title}")
+
+    def no_active_quest(self):
+        self.console.log("No active quest!")
+
+    def quest_progress(self, game_state, amount):
+        quest = game_state.active_quest
+        self.console.log(f"Added {amount} progress to {quest.title} "
+              f"({quest.progress}/{quest.required_progress})")
+
+    def cannot_afford(self, card):
+        self.console.log("Can't afford this card!")
+
+    def hand(self, player):
+        self.console.print(self.hand_panel(player))
+
+    def summary(self, game_state):
+        console = self.console
+        location = game_state.active_location
+        console.print(f"Game State (Round {game_state.round_number})")
+        console.print(f"Phase: {game_state.current_phase}")
+        console.print(f"Quest Progress: {game_state.active_quest.progress}")
+        console.print(f"Active Location: {location.title if location else 'None'}")
+        console.print(f"Staging Area 🗡️ {[c.title for c in game_state.staging_area]}")
+        console.print(f"Encounter Deck: {len(game_state.encounter_deck)} cards")
+
+    def board(self, game_state):
+        for panel in self.board_panels(game_state):
+            self.console.print(panel)
+
+    def hand_panel(self, player):
+        # Build list of renderables for the hand
+        hand_renderables = []
+        for card in player.hand:
+            hand_renderables.append(card.render_panel(in_hand=True, show_description=True))
+
+        return Panel(
+            Group(*hand_renderables),
+            title=f":bust_in_silhouette: {player.name}'s Hand",
+            subtitle=f"Threat: [red]{player.threat}",
+            expand=False
+        )
+
+    def board_panels(self, game_state):
+        """The panels board() shows, top to bottom"""
+        panels = [self.quest_panel(game_state), self.staging_area_panel(game_state)]
+        panels += [self.play_area_panel(p) for p in game_state.players]
+        if game_state.active_location:
+            panels.append(self.location_panel(game_state))
+        return panels
+
+    def quest_panel(self, game_state):
+        return Panel(
+            f"[yellow]{game_state.active_quest.title}[/yellow]",
+            title=":scroll: Active Quest",
+            subtitle=f"[white]{game_state.active_quest.progress}[white]/[white]{game_state.active_quest.required_progress}",
+            expand=False
+        )
+
+    def staging_area_panel(self, game_state):
+        staging_area_panel = Panel(
+            "\n".join([f"{card.title} (Threat: {card.threat})" for card in game_state.staging_area]),
+            title=":crossed_swords: Staging Area",
+            expand=False
+        )
+        return Styled(staging_area_panel, "on #220000")
+
+    def play_area_panel(self, p):
+        """p's engaged enemies and the cards in their play area"""
+        play_area_panels = []
+
+        engaged_enemies_panel = Panel(
+            "\n".join([f"{enemy.title} (💪{enemy.attack}, ✋{enemy.defense}, ❤️{enemy.hit_points})" for enemy in p.engaged_enemies]),
+            title=f":japanese_ogre: {p.name}'s Engaged Enemies",
+            expand=False,
+            style="on #220000"
+        )
+        play_area_panels.append(engaged_enemies_panel)
+        for card in p.play_area['heroes'] + p.play_area['allies']:
+            card_panel = card.render_panel()
+            play_area_panels.append(card_panel)
+
+        if play_area_panels:
+            columns = Columns(play_area_panels, equal=True) # equal=True ensures they have equal width
+            play_area_panel = Panel(
+                columns,
+                title=f":bust_in_silhouette: {p.name}'s Play Area",
+                expand=False
+            )
+            return Styled(play_area_panel, "on #222222")
+        return Panel("[italic]No cards in play area[/italic]", title=f":bust_in_silhouette: {p.name}'s Play Area", expand=False)
+
+    def location_panel(self, game_state):
+        return Panel(
+            f"{game_state.active_location.title}\nProgress: {game_state.active_location.progress}/{game_state.active_location.quest_points}",
+            title=":round_pushpin: Active Location",
+            expand=False
+        )
+
+
+def _versions(cards):
+    """What a region showing cards depends on: which cards, in order, and their versions"""
+    return tuple((id(card), card.version) for card in cards)
+
+
+class _Region:
+    """One part of LiveRenderer's view, kept as rendered lines until what it shows changes"""
+
+    def __init__(self):
+        self.key = None
+        self.renderable = None
+        self._lines = None  # (max width, lines) as last rendered
+
+    def update(self, key, build):
+        """Show build() if key differs from the last key given; return whether it did"""
+        if key == self.key:
+            return False
+        self.key = key
+        self.renderable = build()
+        self._lines = None
+        return True
+
+    def __rich_console__(self, console, options):
+        lines = self._lines
+        if lines is None or lines[0] != options.max_width:
+            lines = self._lines = (options.max_width, console.render_lines(self.renderable, options, pad=False))
+        new_line = Segment.line()
+        for line in lines[1]:
+            yield from line
+            yield new_line
+
+
+class _LineDiffRender(LiveRender):
+    """A LiveRender that rewrites only the lines that differ from the last time it was drawn.
+
+    The view is cropped to the terminal unless vertical_overflow is
+    "visible", since the cursor cannot go back up into the scrollback.
+    """
+
+    def __init__(self, renderable, style="", vertical_overflow="crop"):
+        super().__init__(renderable, style, vertical_overflow)
+        self._drawn = None  # Lines on screen, or None to draw them all
+
+    def forget(self):
+        """Draw every line next time, e.g. after other output has moved the view"""
+        self._drawn = None
+
+    def position_cursor(self):
+        if self._drawn is None:
+            return super().position_cursor()  # Erases the view
+        height = len(self._drawn)
+        if height > 1:
+            return Control(ControlType.CARRIAGE_RETURN, (ControlType.CURSOR_UP, height - 1))
+        return Control(ControlType.CARRIAGE_RETURN)
+
+    def __rich_console__(self, console, options):
+        lines = console.render_lines(self.renderable, options, style=console.get_style(self.style), pad=False)
+        if self.vertical_overflow != "visible":
+            lines = lines[:options.size.height]
+        drawn = self._drawn or []
+        lines += [[] for _ in range(len(drawn) - len(lines))]  # Blank what the view no longer covers
+        self._drawn = lines
+        self._shape = Segment.get_shape(lines)
+        erase = Control((ControlType.ERASE_IN_LINE, 2)).segment
+        new_line = Segment.line()
+        for index, line in enumerate(lines):
+            if index >= len(drawn) or line != drawn[index]:
+                yield erase
+                yield from line
+            if index < len(lines) - 1:
+                yield new_line
+
+
+class _DiffLive(Live):
+    """A Live display drawn by a _LineDiffRender"""
+
+    def __init__(self, get_renderable, console):
+        super().__init__(console=console, auto_refresh=False, get_renderable=get_renderable)
+        self._live_render = _LineDiffRender(self.get_renderable())
+
+    def process_renderables(self, renderables):
+        if any(not isinstance(renderable, Control) for renderable in renderables):
+            self._live_render.forget()  # Something is printed above the view, which moves it down
+        return super().process_renderables(renderables)
+
+
+class _MessageLog(io.TextIOBase):
+    """The file LiveRenderer's messages are printed to: keeps their last lines for the view"""
+
+    def __init__(self, size):
+        self.lines = deque(maxlen=size)
+        self.count = 0  # Lines written so far
+        self._partial = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        *lines, self._partial = (self._partial + text).split("\n")
+        self.lines.extend(Text.from_ansi(line) for line in lines)
+        self.count += len(lines)
+        return len(text)
+
+    def renderable(self):
+        """The last lines, padded to the log's full height so the view below does not move"""
+        return Group(*self.lines, *[""] * (self.lines.maxlen - len(self.lines)))
+
+
+class LiveRenderer(RichRenderer):
+    """RichRenderer that keeps the board, the last hand shown and the latest
+    messages in place in a Rich Live display, for slow terminals.
+
+    The view is split into regions (the message log, the quest, the staging
+    area, each play area, the active location and the hand), each keyed on
+    what it shows: for cards, their versions. Only regions whose key changed
+    are built again; the others reuse their rendered lines, and only the
+    terminal lines that differ are rewritten. The view is redrawn when the
+    board or a hand is shown, so messages appear a phase at a time. On a
+    console that is not a terminal, each region is printed when it changes
+    instead. The display stops when the game ends, or on close().
+    """
+
+    def __init__(self, console=None, log_lines=8):
+        screen = console if console is not None else Console()
+        super().__init__(screen)
+        self.screen = screen
+        self.regions = {"log": _Region()}  # Region name -> _Region, in the order they are shown
+        self.live = None
+        self.log = None
+        if screen.is_interactive:
+            self.log = _MessageLog(log_lines)
+            self.console = Console(file=self.log, width=screen.width, color_system=screen.color_system,
+                                   force_terminal=True, log_path=False)
+
+    def _update(self, name, key, build):
+        region = self.regions.get(name)
+        if region is None:
+            region = self.regions[name] = _Region()
+        if not region.update(key, build):
+            return False
+        if self.log is None and region.renderable is not None:
+            self.screen.print(region)
+        return True
+
+    def _refresh(self):
+        if self.log is None:
+            return
+        if self.live is None:
+            self.live = _DiffLive(self._view, self.screen)
+            self.live.start(refresh=True)
+        else:
+            self.live.refresh()
+
+    def _view(self):
+        self._update("log", self.log.count, self.log.renderable)
+        return Group(*(region for region in self.regions.values() if region.renderable is not None))
+
+    def board(self, game_state):
+        quest = game_state.active_quest
+        changed = self._update("quest", quest.version, lambda: self.quest_panel(game_state))
+        changed |= self._update("staging", _versions(game_state.staging_area),
+                                lambda: self.staging_area_panel(game_state))
+        for seat, p in enumerate(game_state.players):  # By seat: players may share a name
+            key = (_versions(p.engaged_enemies), _versions(p.play_area['heroes']), _versions(p.play_area['allies']))
+            changed |= self._update(("play area", seat), key, lambda: self.play_area_panel(p))
+        location = game_state.active_location
+        changed |= self._update("location", (id(location), location.version) if location else None,
+                                lambda: self.location_panel(game_state) if location else None)
+        if changed:
+            self._refresh()
+
+    def hand(self, player):
+        if self._update("hand", (id(player), player.threat, _versions(player.hand)), lambda: self.hand_panel(player)):
+            self._refresh()
+
+    def game_won(self, game_state):
+        super().game_won(game_state)
+        self.close()
+
+    def game_lost(self, player, reason):
+        super().game_lost(player, reason)
+        self.close()
+
+    def game_abandoned(self, max_rounds):
+        super().game_abandoned(max_rounds)
+        self.close()
+
+    def close(self):
+        """Stop the live display, leaving the last view on screen; later messages are printed below it"""
+        if self.live is not None:
+            self.live.stop()
+            self.live = None
+        self.console = self.screen  # Anything shown after the game scrolls by as usual
@@ -0,0 +1,359 @@
+import math
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from core import *
+from controllers import HeadlessController, RandomController, PolicyController, greedy_policy
+from actions import legal_actions, decode_action
+
+# Decisions the search plays out; everything else is left to the default policy
+SEARCHED_DECISIONS = frozenset(("card_to_play", "defender", "attackers", "enemy_to_attack", "location_to_travel"))
+MAX_SUBSET_OPTIONS = 4  # Wider multi-select decisions are only searched over choosing none, all or one
+
+_CANDIDATES = {}  # (number of options, multi_select) -> searched action ids
+
+
+def candidate_actions(n_options, multi_select=False):
+    """The legal action ids the search tries for a decision.
+
+    Every legal action, except that a multi-select decision of more than
+    MAX_SUBSET_OPTIONS options would give a node 2**n children, so only
+    choosing none, all or one of them is searched.
+    """
+    if not multi_select or n_options <= MAX_SUBSET_OPTIONS:
+        return legal_actions(n_options, multi_select)
+    key = (n_options, multi_select)
+    actions = _CANDIDATES.get(key)
+    if actions is None:
+        actions = _CANDIDATES[key] = (0, 2 ** n_options - 1) + tuple(1 << i for i in range(n_options))
+    return actions
+
+
+def action_space(options, multi_select=False):
+    """The candidate answers to a decision, each a list of option indices, in candidate_actions() order"""
+    return [decode_action(action, multi_select) for action in candidate_actions(len(options), multi_select)]
+
+
+def determinize(game_state, seed):
+    """Deal a copied game's hidden information afresh: reseed its RNG and
+    shuffle every player's deck and the encounter deck with it, so that play
+    on from here cannot depend on the real draw order or random choices"""
+    rng = game_state.rng
+    rng.seed(seed)
+    for player in game_state.players:
+        player.deck.shuffle(rng)
+    game_state.encounter_deck.shuffle(rng)
+
+
+def _indices(choice):
+    return list(choice) if isinstance(choice, (list, tuple)) else [choice]
+
+
+class SearchNode:
+    """Visit counts and total reward of each action at one searched decision"""
+    __slots__ = ('decision', 'visits', 'counts', 'values', 'children')
+
+    def __init__(self, decision, n_actions):
+        self.decision = decision
+        self.visits = 0
+        self.counts = [0] * n_actions
+        self.values = [0.0] * n_actions
+        self.children = {}  # Action index -> node of the next searched decision
+
+    def matches(self, decision, n_actions):
+        return self.decision == decision and len(self.counts) == n_actions
+
+    def select(self, exploration, rng):
+        """Pick an untried action, otherwise the one with the highest UCB1 score"""
+        untried = [a for a, count in enumerate(self.counts) if not count]
+        if untried:
+            return rng.choice(untried)
+        log_visits = math.log(self.visits)
+        counts, values = self.counts, self.values
+        return max(range(len(counts)),
+                   key=lambda a: values[a] / counts[a] + exploration * math.sqrt(log_visits / counts[a]))
+
+    def merge(self, counts, values):
+        """Add in the root statistics of a search run elsewhere"""
+        for action, (count, value) in enumerate(zip(counts, values)):
+            self.counts[action] += count
+            self.values[action] += value
+        self.visits += sum(counts)
+
+    def update(self, action, reward):
+        self.visits += 1
+        self.counts[action] += 1
+        self.values[action] += reward
+
+    def best_action(self):
+        """The most visited action, ties going to the better mean reward"""
+        return max(range(len(self.counts)),
+                   key=lambda a: (self.counts[a], self.values[a] / self.counts[a] if self.counts[a] else 0.0))
+
+
+class TranspositionTable:
+    """Search nodes by (GameState.state_hash(), decision, number of actions),
+    so rollouts that reach one position by different paths share its
+    statistics. Holds at most capacity nodes, evicting the least recently
+    used; one table can be shared by several controllers."""
+
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.nodes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, key):
+        node = self.nodes.get(key)
+        if node is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.nodes.move_to_end(key)
+        return node
+
+    def put(self, key, node):
+        nodes = self.nodes
+        nodes[key] = node
+        nodes.move_to_end(key)
+        if len(nodes) > self.capacity:
+            nodes.popitem(last=False)
+
+    def node(self, game_state, decision, n_actions):
+        """The node for a decision in game_state, added if the table has none"""
+        key = (game_state.state_hash(), decision, n_actions)
+        node = self.get(key)
+        if node is None:
+            node = SearchNode(decision, n_actions)
+            self.put(key, node)
+        return node
+
+
+class _RolloutController(HeadlessController):
+    """Drives one rollout: replays the decisions made since the snapshot, which
+    brings back what the real game has revealed so far, and determinizes the
+    copy at the decision being searched. Then it walks down the tree choosing
+    by UCB1, adds one node, and plays the game out with the rollout policy."""
+
+    def __init__(self, search, root, seed):
+        super().__init__()
+        self.search = search
+        self.prefix = search.history
+        self.position = 0
+        self.node = root  # Tree node for the next searched decision
+        self.parent = None  # (node, action) that led to self.node
+        self.in_tree = True
+        self.expanded = False
+        self.path = []
+        self.rng = random.Random(seed)
+        self.determinized = False
+        if search.rollout_policy is None:
+            self.fallback = RandomController(seed)
+        else:
+            self.fallback = PolicyController(search.rollout_policy)
+
+    def decide(self, decision, options, multi_select=False):
+        if self.position < len(self.prefix):
+            choice = self.prefix[self.position]
+            self.position += 1
+            return choice
+        if not self.determinized:
+            self.determinized = True
+            determinize(self.game.game_state, self.rng.randrange(2**32))
+        search = self.search
+        if decision in search.searched:
+            actions = candidate_actions(len(options), multi_select)
+            if len(actions) < 2:
+                return decode_action(actions[0], multi_select) if actions else []
+            node = self._tree_node(decision, len(actions))
+            if node is not None:
+                action = node.select(search.exploration, self.rng)
+                self.path.append((node, action))
+                self.parent = (node, action)
+                self.node = node.children.get(action)
+                return decode_action(actions[action], multi_select)
+        elif self.in_tree:
+            # Between tree nodes the game must unfold as it will for real
+            return search.default_choice(self.game.game_state, decision, options, multi_select)
+        return self.fallback.decide(decision, options, multi_select)
+
+    def _tree_node(self, decision, n_actions):
+        if not self.in_tree:
+            return None
+        node = self.node
+        if node is None:
+            if self.expanded:
+                self.in_tree = False
+                return None
+            parent, action = self.parent
+            node = parent.children[action] = self.search.new_node(self.game.game_state, decision, n_actions)
+            self.expanded = True
+        elif not node.matches(decision, n_actions):
+            self.in_tree = False
+            return None
+        return node
+
+
+class MCTSController(HeadlessController):
+    """Chooses by Monte Carlo Tree Search over full rollouts of the game.
+
+    At the start of each phase the controller snapshots the game. For a
+    searched decision it plays rollouts from that snapshot, replaying the
+    decisions already made this phase, until iterations rollouts have been
+    played or time_limit seconds have passed, and picks the most visited
+    action. The subtree below the chosen action is kept for the next decision.
+    A rollout scores 1 for a victory and 0 otherwise. Rollouts do not know the
+    real deck orders or the RNG: each rollout's copy shuffles the decks and
+    reseeds its RNG on reaching the searched decision (determinize()).
+
+    Decisions outside `searched`, and every decision of a rollout between
+    tree nodes, use default_policy; rollouts past the tree use rollout_policy
+    (uniformly random if None). Policies take (game_state, decision, options,
+    multi_select) like PolicyController's.
+
+    With workers > 1 the search is root-parallel: each worker process gets
+    the pickled snapshot and its own seed, searches the decision on its own
+    (splitting an iteration budget evenly, or each using the whole time
+    limit), and the root statistics are summed before choosing. Policies must
+    then be picklable, i.e. module-level functions. Pass an executor to share
+    a process pool between controllers, otherwise one is started on first use;
+    close() shuts it down.
+
+    Pass a TranspositionTable as transpositions to share nodes between
+    positions reached by different orders of play, and between controllers.
+    """
+
+    def __init__(self, iterations=None, time_limit=None, exploration=1.4, seed=None,
+                 searched=SEARCHED_DECISIONS, default_policy=greedy_policy, rollout_policy=None,
+                 max_rounds=100, workers=1, executor=None, transpositions=None, game=None):
+        super().__init__(game)
+        self.iterations = iterations if iterations is not None or time_limit is not None else 100
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.searched = frozenset(searched)
+        self.default_policy = default_policy
+        self.rollout_policy = rollout_policy
+        self.max_rounds = max_rounds
+        self.workers = workers
+        self.executor = executor
+        self.owns_executor = False
+        self.transpositions = transpositions
+        self.rng = random.Random(seed)
+        self.snapshot = None  # Copy of the game, and its RNG, at the start of the current phase
+        self.history = []  # Decisions made since the snapshot
+        self.root = None  # Subtree for the next searched decision
+        self.tree_game = None
+        self.rollouts = 0
+        self.search_time = 0.0
+
+    @property
+    def rollouts_per_second(self):
+        return self.rollouts / self.search_time if self.search_time else 0.0
+
+    def begin_phase(self, phase):
+        self.snapshot = self.game.clone(renderer=NullRenderer())
+        self.history = []
+        if self.tree_game is not self.game:
+            self.root = None
+            self.tree_game = self.game
+
+    def default_choice(self, game_state, decision, options, multi_select):
+        return _indices(self.default_policy(game_state, decision, options, multi_select))
+
+    def decide(self, decision, options, multi_select=False):
+        if decision not in self.searched:
+            choice = self.default_choice(self.game.game_state, decision, options, multi_select)
+        else:
+            actions = candidate_actions(len(options), multi_select)
+            if len(actions) > 1 and self.snapshot is not None:
+                choice = decode_action(actions[self.search(decision, actions)], multi_select)
+            else:
+                choice = decode_action(actions[0], multi_select) if actions else []
+        self.history.append(choice)
+        return choice
+
+    def search(self, decision, actions):
+        """Run rollouts for a decision and return the index of the chosen action"""
+        root = self.root
+        if root is None or not root.matches(decision, len(actions)):
+            root = self.new_node(self.game.game_state, decision, len(actions))
+        start = time.perf_counter()
+        if self.workers > 1:
+            rollouts = self._search_parallel(root)
+        else:
+            rollouts = self._search_local(root, self.iterations, self.time_limit)
+        self.rollouts += rollouts
+        self.search_time += time.perf_counter() - start
+        action = root.best_action()
+        self.root = root.children.get(action)
+        return action
+
+    def new_node(self, game_state, decision, n_actions):
+        if self.transpositions is None:
+            return SearchNode(decision, n_actions)
+        return self.transpositions.node(game_state, decision, n_actions)
+
+    def close(self):
+        if self.owns_executor:
+            self.executor.shutdown()
+            self.executor = None
+            self.owns_executor = False
+
+    def _search_local(self, root, iterations, time_limit):
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        rollouts = 0
+        while True:
+            self._rollout(root)
+            rollouts += 1
+            if iterations is not None and rollouts >= iterations:
+                return rollouts
+            if deadline is not None and time.perf_counter() >= deadline:
+                return rollouts
+
+    def _search_parallel(self, root):
+        # Workers only send back root statistics, so there is no subtree to keep
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+            self.owns_executor = True
+        settings = {
+            'exploration': self.exploration,
+            'searched': self.searched,
+            'default_policy': self.default_policy,
+            'rollout_policy': self.rollout_policy,
+            'max_rounds': self.max_rounds,
+        }
+        iterations = -(-self.iterations // self.workers) if self.iterations is not None else None
+        snapshot = pickle.dumps(self.snapshot)
+        futures = [
+            self.executor.submit(_root_search, settings, self.rng.randrange(2**32), snapshot, self.history,
+                                 root.decision, len(root.counts), iterations, self.time_limit)
+            for _ in range(self.workers)
+        ]
+        rollouts = 0
+        for future in futures:
+            counts, values = future.result()
+            root.merge(counts, values)
+            rollouts += sum(counts)
+        return rollouts
+
+    def _rollout(self, root):
+        controller = _RolloutController(self, root, self.rng.randrange(2**32))
+        game = self.snapshot.clone(controller)
+        controller.fallback.game = game
+        reward = 1.0 if game.resume(self.max_rounds) == "victory" else 0.0
+        for node, action in controller.path:
+            node.update(action, reward)
+
+
+def _root_search(settings, seed, snapshot, history, decision, n_actions, iterations, time_limit):
+    """Worker entry point for root-parallel search: returns the root's counts and values"""
+    search = MCTSController(iterations, time_limit, seed=seed, **settings)
+    search.snapshot = pickle.loads(snapshot)
+    search.history = history
+    root = SearchNode(decision, n_actions)
+    search._search_local(root, iterations, time_limit)
+    return root.counts, root.values
@@ -0,0 +1,135 @@
+import argparse
+import time
+from rich.table import Table
+from core import *
+from quests import *
+from gavs_deck import *
+from controllers import RandomController, PolicyController, greedy_policy
+from search import MCTSController
+from records import GameRecord, write_records
+
+
+class Deck:
+    """A deck list: the hero and player card classes a player starts with"""
+    def __init__(self, name, heroes, cards):
+        self.name = name
+        self.heroes = heroes
+        self.cards = cards
+
+    def build_player(self):
+        player = Player(self.name)
+        player.play_area['heroes'] = [hero() for hero in self.heroes]
+        player.calculate_threat()
+        player.deck = [card() for card in self.cards]  # Shuffled by Game
+        return player
+
+
+GAVS_DECK = Deck(
+    "Gavin",
+    [Boromir, Galadriel, Aragorn],
+    [Faramir] * 3 + [Gandalf] * 3 + [StewardOfGondor] * 3 + [UnexpectedCourage] * 3
+)
+
+CONTROLLERS = {
+    "random": RandomController,
+    "greedy": lambda seed: PolicyController(greedy_policy),
+    "mcts": lambda seed: MCTSController(iterations=50, seed=seed),
+}
+
+
+class GameResult:
+    def __init__(self, seed, outcome, rounds, threat, record=None):
+        self.seed = seed
+        self.outcome = outcome  # "victory", "defeat" or "timeout"
+        self.rounds = rounds
+        self.threat = threat  # Final threat of each player, in seat order
+        self.record = record  # GameRecord, if the game was recorded
+
+    @property
+    def won(self):
+        return self.outcome == "victory"
+
+
+class SimulationReport:
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def win_rate(self):
+        return sum(r.won for r in self.results) / len(self.results) if self.results else 0.0
+
+    @property
+    def mean_rounds(self):
+        return sum(r.rounds for r in self.results) / len(self.results) if self.results else 0.0
+
+    @property
+    def games_per_minute(self):
+        return len(self.results) * 60 / self.elapsed if self.elapsed else float("inf")
+
+
+def play_game(decks, quest, seed, controller_factory=RandomController, max_rounds=100, record=False):
+    """Play one full headless game and return its GameResult.
+
+    With record=True the result carries a GameRecord that records.replay() can
+    play back.
+    """
+    players = [deck.build_player() for deck in decks]
+    controller = controller_factory(seed)
+    if record:
+        controller.record = GameRecord(seed, max_rounds)
+    game = Game(players, quest(), controller, NullRenderer(), seed)
+    outcome = game.run(max_rounds)
+    return GameResult(seed, outcome, game.game_state.round_number, [p.threat for p in players],
+                      controller.record)
+
+
+def simulate(decks, quest, n_games, seed=None, controller_factory=RandomController, max_rounds=100,
+             record=False):
+    """Play n_games full games without rendering and report the results.
+
+    decks is a list of Deck, one per player; quest is a QuestCard class. Game i
+    is seeded with seed + i so any single game can be replayed with play_game().
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    start = time.perf_counter()
+    results = [
+        play_game(decks, quest, seed + i, controller_factory, max_rounds, record)
+        for i in range(n_games)
+    ]
+    return SimulationReport(results, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless games of Fleeing from Mirkwood with Gavin's deck")
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="random")
+    parser.add_argument("--max-rounds", type=int, default=100)
+    parser.add_argument("--per-game", action="store_true", help="List the result of every game")
+    parser.add_argument("--record", metavar="PATH", help="Save every game to PATH for records.py to replay")
+    args = parser.parse_args(argv)
+
+    report = simulate(
+        [GAVS_DECK] * args.players, FleeingFromMirkwood, args.games, args.seed,
+        CONTROLLERS[args.controller], args.max_rounds, args.record is not None
+    )
+    if args.record:
+        write_records(args.record, [r.record for r in report.results])
+
+    if args.per_game:
+        table = Table(title="Games")
+        for column in ("Seed", "Outcome", "Rounds", "Threat"):
+            table.add_column(column)
+        for r in report.results:
+            table.add_row(str(r.seed), r.outcome, str(r.rounds), ", ".join(map(str, r.threat)))
+        console.print(table)
+    console.print(f"Games: {len(report.results)}  Win rate: [green]{report.win_rate:.1%}[/green]  "
+                  f"Mean rounds: {report.mean_rounds:.2f}  ({report.games_per_minute:.0f} games/minute)")
+    return report
+
+
+if __name__ == "__main__":
+    main()
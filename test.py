@@ -1,7 +1,41 @@
 import unittest
-from core import Player, Ally, Game, GameState, GameController
+from core import Player, Ally, Game, GameState, GameController, CardIndex, Zone
+from events import *
+from render import NullRenderer, LiveRenderer
+from rich.console import Console
+import io
 from gavs_deck import *
-from unittest.mock import Mock
+from quests import FleeingFromMirkwood, DolGuldurOrcs
+from controllers import RandomController, ScriptedController, PolicyController, greedy_policy, next_decision
+from simulate import simulate, play_game, GAVS_DECK
+from search import MCTSController, SearchNode, TranspositionTable, action_space
+from records import GameRecord, replay, write_records, read_records
+from actions import legal_actions, decode_action, encode_choice, pending_actions
+from network import GameServer, GameClient, BoardEncoder, RemoteBoard
+import math
+import os
+import tempfile
+from unittest.mock import Mock, patch
+import random
+import pickle
+import subprocess
+import sys
+import threading
+import asyncio
+try:
+    import numpy
+    from vectorized import simulate_batch, GreedyPolicy
+except ImportError:  # numpy is only needed by the vectorized engine
+    numpy = None
+try:
+    import greenlet
+    from host import GameHost, RemoteSeat, agent_from, auto_pass
+except ImportError:  # Hosted tables and the environment run their games as greenlets
+    greenlet = None
+try:
+    from env import GameEnv, VectorGameEnv
+except ImportError:  # The environment also needs numpy
+    pass
 
 class TestBoromir(unittest.TestCase):
     def setUp(self):
@@ -145,5 +179,1194 @@ class TestGaladriel(unittest.TestCase):
         self.assertTrue(self.galadriel.used_this_round)
 
 
+class TestCardDefinitions(unittest.TestCase):
+    def test_copies_share_one_definition(self):
+        """Test that copies of a card share static data but not state."""
+        first, second = Faramir(), Faramir()
+        self.assertIs(first.definition, second.definition)
+        self.assertFalse(hasattr(first, '__dict__'))
+        first.hit_points -= 2
+        self.assertEqual(second.hit_points, 3)
+        with self.assertRaises(AttributeError):
+            first.definition.cost = 0
+
+    def test_keywords_and_attachments_are_copy_on_write(self):
+        """Test that per-copy keyword and attachment changes do not leak to other copies."""
+        first, second = Boromir(), Boromir()
+        first.add_keyword("Steward")
+        first.remove_keyword("Noble")
+        self.assertEqual(first.keywords, {"Gondor", "Warrior", "Steward"})
+        self.assertEqual(second.keywords, {"Gondor", "Warrior", "Noble"})
+        self.assertEqual(second.attachments, ())
+        first.add_attachment(StewardOfGondor())
+        self.assertEqual(len(first.attachments), 1)
+        self.assertEqual(len(second.attachments), 0)
+
+class TestEventSystem(unittest.TestCase):
+    def test_event_names_intern_to_stable_ids(self):
+        """Test that names and their interned ids address the same hooks."""
+        self.assertEqual(event_id("BeforeDrawCard"), BEFORE_DRAW_CARD)
+        self.assertEqual(event_name(BEFORE_DRAW_CARD), "BeforeDrawCard")
+        events = EventSystem()
+        self.assertFalse(events.has_listeners("BeforeDrawCard"))
+        received = []
+        events.register_hook("BeforeDrawCard", received.append)
+        self.assertTrue(events.has_listeners(BEFORE_DRAW_CARD))
+        events.trigger_event(BEFORE_DRAW_CARD, PlayerEvent("p1"))
+        self.assertEqual(received[0].player, "p1")
+
+    def test_payload_supports_item_access(self):
+        """Test that slot payloads can be read and written like the old dict contexts."""
+        context = QuestExhaustionEvent("Aragorn", "p1", None, False)
+        context['prevent_exhaustion'] = True
+        self.assertTrue(context.prevent_exhaustion)
+        self.assertEqual(context['character'], "Aragorn")
+        self.assertNotIn('questing_characters', context)
+        self.assertIsNone(DefenderEvent("p1", "orc").get('defender'))
+        with self.assertRaises(KeyError):
+            context['missing']
+
+    def test_token_events_carry_the_token_type(self):
+        """Test that adding and removing tokens fires the interned token events with the token type."""
+        player = Player("Test")
+        game = Game([player], renderer=NullRenderer())
+        ally = Ally("Test Ally", 1, "Spirit", 1, 1, 1, 2)
+        received = []
+        for event in (BEFORE_ADD_TOKEN, AFTER_ADD_TOKEN, AFTER_REMOVE_TOKEN):
+            game.game_state.event_system.register_hook(event, received.append)
+        ally.add_token(game.game_state, "damage", 2)
+        ally.remove_token(game.game_state, "damage", 3)
+        self.assertEqual([(c.token_type, c.amount) for c in received], [("damage", 2)] * 2 + [("damage", 3)])
+        self.assertEqual(ally.get_token_count("damage"), 0)
+
+class TestHookLifetime(unittest.TestCase):
+    def setUp(self):
+        self.player = Player("Test")
+        self.game = Game([self.player], renderer=NullRenderer())
+        self.game_state = self.game.game_state
+
+    def test_unregistering_last_hook_restores_fast_path(self):
+        """Test that a handle removes its hook and the event stops having listeners."""
+        events = EventSystem()
+        handle = events.register_hook("BeforeDrawCard", lambda context: None)
+        self.assertTrue(handle.active)
+        handle.unregister()
+        self.assertFalse(handle.active)
+        self.assertNotIn(BEFORE_DRAW_CARD, events.hooks)
+
+    def test_replayed_gandalf_does_not_accumulate_hooks(self):
+        """Test that Gandalf's hooks are dropped when he is discarded at the end of the round."""
+        baseline = self.game_state.event_system.hook_count()
+        gandalf = Gandalf()
+        for _ in range(3):
+            gandalf.parent = self.player
+            self.player.play_area['allies'].append(gandalf)
+            gandalf.play(self.game_state, self.game.controller)
+            self.assertEqual(self.game_state.event_system.hook_count(), baseline + 2)
+            gandalf.discard_gandalf(self.game_state)
+            self.assertEqual(self.game_state.event_system.hook_count(), baseline)
+        self.assertEqual(self.player.discard_pile.count(gandalf), 1)  # Replaying moves the same card back
+        self.assertNotIn(gandalf, self.player.play_area['allies'])
+
+    def test_weak_hook_does_not_keep_card_alive(self):
+        """Test that a weak hook goes away with the card it is bound to."""
+        events = EventSystem(weak=True)
+        boromir = Boromir()
+        boromir.play(Mock(event_system=events), None)
+        self.assertTrue(events.has_listeners("CalculateAttack"))
+        del boromir
+        events.trigger_event(CALCULATE_ATTACK, {})
+        self.assertFalse(events.has_listeners("CalculateAttack"))
+        self.assertEqual(len(events.owned), 0)
+
+class TestHeadlessSimulation(unittest.TestCase):
+    def test_simulate_plays_full_games(self):
+        """Test that every simulated game runs to a recorded outcome."""
+        report = simulate([GAVS_DECK], FleeingFromMirkwood, 5, seed=1)
+        self.assertEqual(len(report.results), 5)
+        for result in report.results:
+            self.assertIn(result.outcome, ("victory", "defeat", "timeout"))
+            self.assertEqual(len(result.threat), 1)
+
+    def test_simulate_is_reproducible(self):
+        """Test that the same seed produces the same games."""
+        first = simulate([GAVS_DECK, GAVS_DECK], FleeingFromMirkwood, 3, seed=42)
+        second = simulate([GAVS_DECK, GAVS_DECK], FleeingFromMirkwood, 3, seed=42)
+        self.assertEqual(
+            [(r.outcome, r.rounds, r.threat) for r in first.results],
+            [(r.outcome, r.rounds, r.threat) for r in second.results]
+        )
+
+    def test_headless_game_builds_no_rich_objects(self):
+        """Test that a game with the null renderer never constructs Rich renderables."""
+        forbidden = AssertionError("Rich object built in a headless game")
+        with patch("render.Panel", side_effect=forbidden), \
+             patch("cards.Panel", side_effect=forbidden), \
+             patch("cards.Text", side_effect=forbidden), \
+             patch("cards.Group", side_effect=forbidden):
+            result = play_game([GAVS_DECK, GAVS_DECK], FleeingFromMirkwood, seed=3)
+        self.assertIsNotNone(result.outcome)
+
+    def test_scripted_controller_falls_back_when_exhausted(self):
+        """Test that a scripted controller replays its script, then defers to the fallback."""
+        controller = ScriptedController([1, [0, 2]], fallback=RandomController(seed=0))
+        self.assertEqual(controller.decide("choice", ["a", "b"]), [1])
+        self.assertEqual(controller.decide("attackers", ["a", "b", "c"], multi_select=True), [0, 2])
+        self.assertEqual(len(controller.decide("choice", ["a"])), 1)
+        with self.assertRaises(IndexError):
+            ScriptedController([]).decide("choice", ["a"])
+
+class TestSeededGames(unittest.TestCase):
+    def test_seed_replays_game_regardless_of_global_random(self):
+        """Test that a game depends only on its own seed, not on the random module."""
+        random.seed(1)
+        first = play_game([GAVS_DECK, GAVS_DECK], FleeingFromMirkwood, seed=21)
+        random.seed(2)
+        random.random()
+        second = play_game([GAVS_DECK, GAVS_DECK], FleeingFromMirkwood, seed=21)
+        self.assertEqual((first.outcome, first.rounds, first.threat), (second.outcome, second.rounds, second.threat))
+
+    def test_seed_decides_deck_order(self):
+        """Test that the game seed shuffles the decks and is kept on the game."""
+        orders = []
+        for seed in (3, 3, 4):
+            game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), RandomController(), NullRenderer(), seed)
+            self.assertEqual(game.seed, seed)
+            orders.append([card.title for card in game.players[0].deck])
+        self.assertEqual(orders[0], orders[1])
+        self.assertNotEqual(orders[0], orders[2])
+
+class TestGameRecords(unittest.TestCase):
+    def test_record_round_trips_through_bytes(self):
+        """Test that seeds, limits and both kinds of decision survive encoding."""
+        record = GameRecord(2**32 - 1, 100)
+        record.add([3])
+        record.add([])
+        record.add([0, 2, 9], multi_select=True)
+        record.add([200])
+        data = record.to_bytes() + GameRecord(5).to_bytes()
+        decoded, pos = GameRecord.from_bytes(data)
+        self.assertEqual((decoded.seed, decoded.max_rounds, decoded.decisions), (2**32 - 1, 100, record.decisions))
+        self.assertEqual(len(decoded.decisions), 6)
+        second, end = GameRecord.from_bytes(data, pos)
+        self.assertEqual((second.seed, second.max_rounds, end), (5, None, len(data)))
+
+    def test_replay_reproduces_recorded_games(self):
+        """Test that replaying saved records gives the same games."""
+        report = simulate([GAVS_DECK, GAVS_DECK], FleeingFromMirkwood, 5, seed=30, record=True)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            write_records(path, [r.record for r in report.results])
+            records = read_records(path)
+        finally:
+            os.remove(path)
+        for record, result in zip(records, report.results):
+            game = replay(record, [GAVS_DECK, GAVS_DECK], FleeingFromMirkwood)
+            self.assertEqual((game.result, game.game_state.round_number, [p.threat for p in game.players]),
+                             (result.outcome, result.rounds, result.threat))
+
+class TestCardIndex(unittest.TestCase):
+    def test_exact_prefix_and_fuzzy_lookup(self):
+        """Test that titles are found case-insensitively, then by prefix, then by similarity."""
+        faramir, steward, gandalf = Faramir(), StewardOfGondor(), Gandalf()
+        index = CardIndex([faramir, steward, gandalf, Faramir()])
+        self.assertIs(index.find("FARAMIR"), faramir)
+        self.assertEqual(len(index.find_all("faramir")), 2)
+        self.assertIs(index.find("stew"), steward)
+        self.assertIs(index.find("Gandolf"), gandalf)
+        self.assertIsNone(index.find("Balrog"))
+        index.remove(gandalf)
+        self.assertEqual(index.with_prefix("g"), [])
+
+    def test_find_card_sees_every_zone(self):
+        """Test that find_card finds cards in decks, play areas and the encounter deck."""
+        game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), RandomController(), NullRenderer(), 1)
+        player = game.players[0]
+        self.assertIs(game.controller.find_card("boromir"), player.play_area['heroes'][0])
+        self.assertIn(game.controller.find_card("Dol Guldur Orcs"), game.game_state.encounter_deck)
+        self.assertIn(game.controller.find_card("unexpected courage"), player.deck)
+
+    def test_index_sees_cards_added_after_the_first_lookup(self):
+        """Test that cards entering the game after the index was built are found."""
+        game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), RandomController(), NullRenderer(), 1)
+        player = game.players[0]
+        self.assertIsNone(game.controller.find_card("Treebeard"))
+        ally = Ally("Treebeard", 4, "Lore", willpower=2, attack=3, defense=3, hit_points=5)
+        player.play_area['allies'].append(ally)
+        self.assertIs(game.controller.find_card("treebeard"), ally)
+        courage = UnexpectedCourage()
+        player.play_area['heroes'][0].add_attachment(courage)
+        self.assertIn(courage, game.game_state.card_index.find_all("Unexpected Courage"))
+        game.game_state.move_card(ally, player.discard_pile)
+        self.assertEqual(game.game_state.card_index.find_all("Treebeard"), [ally])
+
+class TestZones(unittest.TestCase):
+    def setUp(self):
+        self.player = Player("Test")
+        self.game_state = GameState([self.player], EventSystem())
+
+    def test_move_card_updates_both_zones_and_fires_once(self):
+        """Test that moving a card takes it out of its zone, records the new one and fires one event."""
+        moves = []
+        self.game_state.event_system.register_hook(CARD_MOVED, moves.append)
+        faramir = Faramir()
+        self.player.hand.append(faramir)
+        self.assertIs(faramir.owner, self.player)
+        self.game_state.move_card(faramir, self.player.play_area['allies'])
+        self.assertNotIn(faramir, self.player.hand)
+        self.assertIn(faramir, self.player.play_area['allies'])
+        self.assertIs(faramir.zone, self.player.play_area['allies'])
+        self.assertEqual([(m.card, m.from_zone.name, m.to_zone.name) for m in moves], [(faramir, "hand", "allies")])
+
+    def test_card_is_never_in_two_zones(self):
+        """Test that adding a card to a zone, or refilling a zone by assignment, keeps zones consistent."""
+        gandalf = Gandalf()
+        self.player.deck = [gandalf, Faramir()]
+        self.assertIsInstance(self.player.deck, Zone)
+        self.player.discard_pile.append(gandalf)
+        self.assertEqual(len(self.player.deck), 1)
+        self.assertNotIn(gandalf, self.player.deck)
+        self.player.play_area['allies'] = [gandalf]
+        self.assertEqual(list(self.player.discard_pile), [])
+        self.assertIs(gandalf.zone.owner, self.player)
+
+    def test_attachment_targets_follow_zones(self):
+        """Test that attachments find targets by zone and then live in the host's attachments."""
+        boromir, orc, steward = Boromir(), DolGuldurOrcs(), StewardOfGondor()
+        self.player.play_area['heroes'].append(boromir)
+        self.player.hand.append(steward)
+        self.assertEqual(steward.get_valid_targets(self.game_state), [boromir])
+        self.game_state.staging_area.append(orc)
+        self.assertTrue(steward.can_attach_to(orc, self.game_state))
+        steward.attach_to(boromir, self.game_state)
+        self.assertNotIn(steward, self.player.hand)
+        self.assertEqual(list(boromir.attachments), [steward])
+        self.assertIs(steward.owner, self.player)
+
+    def test_attachments_are_discarded_with_their_host(self):
+        """Test that a character leaving play sends its attachments to their player's discard pile."""
+        moves = []
+        self.game_state.event_system.register_hook(CARD_MOVED, moves.append)
+        boromir, steward = Boromir(), StewardOfGondor()
+        self.player.play_area['heroes'].append(boromir)
+        self.player.hand.append(steward)
+        steward.attach_to(boromir, self.game_state)
+        self.game_state.move_card(boromir, self.player.discard_pile)
+        self.assertEqual(list(self.player.discard_pile), [boromir, steward])
+        self.assertEqual(list(boromir.attachments), [])
+        self.assertIsNone(steward.attached_to)
+        self.assertEqual([(m.card, m.to_zone.name) for m in moves][-2:],
+                         [(boromir, "discard_pile"), (steward, "discard_pile")])
+
+    def test_clone_keeps_zones_consistent(self):
+        """Test that cloned cards point at the cloned zones."""
+        self.player.hand.append(Faramir())
+        copy = self.game_state.clone()
+        card = copy.players[0].hand[0]
+        self.assertIs(card.zone, copy.players[0].hand)
+        self.assertIs(card.owner, copy.players[0])
+        copy.players[0].play_area['allies'] = [card]
+        self.assertEqual(len(self.game_state.players[0].hand), 1)
+
+    def test_defeated_heroes_are_not_reshuffled(self):
+        """Test that a defeated hero stays in the discard pile when it is shuffled into the deck."""
+        boromir, faramir = Boromir(), Faramir()
+        self.player.play_area['heroes'].append(boromir)
+        self.game_state.move_card(boromir, self.player.discard_pile)
+        self.player.discard_pile.append(faramir)
+        self.player.draw_card(self.game_state)
+        self.assertEqual(list(self.player.hand), [faramir])
+        self.assertEqual(list(self.player.discard_pile), [boromir])
+        self.assertNotIn(boromir, self.player.affordable_cards())
+
+class TestResourceTotals(unittest.TestCase):
+    def setUp(self):
+        self.player = Player("Test")
+        self.game_state = GameState([self.player], EventSystem(), NullRenderer())
+        self.boromir, self.galadriel = Boromir(), Galadriel()
+        self.player.play_area['heroes'] = [self.boromir, self.galadriel]
+
+    def test_totals_follow_every_change(self):
+        """Test that refreshing, paying, adding resources and losing a hero all update the player's totals."""
+        self.player.refresh_resources(self.game_state)
+        self.assertEqual(self.player.resources, {"Leadership": 1, "Spirit": 1})
+        self.boromir.resources["Leadership"] += 2  # As Steward of Gondor does
+        self.assertEqual(self.player.get_available_resources("Leadership"), 3)
+        self.player.deduct_resources(2, "Leadership", self.game_state)
+        self.assertEqual(self.player.resources["Leadership"], 1)
+        self.game_state.move_card(self.boromir, self.player.discard_pile)
+        self.assertEqual(self.player.resources, {"Leadership": 0, "Spirit": 1})
+        self.player.play_area['heroes'].append(self.boromir)
+        self.assertEqual(self.player.resources["Leadership"], 1)
+
+    def test_affordable_cards(self):
+        """Test that affordable_cards keeps the hand cards whose sphere has enough resources."""
+        faramir, gandalf, steward = Faramir(), Gandalf(), StewardOfGondor()
+        self.player.hand = [faramir, gandalf, steward]
+        self.assertEqual(self.player.affordable_cards(), [])
+        self.boromir.resources["Leadership"] = 2
+        self.assertEqual(self.player.affordable_cards(), [steward])
+        self.assertEqual(self.player.affordable_cards([faramir]), [])
+        self.boromir.resources["Leadership"] = 4
+        self.assertEqual(self.player.affordable_cards(), [faramir, steward])
+
+    def test_clone_and_pickle_keep_totals_linked(self):
+        """Test that copied heroes update the copied player's totals only."""
+        self.boromir.resources["Leadership"] = 1
+        for copy in (self.game_state.clone(), pickle.loads(pickle.dumps(self.game_state))):
+            player = copy.players[0]
+            player.play_area['heroes'][0].resources["Leadership"] += 1
+            self.assertEqual(player.resources["Leadership"], 2)
+            self.assertEqual(self.player.resources["Leadership"], 1)
+
+class TestCharacterViews(unittest.TestCase):
+    def setUp(self):
+        self.player = Player("Test")
+        self.game_state = GameState([self.player], EventSystem(), NullRenderer())
+        self.boromir, self.galadriel, self.gandalf = Boromir(), Galadriel(), Gandalf()
+        self.player.play_area['heroes'] = [self.boromir, self.galadriel]
+        self.player.play_area['allies'].append(self.gandalf)
+
+    def test_views_follow_state_changes(self):
+        """Test that views are reused until a character changes state or zone."""
+        views = self.player.characters
+        self.assertEqual(views.ready, [self.boromir, self.galadriel, self.gandalf])
+        self.assertIs(views.ready, views.ready)
+        self.assertEqual(views.defenders, [self.boromir, self.gandalf])  # Galadriel cannot defend
+        self.boromir.exhausted = True
+        self.assertEqual(views.ready, [self.galadriel, self.gandalf])
+        self.assertEqual(views.exhausted, [self.boromir])
+        self.assertEqual(views.defenders, [self.gandalf])
+        self.gandalf.committed = True
+        self.assertEqual(views.committed, [self.gandalf])
+        self.game_state.move_card(self.gandalf, self.player.discard_pile)
+        self.assertEqual(views.committed, [])
+        self.assertEqual(views.all, [self.boromir, self.galadriel])
+
+    def test_cloned_views_track_the_copy(self):
+        """Test that a cloned player's views list the cloned characters."""
+        self.assertEqual(len(self.player.characters.ready), 3)
+        copy = self.game_state.clone().players[0]
+        copy.play_area['heroes'][0].exhausted = True
+        self.assertEqual(copy.characters.ready, copy.characters.all[1:])
+        self.assertEqual(self.player.characters.ready, [self.boromir, self.galadriel, self.gandalf])
+
+class Forest(Location):
+    __slots__ = ()
+
+    def play(self, game_state, controller):
+        pass
+
+class TestStagingArea(unittest.TestCase):
+    def setUp(self):
+        self.players = [Player("First"), Player("Second")]
+        self.game_state = GameState(self.players, EventSystem(), NullRenderer())
+        self.orcs = DolGuldurOrcs()  # Engagement 10, threat 2
+        self.wolf = Enemy("Wolf", engagement=30, threat=1)
+        self.troll = Enemy("Troll", engagement=20, threat=3)
+        self.forest = Forest("Forest", threat=2)
+        self.game_state.staging_area = [self.orcs, self.wolf, self.forest, self.troll]
+
+    def test_running_threat_and_engagement_order(self):
+        """Test that the threat total and engagement index follow cards in and out."""
+        staging = self.game_state.staging_area
+        self.assertEqual(staging.threat, 8)
+        self.assertEqual(staging.enemies_within(25), [self.orcs, self.troll])
+        self.assertEqual(staging.enemies_within(9), [])
+        self.game_state.move_card(self.orcs, self.game_state.encounter_discard)
+        self.assertEqual(staging.threat, 6)
+        self.assertEqual(staging.enemies_within(50), [self.wolf, self.troll])
+        for copy in (self.game_state.clone(), pickle.loads(pickle.dumps(self.game_state))):
+            self.assertEqual(copy.staging_area.threat, 6)
+            self.assertEqual([e.title for e in copy.staging_area.enemies_within(50)], ["Wolf", "Troll"])
+
+    def test_each_enemy_engages_the_first_player_it_can(self):
+        """Test that engagement checks only engage enemies some player's threat reaches."""
+        self.players[0].threat, self.players[1].threat = 15, 25
+        EncounterPhase().handle_engagement(self.game_state)
+        self.assertEqual(list(self.players[0].engaged_enemies), [self.orcs])
+        self.assertEqual(list(self.players[1].engaged_enemies), [self.troll])
+        self.assertEqual(list(self.game_state.staging_area), [self.wolf, self.forest])
+        self.assertEqual(self.game_state.staging_area.threat, 3)
+
+class TestStatModifiers(unittest.TestCase):
+    def setUp(self):
+        self.player = Player("Test")
+        self.boromir, self.faramir = Boromir(), Faramir()
+        self.player.play_area['heroes'].append(self.boromir)
+        self.player.play_area['allies'].append(self.faramir)
+        self.game = Game([self.player], controller=ScriptedController([[0]]))
+        self.game.controller.choose_player = lambda players: self.player
+
+    def test_modifier_layers_keep_damage(self):
+        """Test that modifiers change the stat while on, and damage survives their removal."""
+        bonus = StatModifier("Test", "hit_points", 2)
+        self.boromir.add_modifier(bonus)
+        self.assertEqual(self.boromir.hit_points, 7)
+        self.boromir.hit_points -= 3  # Damage
+        self.assertEqual(self.boromir.base_stat("hit_points"), 2)
+        self.boromir.remove_modifier(bonus)
+        self.assertEqual(self.boromir.hit_points, 2)
+        self.assertEqual(self.boromir.modifiers, ())
+
+    def test_faramir_boost_lasts_until_end_of_phase(self):
+        """Test that Faramir's willpower boost comes off when the quest phase ends, in copies too."""
+        state = self.game.game_state
+        self.faramir.boost_willpower({'player': self.player, 'game_state': state, 'controller': self.game.controller})
+        self.assertEqual((self.boromir.willpower, self.faramir.willpower), (2, 3))
+        self.assertEqual(self.boromir.base_stat("willpower"), 1)
+        copy = state.clone()
+        self.assertEqual(len(state.expiries), 1)
+        QuestPhase().end(state)
+        self.assertEqual((self.boromir.willpower, self.faramir.willpower), (1, 2))
+        boromir = copy.players[0].play_area['heroes'][0]
+        self.assertEqual(boromir.willpower, 2)
+        QuestPhase().end(copy)
+        self.assertEqual(boromir.willpower, 1)
+        self.assertEqual(self.boromir.willpower, 1)
+
+class TestExpiryScheduler(unittest.TestCase):
+    def test_effects_expire_at_their_phase_or_round_end(self):
+        """Test that scheduled effects expire at the first phase end at or after their key, soonest first."""
+        boromir = Boromir()
+        state = GameState([Player("Test")], EventSystem(), NullRenderer())
+        state.round_number, state.phase_index = 1, 2
+        round_boost = StatModifierEffect('attack', 2, END_OF_ROUND)
+        phase_boost = StatModifierEffect('attack', 1, END_OF_PHASE)
+        round_boost.apply(state, boromir)
+        phase_boost.apply(state, boromir)
+        self.assertEqual(state.expiries.pending(), [phase_boost, round_boost])
+        self.assertEqual(state.event_system.hook_count(), 0)
+        self.assertEqual(boromir.attack, 6)
+        QuestPhase().end(state)
+        self.assertEqual(boromir.attack, 5)
+        state.phase_index = 5
+        CombatPhase().end(state)
+        self.assertEqual(boromir.attack, 5)
+        state.round_number, state.phase_index = 2, 6  # The refresh phase starts the next round
+        RefreshPhase().end(state)
+        self.assertEqual(boromir.attack, 3)
+        self.assertEqual(len(state.expiries), 0)
+
+class TestGameStateClone(unittest.TestCase):
+    def setUp(self):
+        players = [GAVS_DECK.build_player(), GAVS_DECK.build_player()]
+        self.game = Game(players, FleeingFromMirkwood(), RandomController(seed=11), NullRenderer(), seed=11)
+
+    def test_clone_is_independent(self):
+        """Test that changing a cloned state leaves the original untouched."""
+        state = self.game.game_state
+        copy = state.clone()
+        hero, hero_copy = state.players[0].play_area['heroes'][0], copy.players[0].play_area['heroes'][0]
+        self.assertIsNot(hero, hero_copy)
+        self.assertIs(hero.definition, hero_copy.definition)
+        self.assertIs(copy.active_player, copy.players[0])
+        hero_copy.resources[hero.sphere] += 3
+        hero_copy.exhausted = True
+        copy.players[0].hand.append(copy.players[0].deck.pop())
+        copy.encounter_deck.pop()
+        self.assertEqual(hero.resources[hero.sphere], 0)
+        self.assertFalse(hero.exhausted)
+        self.assertEqual(len(state.players[0].hand), 0)
+        self.assertEqual(len(state.encounter_deck), 8)
+
+    def test_clone_rebinds_hooks_to_copied_cards(self):
+        """Test that hooks in the copy call the copied cards and are owned by them."""
+        state = self.game.game_state
+        copy = state.clone()
+        self.assertEqual(copy.event_system.hook_count(), state.event_system.hook_count())
+        boromir = copy.players[0].play_area['heroes'][0]
+        bound = {cb.__self__ for cb in copy.event_system.hooks[CALCULATE_ATTACK]}
+        self.assertIn(boromir, bound)
+        self.assertNotIn(state.players[0].play_area['heroes'][0], bound)
+        boromir.leave_play(copy)
+        self.assertEqual(copy.event_system.hook_count(), state.event_system.hook_count() - 1)
+
+    def test_cloned_game_plays_out_like_the_original(self):
+        """Test that a cloned game replays the same game and does not disturb the original."""
+        threat = [p.threat for p in self.game.players]
+        copy = self.game.clone(RandomController(seed=11))
+        outcome = copy.run(100)
+        self.assertEqual([p.threat for p in self.game.players], threat)
+        self.assertEqual(self.game.game_state.round_number, 0)
+        self.game.controller = RandomController(seed=11, game=self.game)
+        self.assertEqual(self.game.run(100), outcome)
+        self.assertEqual(self.game.game_state.round_number, copy.game_state.round_number)
+
+class TestStateHash(unittest.TestCase):
+    def setUp(self):
+        players = [GAVS_DECK.build_player(), GAVS_DECK.build_player()]
+        self.game = Game(players, FleeingFromMirkwood(), RandomController(seed=11), NullRenderer(), seed=11)
+        for player in self.game.players:
+            player.draw_card(self.game.game_state, 5)
+
+    def test_order_of_play_does_not_matter(self):
+        """Test that the same changes made in a different order hash the same."""
+        state = self.game.game_state
+        copy = state.clone()
+        for s, order in ((state, (0, 1)), (copy, (1, 0))):
+            player = s.players[0]
+            cards = list(player.hand[:2])
+            for i in order:
+                s.move_card(cards[i], player.discard_pile)
+                player.play_area['heroes'][i].exhausted = True
+        self.assertEqual(state.state_hash(), copy.state_hash())
+
+    def test_changes_alter_the_hash_and_undoing_them_restores_it(self):
+        """Test that the hash follows card, resource and threat changes as they are made and undone."""
+        state = self.game.game_state
+        player = state.players[0]
+        hero = player.play_area['heroes'][1]
+        original = state.state_hash()
+        for change, undo in ((lambda: setattr(hero, 'exhausted', True), lambda: setattr(hero, 'exhausted', False)),
+                             (lambda: hero.resources.__setitem__(hero.sphere, 2),
+                              lambda: hero.resources.__setitem__(hero.sphere, 0)),
+                             (lambda: setattr(hero, 'hit_points', hero.hit_points - 1),
+                              lambda: setattr(hero, 'hit_points', hero.hit_points + 1)),
+                             (lambda: setattr(player, 'threat', player.threat + 1),
+                              lambda: setattr(player, 'threat', player.threat - 1))):
+            change()
+            self.assertNotEqual(state.state_hash(), original)
+            undo()
+            self.assertEqual(state.state_hash(), original)
+
+    def test_copies_hash_like_the_original(self):
+        """Test that clones and pickled copies of a game in progress hash like the original."""
+        self.game.play_round()
+        expected = self.game.game_state.state_hash()
+        self.assertEqual(self.game.game_state.clone().state_hash(), expected)
+        self.assertEqual(pickle.loads(pickle.dumps(self.game.clone())).game_state.state_hash(), expected)
+
+    def test_another_process_hashes_alike(self):
+        """Test that a fresh process, with other string hashing, gives the same position the same hash."""
+        script = ("from core import Game\n"
+                  "from render import NullRenderer\n"
+                  "from quests import FleeingFromMirkwood\n"
+                  "from controllers import RandomController\n"
+                  "from simulate import GAVS_DECK\n"
+                  "game = Game([GAVS_DECK.build_player(), GAVS_DECK.build_player()], FleeingFromMirkwood(),\n"
+                  "            RandomController(seed=11), NullRenderer(), seed=11)\n"
+                  "for player in game.players:\n"
+                  "    player.draw_card(game.game_state, 5)\n"
+                  "print(game.game_state.state_hash())\n")
+        self.game.play_round()
+        self.game.game_state.state_hash()  # Draws keys here in another order than in the fresh process
+        fresh = Game([GAVS_DECK.build_player(), GAVS_DECK.build_player()], FleeingFromMirkwood(),
+                     RandomController(seed=11), NullRenderer(), seed=11)
+        for player in fresh.players:
+            player.draw_card(fresh.game_state, 5)
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                env={**os.environ, "PYTHONHASHSEED": "123"})
+        self.assertEqual(int(output.stdout), fresh.game_state.state_hash())
+
+    def test_transposition_table_evicts_least_recently_used(self):
+        """Test that a full table drops the node used longest ago."""
+        table = TranspositionTable(capacity=2)
+        table.put(1, SearchNode("defender", 2))
+        table.put(2, SearchNode("defender", 2))
+        self.assertIsNotNone(table.get(1))
+        table.put(3, SearchNode("defender", 2))
+        self.assertIsNone(table.get(2))
+        self.assertEqual(len(table), 2)
+        self.assertEqual((table.hits, table.misses), (1, 1))
+
+    def test_search_shares_nodes_through_the_table(self):
+        """Test that a search with a transposition table finds positions it has seen."""
+        table = TranspositionTable()
+        controller = MCTSController(iterations=10, seed=4, transpositions=table)
+        result = play_game([GAVS_DECK], FleeingFromMirkwood, seed=4, controller_factory=lambda seed: controller)
+        self.assertIn(result.outcome, ("victory", "defeat", "timeout"))
+        self.assertGreater(len(table), 0)
+        self.assertGreater(table.hits, 0)
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        players = [GAVS_DECK.build_player(), GAVS_DECK.build_player()]
+        self.game = Game(players, FleeingFromMirkwood(), RandomController(seed=5), NullRenderer(), seed=5)
+        for player in self.game.players:
+            player.draw_card(self.game.game_state, 5)
+
+    def snapshot(self, game=None):
+        state = (game or self.game).game_state
+        return (state.state_hash(), [list(p.deck) for p in state.players], list(state.encounter_deck),
+                state.rng.getstate(), state.event_system.hook_count(), state.round_number, len(state.expiries))
+
+    def test_undo_restores_played_rounds(self):
+        """Test that undoing to a mark puts back cards, deck order, hooks, effects and the RNG."""
+        state = self.game.game_state
+        before = self.snapshot()
+        mark = state.mark()
+        self.game.play_round()
+        self.game.play_round()
+        self.assertNotEqual(self.snapshot(), before)
+        state.undo_to(mark)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(len(state.journal), 0)
+
+    def test_undone_game_plays_like_a_clone(self):
+        """Test that a game played out and undone replays the same game as a clone would."""
+        state = self.game.game_state
+        copy = self.game.clone(RandomController(seed=9))
+        outcome = copy.resume(100)
+        mark = state.mark()
+        self.game.controller = RandomController(seed=9, game=self.game)
+        self.game.resume(100)
+        state.undo_to(mark)
+        self.game.result = None
+        self.game.controller = RandomController(seed=9, game=self.game)
+        self.assertEqual(self.game.resume(100), outcome)
+        self.assertEqual(state.round_number, copy.game_state.round_number)
+        self.assertEqual([p.threat for p in self.game.players], [p.threat for p in copy.players])
+
+    def test_nested_marks(self):
+        """Test that inner marks undo on their own."""
+        state = self.game.game_state
+        outer = state.mark()
+        self.game.play_round()
+        after_one = self.snapshot()
+        inner = state.mark()
+        self.game.play_round()
+        state.undo_to(inner)
+        self.assertEqual(self.snapshot(), after_one)
+        state.undo_to(outer)
+        self.assertEqual(len(state.journal), 0)
+
+    def test_games_are_journaled_on_their_own(self):
+        """Test that marking and undoing one game leaves another game, journaled or not, untouched."""
+        state = self.game.game_state
+        other = self.game.clone(RandomController(seed=3))
+        plain = self.game.clone(RandomController(seed=4))
+        other_mark = other.game_state.mark()
+        mark = state.mark()
+        for game in (self.game, other, plain):
+            game.play_round()
+        played = self.snapshot(other)
+        state.undo_to(mark)
+        self.assertEqual(self.snapshot(other), played)
+        self.assertEqual(len(plain.game_state.journal), 0)
+        other.game_state.undo_to(other_mark)
+        self.assertEqual(other.game_state.state_hash(), state.state_hash())
+        self.assertNotIn('__setattr__', vars(Player))  # Plain assignment again once nothing is journaled
+
+    def test_games_are_journaled_on_threads(self):
+        """Test that games marked and undone on several threads at once each undo exactly."""
+        games = [self.game.clone(RandomController(seed=seed)) for seed in range(6)]
+        failures = []
+
+        def play(game):
+            state = game.game_state
+            for _ in range(15):
+                before = state.state_hash()
+                mark = state.mark()
+                game.play_round()
+                state.undo_to(mark)
+                if state.state_hash() != before:
+                    failures.append(game)
+                game.play_round()
+
+        threads = [threading.Thread(target=play, args=(game,)) for game in games]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        self.assertNotIn('__setattr__', vars(Player))
+
+    def test_redo_makes_undone_changes_again(self):
+        """Test that redo() puts back what undo_to() undid, which can then be undone again."""
+        state = self.game.game_state
+        before = self.snapshot()
+        mark = state.mark()
+        self.game.play_round()
+        self.game.play_round()
+        after = self.snapshot()
+        state.undo_to(mark)
+        state.redo()
+        self.assertEqual(self.snapshot(), after)
+        state.undo_to(mark)
+        self.assertEqual(self.snapshot(), before)
+        self.game.play_round()
+        with self.assertRaises(RuntimeError):
+            state.redo()
+
+class TestMCTSController(unittest.TestCase):
+    def test_action_space(self):
+        """Test that multi-select decisions search every subset of a few options."""
+        self.assertEqual(action_space(["a", "b"]), [[0], [1]])
+        self.assertEqual(action_space(["a", "b"], multi_select=True), [[], [0], [1], [0, 1]])
+        self.assertEqual(len(action_space(list("abcdef"), multi_select=True)), 8)
+
+    def test_node_prefers_rewarding_action(self):
+        """Test that the most visited action is chosen and untried actions are explored first."""
+        node = SearchNode("defender", 3)
+        rng = random.Random(0)
+        for _ in range(60):
+            action = node.select(1.4, rng)
+            node.update(action, 1.0 if action == 2 else 0.0)
+        self.assertTrue(all(node.counts))
+        self.assertEqual(node.best_action(), 2)
+
+    def test_plays_full_game_and_reuses_subtree(self):
+        """Test that the search plays a game to the end, counts rollouts and keeps its subtree."""
+        controller = MCTSController(iterations=10, seed=4)
+        searches = []
+        original = controller.search
+        def search(decision, actions):
+            searches.append(controller.root is not None)
+            return original(decision, actions)
+        controller.search = search
+        result = play_game([GAVS_DECK], FleeingFromMirkwood, seed=4, controller_factory=lambda seed: controller)
+        self.assertIn(result.outcome, ("victory", "defeat", "timeout"))
+        self.assertEqual(controller.rollouts, 10 * len(searches))
+        self.assertGreater(controller.rollouts_per_second, 0)
+        self.assertTrue(any(searches[1:]))
+
+    def test_search_does_not_disturb_the_game(self):
+        """Test that rollouts leave the real game's random state and cards untouched."""
+        game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), MCTSController(iterations=5, seed=0),
+                    NullRenderer(), seed=8)
+        for player in game.players:
+            player.draw_card(game.game_state, 5)
+        game.phases[0].execute(game.game_state, game.controller)
+        game.game_state.phase_index = 1
+        game.controller.begin_phase(game.phases[1])
+        player = game.players[0]
+        hand = list(player.hand)
+        state = game.game_state.rng.getstate()
+        game.controller.choose_card_to_play(player)
+        self.assertEqual(game.game_state.rng.getstate(), state)
+        self.assertEqual(player.hand, hand)
+        self.assertEqual(game.controller.rollouts, 5)
+
+    def test_rollouts_do_not_know_the_draw_order(self):
+        """Test that rollouts play on with shuffled decks and encounter deck, not the real game's order."""
+        seen = []
+
+        def spy(game_state, decision, options, multi_select):
+            seen.append(([card.title for card in game_state.players[0].deck],
+                         [card.tokens['marker'] for card in game_state.encounter_deck]))
+            return greedy_policy(game_state, decision, options, multi_select)
+
+        controller = MCTSController(iterations=8, seed=0, rollout_policy=spy, max_rounds=2)
+        game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), controller, NullRenderer(), seed=8)
+        for player in game.players:
+            player.draw_card(game.game_state, 5)
+        game.phases[0].execute(game.game_state, controller)
+        game.game_state.phase_index = 1
+        for position, card in enumerate(game.game_state.encounter_deck, 1):
+            card.add_token(game.game_state, 'marker', position)  # Tells apart the encounter deck's identical cards
+        controller.begin_phase(game.phases[1])
+        real = ([card.title for card in game.players[0].deck],
+                [card.tokens['marker'] for card in game.game_state.encounter_deck])
+        controller.choose_card_to_play(game.players[0])
+
+        def follows_real(cards, real_cards):
+            # Without shuffling, drawing only ever takes cards off one end of the real order
+            return cards in (real_cards[:len(cards)], real_cards[len(real_cards) - len(cards):])
+
+        self.assertTrue(seen)
+        self.assertFalse(any(follows_real(deck, real[0]) for deck, _ in seen))
+        self.assertFalse(any(follows_real(encounter, real[1]) for _, encounter in seen))
+
+    def test_pickled_snapshot_plays_like_a_clone(self):
+        """Test that a snapshot sent to another process replays the same game as a local clone."""
+        game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), None, NullRenderer(), seed=2)
+        for player in game.players:
+            player.draw_card(game.game_state, 5)
+        restored = pickle.loads(pickle.dumps(game.clone()))
+        self.assertEqual(restored.game_state.event_system.hook_count(), game.game_state.event_system.hook_count())
+        results = []
+        for copy in (game.clone(RandomController(seed=3)), restored):
+            copy.controller = RandomController(seed=3, game=copy)
+            results.append((copy.resume(100), copy.game_state.round_number, copy.players[0].threat))
+        self.assertEqual(results[0], results[1])
+
+    def test_root_parallel_search_merges_worker_statistics(self):
+        """Test that a root-parallel search runs its budget across workers and plays on."""
+        controller = MCTSController(iterations=6, seed=1, workers=2)
+        try:
+            result = play_game([GAVS_DECK], FleeingFromMirkwood, seed=5, controller_factory=lambda seed: controller)
+        finally:
+            controller.close()
+        self.assertIn(result.outcome, ("victory", "defeat", "timeout"))
+        self.assertGreater(controller.rollouts, 0)
+        self.assertEqual(controller.rollouts % 6, 0)
+
+
+class TestNetworkPlay(unittest.TestCase):
+    def play(self, n_players, seed):
+        """Play a game over loopback with a random controller per seat; return the server and clients"""
+        server = GameServer([GAVS_DECK] * n_players, FleeingFromMirkwood, seed=seed, timeout=10)
+        clients = [GameClient(server.address, timeout=10) for _ in range(n_players)]
+        threads = [threading.Thread(target=client.play, args=(RandomController(seed + seat).decide,))
+                   for seat, client in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        server.serve()
+        for thread in threads:
+            thread.join()
+        return server, clients
+
+    def test_delta_only_sends_what_changed(self):
+        """Test that after the first full board a delta carries only the changed zone."""
+        game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), None, NullRenderer(), seed=1)
+        game.players[0].draw_card(game.game_state, 5)
+        encoder = BoardEncoder(game.game_state)
+        board = RemoteBoard(["Gavin"])
+        full = encoder.delta()
+        board.apply(full)
+        self.assertIsNone(encoder.delta())
+        game.players[0].play_area['heroes'][0].exhausted = True
+        delta = encoder.delta()
+        self.assertLess(len(delta), len(full) // 2)
+        board.apply(delta)
+        self.assertEqual([c.exhausted for c in board.zone("heroes", 0)], [True, False, False])
+        self.assertEqual(board.counter("threat", 0), game.players[0].threat)
+
+    def test_clients_follow_the_game(self):
+        """Test that every client ends with the server's board and result, for less than resending it."""
+        server, clients = self.play(2, seed=3)
+        game_state = server.game.game_state
+        board = RemoteBoard([p.name for p in game_state.players])
+        full = BoardEncoder(game_state).delta()
+        board.apply(full)
+        for client in clients:
+            self.assertEqual(client.result, server.game.result)
+            self.assertEqual(client.board.zones, board.zones)
+            self.assertEqual(client.board.counters, board.counters)
+        self.assertLess(server.bytes_sent, len(clients) * len(full) * game_state.version // 2)
+
+    def test_network_game_plays_like_a_local_one(self):
+        """Test that a remote seat's decisions reach the game as a local controller's would."""
+        server, _ = self.play(1, seed=6)
+        local = play_game([GAVS_DECK], FleeingFromMirkwood, seed=6, controller_factory=RandomController)
+        self.assertEqual(server.game.result, local.outcome)
+        self.assertEqual(server.game.game_state.round_number, local.rounds)
+
+
+@unittest.skipUnless(greenlet, "greenlet is not installed")
+class TestGameHost(unittest.TestCase):
+    def test_interleaved_tables_play_like_local_games(self):
+        """Test that tables taking turns on one event loop reach the results their seeds give locally."""
+        def agent(seed):
+            controller = RandomController(seed)
+
+            async def decide(decision, options, multi_select=False):
+                self.assertNotIn('__setattr__', vars(Player))  # Tables need no journal
+                await asyncio.sleep(0)  # Let the other tables play
+                return controller.decide(decision, options, multi_select)
+            return decide
+
+        host = GameHost()
+        for seed in range(8):
+            host.open_table([GAVS_DECK], FleeingFromMirkwood, [agent(seed)], seed)
+        results = host.run()
+        for seed, (table, result) in enumerate(zip(host.tables, results)):
+            local = play_game([GAVS_DECK], FleeingFromMirkwood, seed)
+            self.assertEqual(result, local.outcome)
+            self.assertEqual(table.game.game_state.round_number, local.rounds)
+        self.assertEqual(len(host.tables[0].game.game_state.journal), 0)
+
+    def test_decisions_are_asked_once(self):
+        """Test that the game carries on from each decision instead of playing its phase again."""
+        host = GameHost()
+        table = host.open_table([GAVS_DECK], FleeingFromMirkwood, [agent_from(RandomController(3))], seed=3)
+        asked = []
+        decide = table.controller._decide
+
+        def count(decision, options, multi_select=False):
+            asked.append(decision)
+            return decide(decision, options, multi_select)
+        table.controller._decide = count
+        host.run()
+        self.assertEqual(len(asked), table.decisions)
+        self.assertGreater(table.decisions, 0)
+
+    def test_idle_players_pass(self):
+        """Test that a seat that never answers is passed for after the timeout and the game still ends."""
+        host = GameHost()
+        table = host.open_table([GAVS_DECK] * 2, FleeingFromMirkwood,
+                                [agent_from(RandomController(1)), RemoteSeat()], seed=2, timeout=0.001)
+        result, = host.run()
+        self.assertIn(result, ("victory", "defeat", "timeout"))
+        self.assertGreater(table.timeouts, 0)
+        self.assertLess(table.timeouts, table.decisions)
+        self.assertEqual(auto_pass("use_ability", ["Yes", "No"]), [1])
+        self.assertEqual(auto_pass("card", ["Gandalf", None]), [1])
+        self.assertEqual(auto_pass("commit", ["Aragorn"], multi_select=True), [])
+
+    def test_remote_seat_answers(self):
+        """Test that answering a RemoteSeat from another task plays its decisions."""
+        seat = RemoteSeat()
+        controller = RandomController(4)
+
+        async def answer():
+            while not table.result:
+                if seat.pending is not None:
+                    seat.answer(controller.decide(*seat.pending))
+                await asyncio.sleep(0)
+
+        async def main():
+            await asyncio.gather(table.play(), answer())
+
+        host = GameHost()
+        table = host.open_table([GAVS_DECK], FleeingFromMirkwood, [seat], seed=4)
+        asyncio.run(main())
+        self.assertEqual(table.result, play_game([GAVS_DECK], FleeingFromMirkwood, 4).outcome)
+
+
+class TestLiveRendering(unittest.TestCase):
+    def setUp(self):
+        self.game = Game([GAVS_DECK.build_player()], FleeingFromMirkwood(), RandomController(seed=2),
+                         NullRenderer(), seed=2)
+        self.player = self.game.players[0]
+        self.player.draw_card(self.game.game_state, 5)
+
+    def test_panels_are_built_again_only_after_a_change(self):
+        """Test that render_panel() reuses its panel until the card changes, is changed back or gains a keyword."""
+        boromir = self.player.play_area['heroes'][0]
+        panel = boromir.render_panel()
+        self.assertIs(boromir.render_panel(), panel)
+        self.assertIsNot(boromir.render_panel(in_hand=True), panel)
+        state = self.game.game_state
+        mark = state.mark()
+        boromir.exhausted = True
+        exhausted = boromir.render_panel()
+        self.assertIsNot(exhausted, panel)
+        state.undo_to(mark)
+        self.assertIsNot(boromir.render_panel(), exhausted)
+        version = boromir.version
+        boromir.add_keyword("Gondor")
+        self.assertGreater(boromir.version, version)
+
+    def test_live_view_redraws_only_changed_lines(self):
+        """Test that the live view writes nothing when nothing changed and only a few lines for one change."""
+        out = io.StringIO()
+        renderer = LiveRenderer(Console(file=out, force_terminal=True, width=100, height=200))
+        state = self.game.game_state
+        renderer.board(state)
+        renderer.hand(self.player)
+        full = len(out.getvalue())
+        renderer.board(state)
+        renderer.hand(self.player)
+        self.assertEqual(len(out.getvalue()), full)
+        StatModifierEffect('willpower', 1, END_OF_PHASE).apply(state, self.player.play_area['heroes'][0])
+        renderer.board(state)
+        self.assertLess(len(out.getvalue()) - full, full // 10)
+        renderer.close()
+        self.assertIn("😤 2", out.getvalue())
+
+    def test_plain_console_gets_changed_regions(self):
+        """Test that on a console that is not a terminal only the regions that changed are printed again."""
+        out = io.StringIO()
+        renderer = LiveRenderer(Console(file=out, width=100))
+        state = self.game.game_state
+        renderer.board(state)
+        self.assertIn("Staging Area", out.getvalue())
+        out.truncate(0)
+        out.seek(0)
+        self.player.play_area['heroes'][0].exhausted = True
+        renderer.board(state)
+        self.assertIn("Play Area", out.getvalue())
+        self.assertNotIn("Staging Area", out.getvalue())
+
+    def test_players_with_the_same_name_get_their_own_regions(self):
+        """Test that two players called the same each keep a play area region."""
+        players = [GAVS_DECK.build_player(), GAVS_DECK.build_player()]
+        game = Game(players, FleeingFromMirkwood(), RandomController(seed=2), NullRenderer(), seed=2)
+        self.assertEqual(players[0].name, players[1].name)
+        renderer = LiveRenderer(Console(file=io.StringIO(), width=100))
+        renderer.board(game.game_state)
+        self.assertEqual(len([name for name in renderer.regions if name[0] == "play area"]), 2)
+
+
+class TestLegalActions(unittest.TestCase):
+    def test_action_ids(self):
+        """Test that single choices are indices and multi-select choices bitmasks of indices."""
+        self.assertEqual(tuple(legal_actions(3)), (0, 1, 2))
+        self.assertEqual(tuple(legal_actions(2, multi_select=True)), (0, 1, 2, 3))
+        self.assertEqual(len(legal_actions(5, multi_select=True)), 32)
+        self.assertIn(encode_choice([1, 3], multi_select=True), legal_actions(5, multi_select=True))
+        self.assertEqual(len(legal_actions(40, multi_select=True)), 2 ** 40)
+        self.assertIs(legal_actions(3), legal_actions(3))
+        for action in legal_actions(4, multi_select=True):
+            self.assertEqual(encode_choice(decode_action(action, True), True), action)
+        self.assertEqual(decode_action(5, multi_select=True), [0, 2])
+        self.assertEqual(action_space(["a", "b"], multi_select=True), [[], [0], [1], [0, 1]])
+
+    def test_pending_decision_is_posted_while_deciding(self):
+        """Test that a headless controller posts each decision, with a new version, while it decides."""
+        seen = []
+
+        def policy(game_state, decision, options, multi_select):
+            pending = game_state.pending_decision
+            self.assertIs(pending.options, options)
+            self.assertIs(pending_actions(game_state), legal_actions(len(options), multi_select))
+            seen.append((decision, pending.version))
+            return greedy_policy(game_state, decision, options, multi_select)
+
+        result = play_game([GAVS_DECK], FleeingFromMirkwood, 3, lambda seed: PolicyController(policy))
+        self.assertIn(result.outcome, ("victory", "defeat", "timeout"))
+        versions = [version for _, version in seen]
+        self.assertEqual(versions, list(range(1, len(seen) + 1)))
+        self.assertIn("use_ability", {decision for decision, _ in seen})
+
+    def test_next_decision_between_phases(self):
+        """Test that a game between decisions can be asked the decision it asks next, which it then asks."""
+        players = [GAVS_DECK.build_player()]
+        game = Game(players, FleeingFromMirkwood(), ScriptedController([]), NullRenderer(), seed=4)
+        for player in players:
+            player.draw_card(game.game_state, 5)
+        before = game.game_state.state_hash()
+        decision = next_decision(game)
+        self.assertEqual(game.game_state.state_hash(), before)
+        self.assertIsNone(game.game_state.pending_decision)
+        self.assertEqual(pending_actions(game.game_state), ())
+        with self.assertRaises(IndexError) as raised:
+            game.resume(10)
+        self.assertIn(f"'{decision.name}'", str(raised.exception))
+        self.assertEqual(decision.actions, legal_actions(len(decision.options), decision.multi_select))
+
+    def test_abilities_do_not_format_prompts_for_headless_controllers(self):
+        """Test that card abilities ask headless controllers by decision name, not by prompt text."""
+        player = Player("Test")
+        galadriel = Galadriel()
+        player.play_area['heroes'].append(galadriel)
+        player.deck = [Ally("Test Ally", 1, "Spirit", 1, 1, 1, 2)]
+        controller = ScriptedController([0, 0])
+        game = Game([player], controller=controller, renderer=NullRenderer())
+        controller.game = game
+        with patch.object(Galadriel, "title", new_callable=property, fget=lambda card: self.fail("title read")):
+            galadriel.offer_action({'player': player, 'game_state': game.game_state, 'controller': controller})
+        self.assertTrue(galadriel.exhausted)
+        self.assertEqual(len(player.hand), 1)
+        self.assertIsNone(game.game_state.pending_decision)
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class TestVectorizedEngine(unittest.TestCase):
+    def assertAgree(self, objects, batch, sigmas=3):
+        """Win rates and mean rounds within sigmas standard errors of their difference"""
+        n, m = len(objects.results), len(batch.rounds)
+        p, q = objects.win_rate, batch.win_rate
+        self.assertLess(abs(p - q), sigmas * math.sqrt(p * (1 - p) / n + q * (1 - q) / m))
+        variance = float(batch.rounds.var())  # Both engines' rounds spread alike
+        self.assertLess(abs(objects.mean_rounds - batch.mean_rounds), sigmas * math.sqrt(variance / n + variance / m))
+
+    def test_agrees_with_object_engine(self):
+        """Test that a batch of lockstep games wins about as often, and lasts about as long, as the object engine."""
+        objects = simulate([GAVS_DECK], FleeingFromMirkwood, 3000, seed=7)
+        batch = simulate_batch([GAVS_DECK], FleeingFromMirkwood, 100000, seed=7)
+        self.assertAgree(objects, batch)
+
+    def test_greedy_policy_agrees_with_greedy_controller(self):
+        """Test that the greedy policy plays two-player games like the greedy controller."""
+        from simulate import CONTROLLERS
+        objects = simulate([GAVS_DECK] * 2, FleeingFromMirkwood, 200, seed=7, controller_factory=CONTROLLERS["greedy"])
+        batch = simulate_batch([GAVS_DECK] * 2, FleeingFromMirkwood, 20000, seed=7, policy=GreedyPolicy())
+        self.assertAgree(objects, batch)
+
+    def test_seeded_batches_repeat(self):
+        """Test that the same seed plays the same batch."""
+        first, second = (simulate_batch([GAVS_DECK], FleeingFromMirkwood, 500, seed=3) for _ in range(2))
+        self.assertTrue(numpy.array_equal(first.outcomes, second.outcomes))
+        self.assertTrue(numpy.array_equal(first.rounds, second.rounds))
+        self.assertEqual(sum(first.outcome_counts().values()), 500)
+
+    def test_rejects_unsupported_cards(self):
+        """Test that a deck with a card the lockstep engine has no rules for is refused."""
+        from simulate import Deck
+        with self.assertRaises(ValueError):
+            simulate_batch([Deck("Lost", [Aragorn], [Forest])], FleeingFromMirkwood, 10)
+
+
+@unittest.skipUnless(numpy and greenlet, "numpy or greenlet is not installed")
+class TestGameEnv(unittest.TestCase):
+    def play(self, env, seed, pick):
+        obs, info = env.reset(seed)
+        while True:
+            obs, reward, terminated, truncated, info = env.step(pick(obs["action_mask"]))
+            if terminated or truncated:
+                return reward, info["result"], env.game.game_state.round_number
+
+    def test_plays_a_game_to_the_end(self):
+        """Test that stepping legal actions finishes the game with a matching reward."""
+        env = GameEnv([GAVS_DECK], FleeingFromMirkwood)
+        self.addCleanup(env.close)
+        rng = numpy.random.default_rng(0)
+        reward, result, rounds = self.play(env, 4, lambda mask: rng.choice(numpy.flatnonzero(mask)))
+        self.assertEqual(reward, {"victory": 1.0, "defeat": -1.0}[result])
+        self.assertGreater(rounds, 0)
+
+    def test_observation_arrays_are_reused(self):
+        """Test that each step writes into the arrays returned by reset()."""
+        env = GameEnv([GAVS_DECK], FleeingFromMirkwood)
+        self.addCleanup(env.close)
+        obs, info = env.reset(1)
+        arrays = {name: array for name, array in obs.items()}
+        self.assertEqual(obs["threat"][0], 32)
+        self.assertEqual(obs["hand"].sum(), 5)
+        self.assertEqual(list(obs["heroes"][0, :, 0]), [1, 1, 1])
+        self.assertGreaterEqual(obs["action_mask"].sum(), 2)
+        obs, *_ = env.step(0)
+        for name, array in obs.items():
+            self.assertIs(array, arrays[name])
+
+    def test_same_seed_and_actions_replay_the_game(self):
+        """Test that a seed and a sequence of actions determine the game."""
+        env = GameEnv([GAVS_DECK], FleeingFromMirkwood)
+        self.addCleanup(env.close)
+        first, second = (self.play(env, 9, lambda mask: int(numpy.flatnonzero(mask)[-1])) for _ in range(2))
+        self.assertEqual(first, second)
+
+    def test_games_run_in_the_calling_thread(self):
+        """Test that stepping starts no thread and close() unwinds a game left at a decision."""
+        threads = threading.active_count()
+        env = GameEnv([GAVS_DECK], FleeingFromMirkwood)
+        env.reset(2)
+        env.step(0)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertIsNotNone(env.decision)
+        env.close()
+        self.assertIsNone(env.game.result)
+        with self.assertRaises(RuntimeError):
+            env.step(0)
+        obs, info = env.reset(2)
+        self.assertIsNotNone(info["decision"])
+        env.close()
+
+    def test_illegal_action_is_refused(self):
+        env = GameEnv([GAVS_DECK], FleeingFromMirkwood)
+        self.addCleanup(env.close)
+        obs, info = env.reset(1)
+        with self.assertRaises(ValueError):
+            env.step(int(obs["action_mask"].sum()))
+
+    def test_decision_wider_than_the_mask_fails(self):
+        """Test that a decision with more actions than max_actions raises instead of being cut short."""
+        env = GameEnv([GAVS_DECK], FleeingFromMirkwood, max_actions=2)
+        self.addCleanup(env.close)
+        with self.assertRaises(RuntimeError) as raised:
+            for seed in range(10):
+                self.play(env, seed, lambda mask: 0)
+        self.assertIsInstance(raised.exception.__cause__, ValueError)
+
+    def test_vector_env_restarts_finished_games(self):
+        """Test that a vector env steps every game per call and starts finished ones again."""
+        envs = VectorGameEnv([GAVS_DECK], FleeingFromMirkwood, 3)
+        self.addCleanup(envs.close)
+        obs, infos = envs.reset(seed=20)
+        self.assertEqual(obs["action_mask"].shape, (3, 256))
+        self.assertTrue(numpy.shares_memory(envs.envs[1].observation["threat"], obs["threat"]))
+        finished = 0
+        for _ in range(400):
+            obs, rewards, terminated, truncated, infos = envs.step([0, 0, 0])
+            finished += int(terminated.sum() + truncated.sum())
+        self.assertGreater(finished, 0)
+        self.assertEqual(envs.next_seed, 23 + finished)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,593 @@
+import argparse
+import time
+import numpy as np
+from core import *
+from quests import *
+from gavs_deck import *
+
+# Where an encounter card is
+IN_DECK, IN_DISCARD, IN_STAGING, ENGAGED, REVEALED = range(5)
+LOST = -2  # attached_to of an attachment whose host left play or is an encounter card
+
+OUTCOMES = ("timeout", "victory", "defeat")
+TIMEOUT, VICTORY, DEFEAT = range(3)
+
+# Card classes the lockstep engine knows the abilities of
+HEROES = (Boromir, Galadriel, Aragorn)
+ALLIES = (Faramir, Gandalf)
+ATTACHMENTS = (StewardOfGondor, UnexpectedCourage)
+SHADOW_DAMAGE = {DolGuldurOrcs: 1}  # Encounter card class -> damage its shadow effect deals to the defender
+
+
+def _kth(mask, k):
+    """Column of the k-th (from 0) True in each row of mask"""
+    return np.argmax(np.cumsum(mask, axis=1) > k[:, None], axis=1)
+
+
+class RandomPolicy:
+    """Uniform over the legal options, passing included where allowed; each
+    option of a multi-select decision is taken with even odds. Plays like
+    controllers.RandomController."""
+
+    def pick(self, rng, decision, legal, optional=False, scores=None):
+        """One option per row of the (games, options) legal mask, or -1 to pass"""
+        count = legal.sum(axis=1)
+        roll = (rng.random(len(legal)) * (count + optional)).astype(np.int64)
+        choice = _kth(legal, roll)
+        choice[roll >= count] = -1
+        return choice
+
+    def pick_many(self, rng, decision, legal):
+        return legal & (rng.random(legal.shape) < 0.5)
+
+
+class GreedyPolicy:
+    """Plays like controllers.greedy_policy: every option of a multi-select
+    decision, otherwise the option with the best score (the priciest card, the
+    sturdiest defender) or else the first one."""
+
+    def pick(self, rng, decision, legal, optional=False, scores=None):
+        if scores is None:
+            choice = np.argmax(legal, axis=1)
+        else:
+            choice = np.argmax(np.where(legal, scores, -np.inf), axis=1)
+        choice[~legal.any(axis=1)] = -1
+        return choice
+
+    def pick_many(self, rng, decision, legal):
+        return legal.copy()
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy}
+
+
+class CardTables:
+    """The static side of a batch: what sits in each slot of each player's
+    arrays, read from the card definitions.
+
+    Each player's cards are numbered heroes first, then the deck. A card's
+    number is also its character slot, used while it is a hero or ally in play;
+    defeated heroes go to the discard pile but, as in Player.reshuffle_discard(),
+    are never shuffled back into the deck.
+    """
+
+    def __init__(self, decks, quest):
+        players = [deck.build_player() for deck in decks]
+        self.n_players = P = len(players)
+        self.n_heroes = H = max(len(p.play_area['heroes']) for p in players)
+        self.n_slots = C = H + max(len(p.deck) for p in players)
+        self.quest = quest()
+        encounter = self.quest.build_encounter_deck()
+        self.n_encounter = E = len(encounter)
+
+        cards = [card for p in players for card in list(p.play_area['heroes']) + list(p.deck)]
+        for card in cards:
+            if not isinstance(card, HEROES + ALLIES + ATTACHMENTS):
+                raise ValueError(f"{type(card).__name__} is not supported by the vectorized engine")
+        for card in encounter:
+            if type(card) not in SHADOW_DAMAGE:
+                raise ValueError(f"{type(card).__name__} is not supported by the vectorized engine")
+        spheres = sorted({card.sphere for card in cards})
+        self.spheres = {sphere: i for i, sphere in enumerate(spheres)}
+
+        slot = lambda dtype=np.int32: np.zeros((P, C), dtype)
+        self.is_hero, self.is_ally, self.is_gondor_ally = slot(bool), slot(bool), slot(bool)
+        self.is_boromir, self.is_galadriel, self.is_aragorn = slot(bool), slot(bool), slot(bool)
+        self.is_faramir, self.is_gandalf = slot(bool), slot(bool)
+        self.can_quest, self.can_defend, self.can_attack = slot(bool), slot(bool), slot(bool)
+        self.willpower, self.attack, self.defense, self.hit_points = slot(), slot(), slot(), slot()
+        self.threat_cost = np.zeros(P, np.int32)
+        self.in_deck = slot(bool)  # Heroes and padding for shorter decks are False
+        self.card_cost, self.card_sphere = slot(), slot()
+        self.is_attachment, self.is_steward, self.is_courage = slot(bool), slot(bool), slot(bool)
+
+        for p, player in enumerate(players):
+            self.threat_cost[p] = sum(hero.threat_cost for hero in player.play_area['heroes'])
+            cards = list(enumerate(player.play_area['heroes']))
+            cards += [(H + d, card) for d, card in enumerate(player.deck)]
+            characters = []
+            for c, card in cards:
+                self.in_deck[p, c] = c >= H
+                self.card_cost[p, c] = card.cost
+                self.card_sphere[p, c] = self.spheres[card.sphere]
+                if isinstance(card, Attachment):
+                    self.is_attachment[p, c] = True
+                    self.is_steward[p, c] = isinstance(card, StewardOfGondor)
+                    self.is_courage[p, c] = isinstance(card, UnexpectedCourage)
+                else:
+                    characters.append((c, card))
+            for c, card in characters:
+                self.is_hero[p, c] = isinstance(card, Hero)
+                self.is_ally[p, c] = isinstance(card, Ally)
+                self.is_gondor_ally[p, c] = isinstance(card, Ally) and 'Gondor' in card.keywords
+                self.is_boromir[p, c] = isinstance(card, Boromir)
+                self.is_galadriel[p, c] = isinstance(card, Galadriel)
+                self.is_aragorn[p, c] = isinstance(card, Aragorn)
+                self.is_faramir[p, c] = isinstance(card, Faramir)
+                self.is_gandalf[p, c] = isinstance(card, Gandalf)
+                self.can_quest[p, c] = card.can_quest()
+                self.can_defend[p, c] = card.can_defend()
+                self.can_attack[p, c] = card.can_attack
+                self.willpower[p, c] = card.willpower
+                self.attack[p, c] = card.attack
+                self.defense[p, c] = card.defense
+                self.hit_points[p, c] = card.hit_points
+
+        self.leadership = self.spheres.get("Leadership", 0)
+        self.enemy_engagement = np.array([card.engagement for card in encounter], np.int32)
+        self.enemy_threat = np.array([card.threat for card in encounter], np.int32)
+        self.enemy_attack = np.array([card.attack for card in encounter], np.int32)
+        self.enemy_defense = np.array([card.defense for card in encounter], np.int32)
+        self.enemy_hit_points = np.array([card.hit_points for card in encounter], np.int32)
+        self.shadow_damage = np.array([SHADOW_DAMAGE[type(card)] for card in encounter], np.int32)
+
+
+class BatchState:
+    """Structure-of-arrays state of a batch of games; row i of every array is one game.
+
+    Shapes use B games, P players, H heroes and C cards per player, S spheres
+    and E encounter cards; see CardTables for how cards are numbered.
+    """
+    FIELDS = ('game', 'round_number', 'progress', 'threat', 'resources', 'deck_order', 'deck_left',
+              'hand', 'discard', 'in_play', 'exhausted', 'new_ally', 'used_this_round', 'willpower',
+              'attack', 'defense', 'hit_points', 'attached_to', 'attachment_exhausted',
+              'encounter_where', 'encounter_player', 'encounter_hit_points')
+
+    def __init__(self, tables, n_games, rng):
+        B, P, H, C, E = n_games, tables.n_players, tables.n_heroes, tables.n_slots, tables.n_encounter
+        self.game = np.arange(B)
+        self.round_number = np.zeros(B, np.int32)
+        self.progress = np.zeros(B, np.int32)
+        self.threat = np.tile(tables.threat_cost, (B, 1))
+        self.resources = np.zeros((B, P, H, len(tables.spheres)), np.int32)
+        keys = rng.random((B, P, C))
+        keys[:, ~tables.in_deck] = 2.0  # Sorts last and is never drawn
+        self.deck_order = np.argsort(keys, axis=2)  # The deck, bottom first; deck_left cards are left
+        self.deck_left = np.tile(tables.in_deck.sum(axis=1), (B, 1))
+        self.hand = np.zeros((B, P, C), bool)
+        self.discard = np.zeros((B, P, C), bool)
+        self.in_play = np.zeros((B, P, C), bool)
+        self.in_play[:, :, :H] = tables.is_hero[:, :H]
+        self.exhausted = np.zeros((B, P, C), bool)
+        self.new_ally = np.zeros((B, P, C), bool)
+        self.used_this_round = np.zeros((B, P, C), bool)
+        self.willpower = np.tile(tables.willpower, (B, 1, 1))
+        self.attack = np.tile(tables.attack, (B, 1, 1))
+        self.defense = np.tile(tables.defense, (B, 1, 1))
+        self.hit_points = np.tile(tables.hit_points, (B, 1, 1))
+        self.attached_to = np.full((B, P, C), -1, np.int32)  # Host as player * C + slot
+        self.attachment_exhausted = np.zeros((B, P, C), bool)
+        self.encounter_where = np.full((B, E), IN_DECK, np.int8)
+        self.encounter_player = np.zeros((B, E), np.int32)
+        self.encounter_hit_points = np.tile(tables.enemy_hit_points, (B, 1))
+
+    def __len__(self):
+        return len(self.game)
+
+    def keep(self, rows):
+        """Drop every game not in rows"""
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name)[rows])
+
+
+class BatchReport:
+    """Outcomes of a batch of games, by game number"""
+
+    def __init__(self, outcomes, rounds, threat, elapsed):
+        self.outcomes = outcomes  # Index into OUTCOMES
+        self.rounds = rounds
+        self.threat = threat  # (games, players) final threat
+        self.elapsed = elapsed
+
+    @property
+    def win_rate(self):
+        return float(np.mean(self.outcomes == VICTORY)) if len(self.outcomes) else 0.0
+
+    @property
+    def mean_rounds(self):
+        return float(np.mean(self.rounds)) if len(self.rounds) else 0.0
+
+    @property
+    def games_per_minute(self):
+        return len(self.outcomes) * 60 / self.elapsed if self.elapsed else float("inf")
+
+    def outcome_counts(self):
+        return {name: int(np.sum(self.outcomes == i)) for i, name in enumerate(OUTCOMES)}
+
+
+class LockstepEngine:
+    """Plays a batch of games of the object engine's rules side by side, one
+    phase at a time, with every step a NumPy operation over all games still
+    running. Finished games drop out of the batch at the end of each round.
+
+    Only the cards of gavs_deck.py and quests.py are supported. Decisions are
+    made by a policy (RandomPolicy by default) and the random numbers are drawn
+    differently, so results agree with the object engine statistically, not
+    game for game.
+    """
+
+    def __init__(self, decks, quest, n_games, seed=None, policy=None, max_rounds=100):
+        self.tables = CardTables(decks, quest)
+        self.rng = np.random.default_rng(seed)
+        self.policy = policy if policy is not None else RandomPolicy()
+        self.max_rounds = max_rounds
+        self.state = BatchState(self.tables, n_games, self.rng)
+        self.outcomes = np.zeros(n_games, np.int8)
+        self.rounds = np.zeros(n_games, np.int32)
+        self.final_threat = np.zeros((n_games, self.tables.n_players), np.int32)
+
+    def run(self):
+        start = time.perf_counter()
+        rows = np.arange(len(self.state))
+        for p in range(self.tables.n_players):
+            self.draw(rows, p, 5)
+        while len(self.state):
+            self.finish_games()
+            if len(self.state):
+                self.play_round()
+        return BatchReport(self.outcomes, self.rounds, self.final_threat, time.perf_counter() - start)
+
+    def play_round(self):
+        self.resource_phase()
+        self.planning_phase()
+        self.quest_phase()
+        # No supported encounter card is a location, so there is never anywhere to travel
+        self.encounter_phase()
+        self.combat_phase()
+        self.refresh_phase()
+
+    def finish_games(self):
+        """Record and drop the games that are over, as Game.check_game_over and the round limit decide"""
+        s, t = self.state, self.tables
+        defeat = (s.threat >= 50).any(axis=1) | ~(s.in_play & t.is_hero).any(axis=2).all(axis=1)
+        victory = ~defeat & (s.progress >= self.tables.quest.required_progress)
+        outcome = np.full(len(s), -1)
+        outcome[defeat] = DEFEAT
+        outcome[victory] = VICTORY
+        if self.max_rounds is not None:
+            outcome[(outcome < 0) & (s.round_number >= self.max_rounds)] = TIMEOUT
+        done = outcome >= 0
+        if done.any():
+            games = s.game[done]
+            self.outcomes[games] = outcome[done]
+            self.rounds[games] = s.round_number[done]
+            self.final_threat[games] = s.threat[done]
+            s.keep(np.nonzero(~done)[0])
+
+    # Decisions
+
+    def yes(self, n):
+        """Whether to use an optional ability, in each of n games"""
+        return self.policy.pick(self.rng, "use_ability", np.ones((n, 2), bool)) == 0
+
+    def choose_player(self, n):
+        return self.policy.pick(self.rng, "player", np.ones((n, self.tables.n_players), bool))
+
+    # Cards
+
+    def draw(self, rows, p, count=1):
+        """Player p draws count cards in each game of rows, reshuffling the
+        discard pile into an empty deck; running out entirely sets threat to 50"""
+        s = self.state
+        for _ in range(count):
+            empty = s.deck_left[rows, p] == 0
+            if empty.any():
+                self.reshuffle_discard(rows[empty], p)
+                out = s.deck_left[rows, p] == 0
+                s.threat[rows[out], p] = 50
+                rows = rows[~out]
+            if not len(rows):
+                return
+            s.deck_left[rows, p] -= 1
+            s.hand[rows, p, s.deck_order[rows, p, s.deck_left[rows, p]]] = True
+
+    def reshuffle_discard(self, rows, p):
+        s = self.state
+        heroes = self.tables.is_hero[p]
+        discard = s.discard[rows, p] & ~heroes  # Defeated heroes stay in the discard pile
+        keys = self.rng.random(discard.shape)
+        keys[~discard] = 2.0
+        s.deck_order[rows, p] = np.argsort(keys, axis=1)
+        s.deck_left[rows, p] = discard.sum(axis=1)
+        s.discard[rows, p] &= heroes
+
+    def draw_encounter_card(self, rows):
+        """Reveal a random card of the encounter deck in each game of rows,
+        reshuffling the discard into an empty deck; -1 where there is none"""
+        s = self.state
+        where = s.encounter_where[rows]
+        empty = ~(where == IN_DECK).any(axis=1)
+        if empty.any():
+            reshuffled = where[empty]
+            reshuffled[reshuffled == IN_DISCARD] = IN_DECK
+            where[empty] = reshuffled
+            s.encounter_where[rows] = where
+        in_deck = where == IN_DECK
+        count = in_deck.sum(axis=1)
+        card = _kth(in_deck, (self.rng.random(len(rows)) * count).astype(np.int64))
+        card[count == 0] = -1
+        drawn = card >= 0
+        s.encounter_where[rows[drawn], card[drawn]] = REVEALED
+        return card
+
+    def hero_totals(self, rows, p):
+        """(games, spheres) resources on player p's heroes in play"""
+        s, H = self.state, self.tables.n_heroes
+        return (s.resources[rows, p] * s.in_play[rows, p, :H, None]).sum(axis=1)
+
+    def leave_play(self, rows, p, slot):
+        """Character slot of player p goes to the discard pile; its attachments go to their owners' discard piles"""
+        s, t = self.state, self.tables
+        s.in_play[rows, p, slot] = False
+        s.discard[rows, p, slot] = True
+        hosts = s.attached_to[rows]
+        hosted = hosts == (p * t.n_slots + slot)[:, None, None]
+        hosts[hosted] = -1
+        s.attached_to[rows] = hosts
+        s.discard[rows] |= hosted
+
+    # Phases
+
+    def resource_phase(self):
+        s, t = self.state, self.tables
+        for p in range(t.n_players):
+            for h in range(t.n_heroes):
+                s.resources[:, p, h, t.card_sphere[p, h]] += s.in_play[:, p, h]
+
+    def planning_phase(self):
+        s, t = self.state, self.tables
+        for p in range(t.n_players):
+            rows = np.arange(len(s))
+            while len(rows):
+                totals = self.hero_totals(rows, p)
+                affordable = s.hand[rows, p] & (totals[:, t.card_sphere[p]] >= t.card_cost[p])
+                card = self.policy.pick(self.rng, "card_to_play", affordable, optional=True,
+                                        scores=t.card_cost[p])
+                playing = card >= 0
+                rows, card = rows[playing], card[playing]
+                if len(rows):
+                    self.play_card(rows, p, card)
+            self.player_actions(p)
+
+    def play_card(self, rows, p, card):
+        s, t = self.state, self.tables
+        s.hand[rows, p, card] = False
+        self.pay(rows, p, t.card_cost[p, card], t.card_sphere[p, card])
+        attachment = t.is_attachment[p, card]
+        entering, slot = rows[~attachment], card[~attachment]
+        s.in_play[entering, p, slot] = True
+        s.new_ally[entering, p, slot] = t.is_ally[p, slot]
+        gandalf = t.is_gandalf[p, slot]
+        if gandalf.any():
+            self.gandalf_response(entering[gandalf], p)
+        if attachment.any():
+            self.attach(rows[attachment], p, card[attachment])
+
+    def pay(self, rows, p, cost, sphere):
+        """Deduct cost from player p's heroes of the sphere, in order, as Player.deduct_resources
+        does: every hero reached while something is left to pay exhausts"""
+        s, t = self.state, self.tables
+        remaining = cost.copy()
+        for h in range(t.n_heroes):
+            paying = (t.card_sphere[p, h] == sphere) & s.in_play[rows, p, h] & (remaining > 0)
+            r, sp = rows[paying], sphere[paying]
+            use = np.minimum(s.resources[r, p, h, sp], remaining[paying])
+            s.resources[r, p, h, sp] -= use
+            remaining[paying] -= use
+            s.exhausted[r, p, h] = True
+
+    def attach(self, rows, p, card):
+        """Attach each card to a character in play, or a card in the staging area, chosen by the policy"""
+        s, t = self.state, self.tables
+        characters = s.in_play[rows].reshape(len(rows), -1)
+        staging = s.encounter_where[rows] == IN_STAGING
+        target = self.policy.pick(self.rng, "attachment_target", np.concatenate([characters, staging], axis=1))
+        nothing = target < 0
+        s.discard[rows[nothing], p, card[nothing]] = True
+        rows, card, target = rows[~nothing], card[~nothing], target[~nothing]
+        s.attached_to[rows, p, card] = np.where(target < characters.shape[1], target, LOST)
+        s.attachment_exhausted[rows, p, card] = False
+
+    def gandalf_response(self, rows, p):
+        s = self.state
+        choice = self.policy.pick(self.rng, "choose_option", np.ones((len(rows), 3), bool))
+        self.draw(rows[choice == 0], p, 3)
+        hurt = rows[choice == 1]
+        enemy = self.policy.pick(self.rng, "enemy_to_attack", s.encounter_where[hurt] == ENGAGED, optional=True)
+        s.encounter_hit_points[hurt[enemy >= 0], enemy[enemy >= 0]] -= 4
+        calm = rows[choice == 2]
+        s.threat[calm, p] = np.maximum(0, s.threat[calm, p] - 5)
+
+    def player_actions(self, p):
+        """The action window after player p's planning: Galadriel, then attachments on p's heroes"""
+        s, t = self.state, self.tables
+        for c in np.nonzero(t.is_galadriel[p])[0]:
+            ready = np.nonzero(s.in_play[:, p, c] & ~s.exhausted[:, p, c] & ~s.used_this_round[:, p, c])[0]
+            rows = ready[self.yes(len(ready))]
+            s.exhausted[rows, p, c] = True
+            s.used_this_round[rows, p, c] = True
+            target = self.choose_player(len(rows))
+            for q in range(t.n_players):
+                chosen = rows[target == q]
+                s.threat[chosen, q] = np.maximum(0, s.threat[chosen, q] - 1)
+                self.draw(chosen, q, 1)
+        for q in range(t.n_players):
+            for d in np.nonzero(t.is_attachment[q])[0]:
+                host = s.attached_to[:, q, d]
+                slot = host - p * t.n_slots
+                on_hero = (slot >= 0) & (slot < t.n_heroes)
+                ready = np.nonzero(on_hero & ~s.attachment_exhausted[:, q, d])[0]
+                ready = ready[s.in_play[ready, p, slot[ready]]]
+                rows = ready[self.yes(len(ready))]
+                s.attachment_exhausted[rows, q, d] = True
+                if t.is_steward[q, d]:
+                    s.resources[rows, p, slot[rows], t.card_sphere[q, d]] += 2
+                elif t.is_courage[q, d]:
+                    s.exhausted[rows, p, slot[rows]] = False
+
+    def quest_phase(self):
+        s, t = self.state, self.tables
+        B, P = len(s), t.n_players
+        committed = np.zeros_like(s.in_play)
+        for p in range(P):
+            questers = s.in_play[:, p] & ~s.exhausted[:, p] & t.can_quest[p]
+            committed[:, p] = self.policy.pick_many(self.rng, "commit", questers)
+        boost = np.zeros((B, P), np.int32)  # Faramir's +1 willpower, until the end of the phase
+        for p in range(P):
+            for c in np.nonzero(t.is_faramir[p])[0]:
+                ready = np.nonzero(s.in_play[:, p, c] & ~s.exhausted[:, p, c])[0]
+                rows = ready[self.yes(len(ready))]
+                s.exhausted[rows, p, c] = True
+                np.add.at(boost, (rows, self.choose_player(len(rows))), 1)
+        willpower = ((s.willpower + boost[:, :, None]) * committed).sum(axis=(1, 2))
+        staging_threat = ((s.encounter_where == IN_STAGING) * t.enemy_threat).sum(axis=1)
+        net = willpower - staging_threat
+        s.progress += np.maximum(net, 0)
+        s.threat += np.maximum(-net, 0)[:, None]
+        has_galadriel = (s.in_play & t.is_galadriel).any(axis=2)
+        prevented = (t.is_ally & s.new_ally & has_galadriel[:, :, None]) | \
+                    (t.is_aragorn & (s.round_number == 1)[:, None, None])
+        s.exhausted |= committed & ~prevented
+
+    def encounter_phase(self):
+        s, t = self.state, self.tables
+        rows = np.arange(len(s))
+        card = self.draw_encounter_card(rows)
+        s.encounter_where[rows[card >= 0], card[card >= 0]] = IN_STAGING
+        # Each enemy engages the first player, from the active one, whose threat reaches its engagement cost
+        active = s.round_number % t.n_players
+        for e in range(t.n_encounter):
+            player = np.full(len(s), -1)
+            for i in range(t.n_players):
+                p = (active + i) % t.n_players
+                engages = (player < 0) & (s.threat[rows, p] >= t.enemy_engagement[e])
+                player[engages] = p[engages]
+            engaging = (s.encounter_where[:, e] == IN_STAGING) & (player >= 0)
+            s.encounter_where[engaging, e] = ENGAGED
+            s.encounter_player[engaging, e] = player[engaging]
+
+    def combat_phase(self):
+        s, t = self.state, self.tables
+        for p in range(t.n_players):
+            for e in range(t.n_encounter):
+                self.enemy_attack(np.nonzero((s.encounter_where[:, e] == ENGAGED) &
+                                             (s.encounter_player[:, e] == p))[0], p, e)
+        for p in range(t.n_players):
+            self.player_attacks(p)
+
+    def enemy_attack(self, rows, p, e):
+        s, t = self.state, self.tables
+        shadow = self.draw_encounter_card(rows)
+        defenders = s.in_play[rows, p] & ~s.exhausted[rows, p] & t.can_defend[p]
+        defender = self.policy.pick(self.rng, "defender", defenders, optional=True,
+                                    scores=s.defense[rows, p] * 1000 + s.hit_points[rows, p])
+        revealed = shadow >= 0
+        hurt = revealed & (defender >= 0)
+        s.hit_points[rows[hurt], p, defender[hurt]] -= t.shadow_damage[shadow[hurt]]
+        s.encounter_where[rows[revealed], shadow[revealed]] = IN_DISCARD
+        defended = defender >= 0
+        rows, defender = rows[defended], defender[defended]
+        damage = np.maximum(0, t.enemy_attack[e] - np.maximum(0, s.defense[rows, p, defender]))
+        s.hit_points[rows, p, defender] -= damage
+        defeated = s.hit_points[rows, p, defender] <= 0
+        dead, slot = rows[defeated], defender[defeated]
+        hero = slot < t.n_heroes
+        s.hit_points[dead[hero], p, slot[hero]] = 0
+        self.leave_play(dead, p, slot)
+        enemy_defeated = rows[s.encounter_hit_points[rows, e] <= 0]
+        s.encounter_where[enemy_defeated, e] = IN_DISCARD
+
+    def boromir_bonus(self, rows):
+        """+1 attack for Gondor allies from each Boromir in play with a resource in his pool"""
+        s, t = self.state, self.tables
+        H = t.n_heroes
+        pools = s.resources[rows, :, :, t.leadership] >= 1
+        return (pools & s.in_play[rows, :, :H] & t.is_boromir[:, :H]).sum(axis=(1, 2))
+
+    def player_attacks(self, p):
+        s, t = self.state, self.tables
+        rows = np.nonzero(((s.encounter_where == ENGAGED) & (s.encounter_player == p)).any(axis=1))[0]
+        while len(rows):
+            engaged = (s.encounter_where[rows] == ENGAGED) & (s.encounter_player[rows] == p)
+            enemy = self.policy.pick(self.rng, "enemy_to_attack", engaged, optional=True)
+            rows, enemy = rows[enemy >= 0], enemy[enemy >= 0]
+            attackers = s.in_play[rows, p] & ~s.exhausted[rows, p] & t.can_attack[p]
+            chosen = self.policy.pick_many(self.rng, "attackers", attackers)
+            attacking = chosen.any(axis=1)
+            rows, enemy, chosen = rows[attacking], enemy[attacking], chosen[attacking]
+            s.exhausted[rows, p] |= chosen
+            total = (s.attack[rows, p] * chosen).sum(axis=1) + \
+                    (chosen & t.is_gondor_ally[p]).sum(axis=1) * self.boromir_bonus(rows)
+            s.encounter_hit_points[rows, enemy] -= np.maximum(0, total - t.enemy_defense[enemy])
+            defeated = s.encounter_hit_points[rows, enemy] <= 0
+            s.encounter_where[rows[defeated], enemy[defeated]] = IN_DISCARD
+            rows = rows[((s.encounter_where[rows] == ENGAGED) & (s.encounter_player[rows] == p)).any(axis=1)]
+
+    def refresh_phase(self):
+        s, t = self.state, self.tables
+        rows = np.arange(len(s))
+        for p in range(t.n_players):
+            s.exhausted[:, p] &= ~s.in_play[:, p]
+            s.new_ally[:, p] = False
+            s.threat[:, p] += 1
+            self.draw(rows, p, 1)
+        hosted = s.attached_to >= 0
+        hosts_in_play = np.take_along_axis(s.in_play.reshape(len(s), -1),
+                                           np.where(hosted, s.attached_to, 0).reshape(len(s), -1), axis=1)
+        s.attachment_exhausted &= ~(hosted & hosts_in_play.reshape(hosted.shape))
+        s.round_number += 1
+        s.used_this_round[:] = False
+        for p in range(t.n_players):
+            for c in np.nonzero(t.is_gandalf[p])[0]:
+                leaving = np.nonzero(s.in_play[:, p, c])[0]
+                self.leave_play(leaving, p, np.full(len(leaving), c))
+
+
+def simulate_batch(decks, quest, n_games, seed=None, policy=None, max_rounds=100):
+    """Play n_games with the lockstep engine and return a BatchReport.
+
+    decks is a list of simulate.Deck, one per player; quest is a QuestCard
+    class. policy is a RandomPolicy (the default) or GreedyPolicy.
+    """
+    return LockstepEngine(decks, quest, n_games, seed, policy, max_rounds).run()
+
+
+def main(argv=None):
+    from simulate import GAVS_DECK
+    parser = argparse.ArgumentParser(description="Run a batch of games of Fleeing from Mirkwood in lockstep")
+    parser.add_argument("-n", "--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-rounds", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    report = simulate_batch([GAVS_DECK] * args.players, FleeingFromMirkwood, args.games, args.seed,
+                            POLICIES[args.policy](), args.max_rounds)
+    console.print(f"Games: {len(report.outcomes)}  Win rate: [green]{report.win_rate:.1%}[/green]  "
+                  f"Mean rounds: {report.mean_rounds:.2f}  ({report.games_per_minute:.0f} games/minute)")
+    return report
+
+
+if __name__ == "__main__":
+    main()